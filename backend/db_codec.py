@@ -0,0 +1,164 @@
+"""Timestamps stored as native BSON datetimes, and the migration of documents still holding ISO strings"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from bson.codec_options import CodecOptions
+from pymongo import UpdateOne
+
+
+logger = logging.getLogger(__name__)
+
+# Datetimes come back timezone-aware in UTC, as the API models and ISO strings had them
+CODEC_OPTIONS = CodecOptions(tz_aware=True)
+
+# Timestamp fields per collection that were written as ISO strings before
+TIMESTAMP_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "sites": ("createdAt", "updatedAt"),
+    "status_checks": ("timestamp",),
+    "publish_jobs": ("createdAt", "updatedAt", "finishedAt"),
+    "publish_locks": ("acquiredAt", "expiresAt"),
+    "publish_manifests": ("updatedAt",),
+}
+
+MIGRATION_BATCH_SIZE = int(os.environ.get('DATETIME_MIGRATION_BATCH_SIZE', '500'))
+# Pause between batches so the migration never competes with API traffic for long
+MIGRATION_BATCH_PAUSE = float(os.environ.get('DATETIME_MIGRATION_BATCH_PAUSE', '0.05'))
+
+
+def utc_now() -> datetime:
+    """Current UTC time at the millisecond precision BSON stores, so responses match what is read back"""
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def json_default(value: Any) -> Any:
+    """json.dumps fallback rendering datetimes as ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class MigrationProgress:
+    """Counters of the datetime migration, safe to read while it runs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "pending"
+        self.pending: Dict[str, int] = {}
+        self.converted: Dict[str, int] = {}
+        self.skipped: Dict[str, int] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+
+    def add(self, collection: str, converted: int, skipped: int) -> None:
+        with self._lock:
+            self.converted[collection] = self.converted.get(collection, 0) + converted
+            self.skipped[collection] = self.skipped.get(collection, 0) + skipped
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.perf_counter()
+            return {
+                "state": self.state,
+                "pending": dict(self.pending),
+                "converted": dict(self.converted),
+                "skipped": dict(self.skipped),
+                "elapsedMs": round((end - self.started_at) * 1000) if self.started_at else 0,
+                "error": self.error,
+            }
+
+
+datetime_migration = MigrationProgress()
+
+
+def _string_filter(fields: Tuple[str, ...]) -> Dict[str, Any]:
+    return {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+
+def _parse(value: Any) -> Any:
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value)
+    # Strings written without an offset were UTC
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_timestamps(
+    db,
+    batch_size: int = MIGRATION_BATCH_SIZE,
+    pause: float = MIGRATION_BATCH_PAUSE,
+    progress: MigrationProgress = datetime_migration
+) -> Dict[str, Any]:
+    """Convert ISO string timestamps to BSON datetimes in batches of at most batch_size documents
+
+    Each document is rewritten only if its strings are still the ones that
+    were read, so a concurrent API write always wins. Once nothing is left
+    to convert a run costs one count per collection.
+
+    Returns:
+        The final progress stats
+    """
+    progress.update(
+        state="running", pending={}, converted={}, skipped={},
+        started_at=time.perf_counter(), finished_at=None, error=None
+    )
+    try:
+        for name, fields in TIMESTAMP_FIELDS.items():
+            collection = db[name]
+            query = _string_filter(fields)
+            pending = await collection.count_documents(query)
+            progress.update(pending={**progress.pending, name: pending})
+            if not pending:
+                continue
+
+            logger.info(f"Converting timestamps of {pending} {name} document(s) to datetimes")
+            last_id = None
+            while True:
+                # _id order lets skipped documents (unparseable strings) fall behind the next batch
+                batch_query = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+                docs = await collection.find(batch_query, {field: 1 for field in fields}) \
+                    .sort("_id", 1).limit(batch_size).to_list(batch_size)
+                if not docs:
+                    break
+                last_id = docs[-1]["_id"]
+
+                operations, skipped = [], 0
+                for doc in docs:
+                    strings = {field: doc[field] for field in fields if isinstance(doc.get(field), str)}
+                    try:
+                        converted = {field: _parse(value) for field, value in strings.items()}
+                    except ValueError:
+                        logger.warning(f"Leaving unparseable timestamp in {name} {doc['_id']}: {strings}")
+                        skipped += 1
+                        continue
+                    operations.append(UpdateOne({"_id": doc["_id"], **strings}, {"$set": converted}))
+
+                converted_count = 0
+                if operations:
+                    result = await collection.bulk_write(operations, ordered=False)
+                    converted_count = result.modified_count
+                progress.add(name, converted_count, skipped)
+                done = progress.converted.get(name, 0) + progress.skipped.get(name, 0)
+                logger.info(f"Timestamp migration: {name} {done}/{pending}")
+                await asyncio.sleep(pause)
+
+        progress.update(state="done", finished_at=time.perf_counter())
+    except asyncio.CancelledError:
+        progress.update(state="cancelled", finished_at=time.perf_counter())
+        raise
+    except Exception as e:
+        logger.error(f"Timestamp migration failed: {e}")
+        progress.update(state="failed", finished_at=time.perf_counter(), error=str(e))
+    return progress.stats()
+
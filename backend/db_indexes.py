@@ -0,0 +1,75 @@
+"""MongoDB indexes the API relies on, created idempotently at startup"""
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: List[Tuple[str, int]]
+    options: Dict[str, Any]
+
+    @property
+    def name(self) -> str:
+        """MongoDB's default index name, e.g. updatedAt_-1_id_-1"""
+        return "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+
+INDEXES: List[IndexSpec] = [
+    # Every site lookup and the sync upsert filter on id
+    IndexSpec('sites', [('id', ASCENDING)], {"unique": True}),
+    # Site listings, newest first; id breaks ties between equal timestamps
+    IndexSpec('sites', [('updatedAt', DESCENDING), ('id', DESCENDING)], {}),
+    # Page-level queries ("pages.id": ...), multikey over the pages array
+    IndexSpec('sites', [('pages.id', ASCENDING)], {}),
+    # Pages stored in their own collection (PAGE_STORAGE=collection), read in order
+    IndexSpec('pages', [('site_id', ASCENDING), ('id', ASCENDING)], {"unique": True}),
+    IndexSpec('pages', [('site_id', ASCENDING), ('order', ASCENDING)], {}),
+    # Upload deduplication looks files up by content hash
+    IndexSpec('uploads', [('sha256', ASCENDING)], {"unique": True}),
+    # Reference recounts find a site's uploads; unused uploads are listed by refCount
+    IndexSpec('uploads', [('sites', ASCENDING)], {}),
+    IndexSpec('uploads', [('refCount', ASCENDING), ('createdAt', ASCENDING)], {}),
+    IndexSpec('status_checks', [('id', ASCENDING)], {"unique": True}),
+    IndexSpec('publish_manifests', [('site_id', ASCENDING), ('target', ASCENDING)], {"unique": True}),
+    IndexSpec('publish_jobs', [('id', ASCENDING)], {"unique": True}),
+    # Drops locks a crashed worker left behind once they expire; needs expiresAt stored as a date
+    IndexSpec('publish_locks', [('expiresAt', ASCENDING)], {"expireAfterSeconds": 0}),
+]
+
+
+async def ensure_indexes(db, indexes: List[IndexSpec] = INDEXES) -> Dict[str, str]:
+    """Create missing indexes and log what happened to each
+
+    create_index is a no-op for an index that already exists with the same
+    keys and options. A conflicting index, or a unique index over existing
+    duplicates, is logged and skipped so the API still starts.
+
+    Returns:
+        "collection.name" -> "created", "exists" or "failed"
+    """
+    status = {}
+    for spec in indexes:
+        collection = db[spec.collection]
+        label = f"{spec.collection}.{spec.name}"
+        try:
+            existed = spec.name in await collection.index_information()
+            start = time.perf_counter()
+            # Also run for existing indexes: MongoDB rejects one whose options differ from the spec
+            await collection.create_index(spec.keys, **spec.options)
+            if existed:
+                status[label] = "exists"
+                logger.info(f"Index {label} already present")
+            else:
+                status[label] = "created"
+                logger.info(f"Index {label} built in {(time.perf_counter() - start) * 1000:.0f} ms")
+        except OperationFailure as e:
+            status[label] = "failed"
+            logger.error(f"Could not build index {label}: {e.details.get('errmsg', str(e)) if e.details else str(e)}")
+    return status
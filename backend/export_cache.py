@@ -0,0 +1,151 @@
+"""On-disk cache of exported site archives, keyed on a content hash of the site revision"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, Optional, Tuple
+
+from upload_store import content_hash
+
+
+logger = logging.getLogger(__name__)
+
+# Bump when the export output changes for identical site data (templates, CSS, archive layout)
+EXPORT_FORMAT_VERSION = "2"
+HASH_CHUNK_SIZE = 1024 * 1024
+# Memoized hashes are dropped wholesale past this many entries
+MAX_MEMOIZED_HASHES = 10000
+
+_file_hashes: Dict[Tuple[str, int, int], str] = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_sha256(path: Path) -> str:
+    """SHA-256 of a file, memoized on (path, mtime, size) so unchanged uploads are hashed once
+
+    Content-addressed uploads are named by their hash and never read.
+    """
+    sha256 = content_hash(path)
+    if sha256:
+        return sha256
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _file_hashes_lock:
+        cached = _file_hashes.get(key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    with _file_hashes_lock:
+        if len(_file_hashes) >= MAX_MEMOIZED_HASHES:
+            _file_hashes.clear()
+        _file_hashes[key] = digest.hexdigest()
+    return digest.hexdigest()
+
+
+def site_revision(site: Dict[str, Any], images: Iterable[Tuple[str, Path]]) -> str:
+    """Content hash of everything an export is built from: name, pages, siteStyles and image bytes"""
+    digest = hashlib.sha256()
+    digest.update(EXPORT_FORMAT_VERSION.encode('utf-8'))
+    content = {
+        "name": site.get('name'),
+        "pages": site.get('pages', []),
+        "siteStyles": site.get('siteStyles')
+    }
+    digest.update(json.dumps(content, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+    for filename, path in images:
+        digest.update(f"\0{filename}\0{file_sha256(path)}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def open_cached(path: Path) -> Optional[BinaryIO]:
+    """Open a cache entry and mark it recently used; None if it is not there"""
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        # Evicted just now; the open file is still whole
+        pass
+    return f
+
+
+def site_key(site_id: str) -> str:
+    """Filename-safe stand-in for a site id, which clients choose freely (e.g. "../x" or "*")"""
+    return hashlib.sha256(site_id.encode('utf-8')).hexdigest()[:32]
+
+
+class ExportCache:
+    """Size-bounded LRU of export archives stored as <site key>-<revision>.zip
+
+    Recency is the file mtime, refreshed on every hit; once the directory
+    grows past max_bytes the least recently used archives are removed.
+    Hits are handed out as open files, which stay readable when an
+    eviction unlinks the archive while it is being sent.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def path_for(self, site_id: str, revision: str) -> Path:
+        return self.directory / f"{site_key(site_id)}-{revision}.zip"
+
+    def open(self, site_id: str, revision: str) -> Optional[BinaryIO]:
+        """The cached archive opened for reading, None on a miss; the caller closes it"""
+        return open_cached(self.path_for(site_id, revision))
+
+    def store(self, site_id: str, revision: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """Pass chunks through while writing them to the cache
+
+        The archive is only published under its final name once the whole
+        stream was produced; an abandoned download leaves nothing behind.
+        """
+        final_path = self.path_for(site_id, revision)
+        tmp_path = self.directory / f".{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, final_path)
+            completed = True
+            self._evict()
+        finally:
+            if not completed:
+                tmp_path.unlink(missing_ok=True)
+
+    def invalidate(self, site_id: str) -> None:
+        """Drop every cached archive of a site"""
+        # Keys and revisions are fixed-length hex, so the pattern matches this site's archives only
+        for path in self.directory.glob(f"{site_key(site_id)}-{'?' * 64}.zip"):
+            path.unlink(missing_ok=True)
+
+    def _evict(self) -> None:
+        with self._lock:
+            archives = []
+            for path in self.directory.glob("*.zip"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                archives.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in archives)
+            for _, size, path in sorted(archives):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                logger.info(f"Evicted cached export {path.name}")
@@ -0,0 +1,40 @@
+"""JSON responses for MongoDB documents that were validated on the way in
+
+Everything the API stores has already been through its Pydantic models,
+so reads can serialize the documents straight to bytes with orjson instead
+of rebuilding every Page, Block and SiteStyles model and dumping it again.
+"""
+from typing import Any, Dict, Iterable
+
+import orjson
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+# UTC datetimes end in Z, as Pydantic serializes them
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+class TrustedJSONResponse(Response):
+    """Serializes content with orjson; FastAPI skips response_model validation for returned Responses"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=ORJSON_OPTIONS)
+
+
+def model_defaults(model: type, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Default values of a model's optional fields, as they are stored
+
+    Filled into documents written before a field existed, which validation
+    would otherwise have added. Fields whose default is generated per
+    instance (ids, timestamps) belong in `exclude`.
+    """
+    defaults = {}
+    for name, field in model.model_fields.items():
+        if field.is_required() or name in exclude:
+            continue
+        value = field.get_default(call_default_factory=True)
+        defaults[name] = value.model_dump() if isinstance(value, BaseModel) else value
+    return defaults
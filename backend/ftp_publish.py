@@ -0,0 +1,429 @@
+"""FTP publishing helpers: publish artifacts, content-hash manifests and remote file operations"""
+import asyncio
+import ftplib
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Manifest mirrored on the remote, next to index.html
+MANIFEST_FILENAME = ".publish-manifest.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Parallel upload defaults, overridable per request
+DEFAULT_FTP_CONNECTIONS = int(os.environ.get('FTP_PUBLISH_CONNECTIONS', '4'))
+MAX_FTP_CONNECTIONS = int(os.environ.get('FTP_PUBLISH_MAX_CONNECTIONS', '8'))
+FTP_UPLOAD_RETRIES = 3
+FTP_RETRY_BACKOFF = 0.5
+
+# All blocking ftplib work of publishes runs on this pool so a slow FTP host never
+# stalls the event loop; its size bounds how many publishes talk to FTP at once
+FTP_EXECUTOR_WORKERS = int(os.environ.get('FTP_EXECUTOR_WORKERS', '4'))
+ftp_executor = ThreadPoolExecutor(max_workers=FTP_EXECUTOR_WORKERS, thread_name_prefix='ftp')
+# Connection tests get their own pool so a click never queues behind running publishes
+FTP_CHECK_WORKERS = int(os.environ.get('FTP_CHECK_WORKERS', '2'))
+ftp_check_executor = ThreadPoolExecutor(max_workers=FTP_CHECK_WORKERS, thread_name_prefix='ftp-check')
+# Per-connection upload workers of every publish share this pool, so concurrent
+# publishes never hold more than this many transfer threads and FTP sessions
+FTP_TRANSFER_WORKERS = int(os.environ.get('FTP_TRANSFER_WORKERS', str(2 * MAX_FTP_CONNECTIONS)))
+ftp_transfer_executor = ThreadPoolExecutor(max_workers=FTP_TRANSFER_WORKERS, thread_name_prefix='ftp-transfer')
+
+
+class FTPPublishError(Exception):
+    """Raised when the FTP target cannot be prepared for publishing"""
+
+
+class PublishCancelled(Exception):
+    """Raised inside a publish once cancellation has been requested"""
+
+
+class PublishProgress:
+    """Thread-safe transfer counters shared by upload workers and whoever reports progress"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.started_at = time.monotonic()
+        self.files_total = 0
+        self.files_done = 0
+        self.bytes_total = 0
+        self.bytes_done = 0
+    
+    def begin(self, files_total: int, bytes_total: int) -> None:
+        with self._lock:
+            self.files_total = files_total
+            self.bytes_total = bytes_total
+            self.started_at = time.monotonic()
+    
+    def check_cancelled(self) -> None:
+        if self.cancelled.is_set():
+            raise PublishCancelled("Publish cancelled")
+    
+    def add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.bytes_done += count
+    
+    def file_done(self) -> None:
+        with self._lock:
+            self.files_done += 1
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Current counters plus throughput (bytes/s) and ETA (seconds)"""
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-6)
+            throughput = self.bytes_done / elapsed
+            remaining = max(self.bytes_total - self.bytes_done, 0)
+            return {
+                "filesDone": self.files_done,
+                "filesTotal": self.files_total,
+                "bytesDone": self.bytes_done,
+                "bytesTotal": self.bytes_total,
+                "throughput": round(throughput, 1),
+                "eta": round(remaining / throughput, 1) if throughput > 0 else None,
+                "elapsed": round(elapsed, 1)
+            }
+
+
+@dataclass
+class PublishArtifact:
+    """A single file to publish, either generated in memory or read from disk"""
+    path: str
+    sha256: str
+    size: int
+    data: Optional[bytes] = None
+    local_path: Optional[Path] = None
+
+    @classmethod
+    def from_bytes(cls, path: str, data: bytes) -> "PublishArtifact":
+        return cls(path=path, sha256=hashlib.sha256(data).hexdigest(), size=len(data), data=data)
+
+    @classmethod
+    def from_file(cls, path: str, local_path: Path, sha256: Optional[str] = None) -> "PublishArtifact":
+        """Read and hash a file, or only stat it when its SHA-256 is already known"""
+        if sha256 is not None:
+            return cls(path=path, sha256=sha256, size=local_path.stat().st_size, local_path=local_path)
+        digest = hashlib.sha256()
+        size = 0
+        with open(local_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(path=path, sha256=digest.hexdigest(), size=size, local_path=local_path)
+
+    def open(self):
+        """Open the artifact content as a binary file object"""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.local_path, 'rb')
+
+
+async def run_ftp(func: Callable, *args, **kwargs):
+    """Run blocking FTP work on the dedicated executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ftp_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_ftp_check(func: Callable, *args, **kwargs):
+    """Run a short blocking FTP check, such as a connection test, outside the publish pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(ftp_check_executor, functools.partial(func, *args, **kwargs))
+
+
+def manifest_target_key(protocol: str, host: str, port: int, username: str, root_folder: str) -> str:
+    """Identify an FTP target so each site keeps one manifest per destination"""
+    folder = root_folder.strip('/')
+    return f"{protocol.lower()}://{username}@{host.lower()}:{port}/{folder}"
+
+
+def plan_publish(
+    artifacts: List[PublishArtifact],
+    previous_files: Dict[str, str],
+    only_changes: bool
+) -> Tuple[List[PublishArtifact], List[PublishArtifact], List[str]]:
+    """Split artifacts into (to_upload, skipped) and list orphaned remote paths
+
+    Args:
+        artifacts: Everything the current site revision publishes
+        previous_files: Mapping of remote path -> sha256 from the last publish
+        only_changes: If False, every artifact is uploaded regardless of the manifest
+    """
+    to_upload = []
+    skipped = []
+    for artifact in artifacts:
+        if only_changes and previous_files.get(artifact.path) == artifact.sha256:
+            skipped.append(artifact)
+        else:
+            to_upload.append(artifact)
+
+    current_paths = {artifact.path for artifact in artifacts}
+    orphans = sorted(
+        path for path in previous_files
+        if path not in current_paths and path != MANIFEST_FILENAME
+    )
+    return to_upload, skipped, orphans
+
+
+def ensure_remote_dirs(ftp: ftplib.FTP, paths: Iterable[str]) -> None:
+    """Create every parent directory needed by the given remote paths"""
+    directories = set()
+    for path in paths:
+        parent = posixpath.dirname(path)
+        while parent:
+            directories.add(parent)
+            parent = posixpath.dirname(parent)
+
+    for directory in sorted(directories, key=lambda d: d.count('/')):
+        try:
+            ftp.mkd(directory)
+        except ftplib.error_perm:
+            # Directory already exists, that's fine
+            pass
+
+
+def read_remote_manifest(ftp: ftplib.FTP) -> Dict[str, str]:
+    """Read the mirrored manifest from the remote root, or {} if it is missing or unreadable"""
+    buffer = io.BytesIO()
+    try:
+        ftp.retrbinary(f'RETR {MANIFEST_FILENAME}', buffer.write)
+        manifest = json.loads(buffer.getvalue().decode('utf-8'))
+        return {entry['path']: entry['sha256'] for entry in manifest.get('files', [])}
+    except ftplib.error_perm:
+        return {}
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Ignoring unreadable remote manifest: {str(e)}")
+        return {}
+
+
+def write_remote_manifest(ftp: ftplib.FTP, files: List[Dict[str, object]]) -> None:
+    """Mirror the manifest as a JSON file on the remote root"""
+    payload = json.dumps({"files": files}, indent=2).encode('utf-8')
+    ftp.storbinary(f'STOR {MANIFEST_FILENAME}', io.BytesIO(payload))
+
+
+def delete_remote_files(ftp: ftplib.FTP, paths: Iterable[str]) -> List[str]:
+    """Delete remote files, returning the paths that were actually removed"""
+    deleted = []
+    for path in paths:
+        try:
+            ftp.delete(path)
+            deleted.append(path)
+        except ftplib.error_perm as e:
+            # Already gone (or not ours to delete) - either way it's no longer published
+            if str(e).startswith('550'):
+                deleted.append(path)
+            else:
+                logger.warning(f"Failed to delete orphaned file {path}: {str(e)}")
+    return deleted
+
+
+def open_ftp_session(host: str, port: int, username: str, password: str, root_folder: str = "", timeout: int = 30) -> ftplib.FTP:
+    """Connect, log in and change to the root folder, creating it if needed"""
+    ftp = ftplib.FTP()
+    try:
+        ftp.connect(host, port, timeout=timeout)
+        ftp.login(username, password)
+        
+        if root_folder:
+            try:
+                ftp.cwd(root_folder)
+            except ftplib.error_perm:
+                # Try to create the folder if it doesn't exist
+                try:
+                    ftp.mkd(root_folder)
+                    ftp.cwd(root_folder)
+                except Exception as e:
+                    raise FTPPublishError(f"Cannot access or create root folder '{root_folder}': {str(e)}")
+        return ftp
+    except BaseException:
+        ftp.close()
+        raise
+
+
+def is_page_artifact(artifact: PublishArtifact) -> bool:
+    return artifact.path.lower().endswith(('.html', '.htm'))
+
+
+class ParallelFTPUploader:
+    """Upload artifacts over a pool of authenticated FTP sessions
+    
+    Each session owns a work queue, balanced by file size; an idle session
+    steals from the longest remaining queue. Uploads run in two phases so that
+    pages only go live once the images and CSS they reference are stored.
+    Transient (4xx) errors are retried with exponential backoff, and dropped
+    connections are re-established before retrying. An optional PublishProgress
+    receives byte/file counts and is polled for cancellation between blocks.
+    """
+    
+    def __init__(
+        self,
+        connect: Callable[[], ftplib.FTP],
+        connections: int = DEFAULT_FTP_CONNECTIONS,
+        retries: int = FTP_UPLOAD_RETRIES,
+        backoff: float = FTP_RETRY_BACKOFF,
+        progress: Optional[PublishProgress] = None
+    ):
+        self.connect = connect
+        self.connections = max(1, min(connections, MAX_FTP_CONNECTIONS))
+        self.retries = retries
+        self.backoff = backoff
+        self.progress = progress
+        self._sessions: List[Optional[ftplib.FTP]] = [None] * self.connections
+        self._lock = threading.Lock()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def session(self, index: int = 0) -> ftplib.FTP:
+        """Return the session for a worker slot, connecting on first use"""
+        if self._sessions[index] is None:
+            self._sessions[index] = self.connect()
+        return self._sessions[index]
+    
+    def close(self) -> None:
+        for index, ftp in enumerate(self._sessions):
+            if ftp is None:
+                continue
+            try:
+                ftp.quit()
+            except Exception:
+                ftp.close()
+            self._sessions[index] = None
+    
+    def upload(self, artifacts: List[PublishArtifact]) -> Tuple[List[str], Dict[str, str]]:
+        """Upload assets first, then pages
+        
+        Returns:
+            (uploaded paths, {failed path: error message})
+        
+        Raises:
+            FTPPublishError: if a non-image asset such as styles.css failed,
+                in which case no page is uploaded
+            PublishCancelled: if the progress tracker was cancelled
+        """
+        assets = [a for a in artifacts if not is_page_artifact(a)]
+        pages = [a for a in artifacts if is_page_artifact(a)]
+        
+        uploaded, failed = self._run_phase(assets)
+        if self.progress:
+            self.progress.check_cancelled()
+        broken = [path for path in failed if not path.startswith('images/')]
+        if broken:
+            raise FTPPublishError(f"Failed to upload {', '.join(broken)}: {failed[broken[0]]}")
+        
+        page_uploaded, page_failed = self._run_phase(pages)
+        uploaded.extend(page_uploaded)
+        failed.update(page_failed)
+        if self.progress:
+            self.progress.check_cancelled()
+        return uploaded, failed
+    
+    def _run_phase(self, artifacts: List[PublishArtifact]) -> Tuple[List[str], Dict[str, str]]:
+        if not artifacts:
+            return [], {}
+        
+        workers = min(self.connections, len(artifacts))
+        queues: List[Deque[PublishArtifact]] = [deque() for _ in range(workers)]
+        loads = [0] * workers
+        # Largest first onto the least loaded queue keeps sessions finishing together
+        for artifact in sorted(artifacts, key=lambda a: a.size, reverse=True):
+            target = loads.index(min(loads))
+            queues[target].append(artifact)
+            loads[target] += artifact.size
+        
+        uploaded: List[str] = []
+        failed: Dict[str, str] = {}
+        
+        def next_artifact(index: int) -> Optional[PublishArtifact]:
+            with self._lock:
+                if queues[index]:
+                    return queues[index].popleft()
+                longest = max(queues, key=len)
+                return longest.pop() if longest else None
+        
+        def worker(index: int) -> None:
+            while True:
+                artifact = next_artifact(index)
+                if artifact is None:
+                    return
+                try:
+                    self._store(index, artifact)
+                    with self._lock:
+                        uploaded.append(artifact.path)
+                    if self.progress:
+                        self.progress.file_done()
+                except PublishCancelled:
+                    # The aborted transfer leaves the control connection out of sync
+                    self._drop_session(index)
+                    return
+                except Exception as e:
+                    logger.warning(f"Failed to upload {artifact.path}: {str(e)}")
+                    with self._lock:
+                        failed[artifact.path] = str(e)
+        
+        # Workers steal from each other's queues, so a phase finishes even when
+        # the shared pool is busy and only some of its workers get to run
+        futures = [ftp_transfer_executor.submit(worker, i) for i in range(workers)]
+        for future in futures:
+            future.result()
+        
+        # Keep the caller's ordering rather than completion order
+        order = {artifact.path: i for i, artifact in enumerate(artifacts)}
+        uploaded.sort(key=lambda path: order[path])
+        return uploaded, failed
+    
+    def _drop_session(self, index: int) -> None:
+        if self._sessions[index] is not None:
+            self._sessions[index].close()
+            self._sessions[index] = None
+    
+    def _store(self, index: int, artifact: PublishArtifact) -> None:
+        attempt = 0
+        while True:
+            sent = 0
+            stored = False
+            
+            def on_block(block: bytes) -> None:
+                nonlocal sent
+                sent += len(block)
+                if self.progress:
+                    self.progress.add_bytes(len(block))
+                    self.progress.check_cancelled()
+            
+            try:
+                if self.progress:
+                    self.progress.check_cancelled()
+                ftp = self.session(index)
+                with artifact.open() as content:
+                    ftp.storbinary(f'STOR {artifact.path}', content, callback=on_block)
+                stored = True
+                return
+            except ftplib.error_temp:
+                if attempt >= self.retries:
+                    raise
+            except (OSError, EOFError):
+                # Connection dropped (or never came up) - reconnect on the next attempt
+                if attempt >= self.retries:
+                    raise
+                self._drop_session(index)
+            finally:
+                # Bytes of a failed attempt will be sent again
+                if sent and self.progress and not stored:
+                    self.progress.add_bytes(-sent)
+            time.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
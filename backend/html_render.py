@@ -0,0 +1,220 @@
+"""HTML render engine for exported pages: a block-type registry of pre-compiled templates
+
+Templates are parsed once, at registration, into literal chunks and field
+names. Rendering appends chunks to one output list that is joined at the
+end, so a page costs O(size of the output) however many blocks it has.
+"""
+import posixpath
+from string import Formatter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+
+class Template:
+    """A str.format-style template parsed once into (literal, field) pairs"""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, source: str):
+        self.parts: Tuple[Tuple[str, Optional[str]], ...] = tuple(
+            (literal, field) for literal, field, _, _ in Formatter().parse(source)
+        )
+
+    def render_into(self, out: List[str], fields: Mapping[str, Any]) -> None:
+        for literal, field in self.parts:
+            if literal:
+                out.append(literal)
+            if field is not None:
+                out.append(str(fields[field]))
+
+
+class BlockType:
+    """How one block type renders: a template plus a function building its fields from the block"""
+
+    __slots__ = ('template', 'fields')
+
+    def __init__(self, template: Template, fields: Callable[[Dict[str, Any]], Mapping[str, Any]]):
+        self.template = template
+        self.fields = fields
+
+
+_BLOCK_TYPES: Dict[str, BlockType] = {}
+
+
+def register_block_type(
+    block_type: str,
+    template: str,
+    fields: Callable[[Dict[str, Any]], Mapping[str, Any]] = lambda block: {}
+) -> None:
+    """Register (or replace) the renderer for a block type"""
+    _BLOCK_TYPES[block_type] = BlockType(Template(template), fields)
+
+
+def registered_block_types() -> List[str]:
+    return list(_BLOCK_TYPES)
+
+
+def export_asset_url(url: str) -> str:
+    """Point backend /uploads URLs at the flat images/ folder of the exported site"""
+    if '/uploads/' in url:
+        return f"images/{posixpath.basename(url.split('/uploads/')[-1])}"
+    return url
+
+
+# ============= BLOCK TYPES =============
+
+register_block_type('hero', """
+    <section class="hero">
+        <h1>{content}</h1>
+    </section>
+""", lambda block: {"content": block.get('content', 'Hero Section')})
+
+register_block_type('text', """
+    <section class="text-block">
+        <p>{content}</p>
+    </section>
+""", lambda block: {"content": block.get('content', 'Text content')})
+
+register_block_type('features', """
+    <section class="features">
+        <div class="feature-grid">
+            <div class="feature">Feature 1</div>
+            <div class="feature">Feature 2</div>
+            <div class="feature">Feature 3</div>
+        </div>
+    </section>
+""")
+
+_IMG = '<img src="{src}"{attributes} alt="Image" loading="lazy" decoding="async">'
+_PICTURE_SOURCE = '\n            <source type="{type}" srcset="{srcset}" sizes="{sizes}">'
+
+
+def _image_fields(block: Dict[str, Any]) -> Mapping[str, Any]:
+    """<img>, wrapped in a <picture> when the exporter attached the image's derivatives as block['picture']"""
+    src = export_asset_url(block.get('content', 'placeholder.jpg'))
+    picture = block.get('picture')
+    if not picture:
+        return {"image": _IMG.format(src=src, attributes='')}
+    attributes = f' srcset="{picture["srcset"]}" sizes="{picture["sizes"]}" width="{picture["width"]}" height="{picture["height"]}"'
+    sources = ''.join(
+        _PICTURE_SOURCE.format(type=source["type"], srcset=source["srcset"], sizes=picture["sizes"])
+        for source in picture["sources"]
+    )
+    return {"image": f"<picture>{sources}\n            {_IMG.format(src=src, attributes=attributes)}\n        </picture>"}
+
+register_block_type('image', """
+    <section class="image-block">
+        {image}
+    </section>
+""", _image_fields)
+
+register_block_type('footer', """
+    <footer>
+        <p>&copy; 2025 All rights reserved</p>
+    </footer>
+""")
+
+
+# ============= PAGE LAYOUT =============
+
+_META_BASE = Template("""
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>""")
+
+_META_DESCRIPTION = Template("""
+    <meta name="description" content="{description}">""")
+
+_META_SOCIAL = Template("""
+    <meta property="og:image" content="{image}">
+    <meta property="og:title" content="{title}">
+    <meta property="og:description" content="{description}">
+    <meta name="twitter:card" content="summary_large_image">
+    <meta name="twitter:image" content="{image}">""")
+
+_DOCUMENT_START = """<!DOCTYPE html>
+<html lang="en">
+<head>"""
+
+_EXTERNAL_CSS = """
+    <link rel="stylesheet" href="styles.css">"""
+
+_INLINE_CSS = """
+    <style>
+        body { font-family: Arial, sans-serif; margin: 0; padding: 0; }
+        .hero { background: #007bff; color: white; padding: 100px 20px; text-align: center; }
+        .text-block { padding: 50px 20px; }
+        .features { padding: 50px 20px; }
+        .feature-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; }
+        .feature { padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
+        .image-block { text-align: center; padding: 20px; }
+        .image-block img { max-width: 100%; height: auto; }
+        footer { background: #333; color: white; text-align: center; padding: 20px; }
+    </style>"""
+
+_BODY_START = """
+</head>
+<body>
+"""
+
+_DOCUMENT_END = """
+</body>
+</html>"""
+
+
+def render_block_into(out: List[str], block: Dict[str, Any]) -> None:
+    """Append one block's HTML; unknown block types render nothing"""
+    block_type = _BLOCK_TYPES.get(block['type'])
+    if block_type is not None:
+        block_type.template.render_into(out, block_type.fields(block))
+
+
+def render_meta_into(out: List[str], page: Dict[str, Any]) -> None:
+    """Append the <meta>/<title> tags built from the page settings"""
+    title = page.get('name', 'Page')
+    _META_BASE.render_into(out, {"title": title})
+
+    if page.get('pageDescription'):
+        _META_DESCRIPTION.render_into(out, {"description": page['pageDescription']})
+
+    if page.get('socialSharingEnabled') and page.get('socialSharingImageUrl'):
+        _META_SOCIAL.render_into(out, {
+            "image": export_asset_url(page['socialSharingImageUrl']),
+            "title": title,
+            "description": page.get('pageDescription', '')
+        })
+
+
+def render_page(page: Dict[str, Any], use_external_css: bool = False) -> str:
+    """Render a complete HTML document for a page
+
+    Args:
+        page: Page data dictionary
+        use_external_css: If True, link to external styles.css instead of inline styles
+    """
+    out: List[str] = []
+
+    # Before DOCTYPE code
+    if page.get('beforeDoctypeCode'):
+        out.append(page['beforeDoctypeCode'])
+        out.append("\n")
+
+    out.append(_DOCUMENT_START)
+    render_meta_into(out, page)
+    out.append(_EXTERNAL_CSS if use_external_css else _INLINE_CSS)
+
+    # Inside <head> code
+    if page.get('headCode'):
+        out.append("\n    ")
+        out.append(page['headCode'])
+
+    out.append(_BODY_START)
+    for block in page.get('blocks', []):
+        render_block_into(out, block)
+
+    # End of <body> code
+    if page.get('bodyEndCode'):
+        out.append("\n    ")
+        out.append(page['bodyEndCode'])
+
+    out.append(_DOCUMENT_END)
+    return ''.join(out)
@@ -0,0 +1,436 @@
+"""Responsive image derivatives: width-bucketed, re-encoded copies of uploaded images
+
+Each source image gets resized copies at IMAGE_DERIVATIVE_WIDTHS (never
+wider than the source) in the modern formats of IMAGE_DERIVATIVE_FORMATS,
+plus its own format for browsers without them. Derivatives are cached on
+disk under the source's SHA-256 with the width and quality in the
+filename, so changing either setting writes new files next to the old.
+Encoding runs on a process pool: it is CPU-bound and holds the GIL.
+render_variant makes the one-off sizes of /api/images on the same pool.
+
+Derivatives are encoded in the background, queued when an image is
+uploaded or first used. Exports and publishes take whatever is already
+on disk and never wait for an encode; a set is only used once complete,
+which its manifest file records.
+"""
+import functools
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Target widths in pixels; sources narrower than a width skip it
+IMAGE_DERIVATIVE_WIDTHS = [int(width) for width in os.environ.get('IMAGE_DERIVATIVE_WIDTHS', '320,640,960,1280,1920').split(',') if width]
+# Modern formats, best first; formats this Pillow build cannot encode are skipped.
+# "avif,webp" adds AVIF, which encodes about 5x slower than WebP for ~10% fewer bytes
+IMAGE_DERIVATIVE_FORMATS = [name.strip() for name in os.environ.get('IMAGE_DERIVATIVE_FORMATS', 'webp').split(',') if name.strip()]
+IMAGE_DERIVATIVE_QUALITY = int(os.environ.get('IMAGE_DERIVATIVE_QUALITY', '75'))
+# Parallel encodes; 1 encodes on the calling thread
+IMAGE_DERIVATIVE_WORKERS = int(os.environ.get('IMAGE_DERIVATIVE_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Largest source, in pixels, that is decoded at all; a small file can declare a huge image
+# (a decompression bomb) that would hold an encode worker for seconds and take GBs of memory
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', str(40_000_000)))
+
+# format name -> (Pillow format, MIME type, file extension)
+FORMATS = {
+    "avif": ("AVIF", "image/avif", "avif"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "png": ("PNG", "image/png", "png"),
+}
+# Pillow's name for a source format -> ours
+SOURCE_FORMATS = {"JPEG": "jpeg", "PNG": "png", "WEBP": "webp"}
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+# Derivative sets memoized per process are dropped wholesale past this many sources
+MAX_MEMOIZED_SETS = 10000
+
+_executor: Optional[Executor] = None
+# Runs background encodes when IMAGE_DERIVATIVE_WORKERS is 1
+_background_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Variant:
+    width: int
+    format: str
+    path: Path
+
+    @property
+    def mime_type(self) -> str:
+        return FORMATS[self.format][1]
+
+
+@dataclass(frozen=True)
+class DerivativeSet:
+    """A source image's dimensions and every derivative written for it"""
+    sha256: str
+    width: int
+    height: int
+    # Our name for the source's own format (jpeg, png, webp)
+    source_format: str
+    variants: Tuple[Variant, ...]
+
+    def export_name(self, variant: Variant) -> str:
+        """Flat filename of a derivative in an exported site's images/ folder"""
+        return f"{self.sha256}-{variant.width}w.{FORMATS[variant.format][2]}"
+
+    def picture(self, src: str) -> Dict[str, Any]:
+        """<picture> description for the exported image `src`: one srcset per modern format plus the fallback's"""
+        folder = src.rsplit('/', 1)[0] + '/' if '/' in src else ''
+        srcsets: Dict[str, List[str]] = {}
+        for variant in self.variants:
+            srcsets.setdefault(variant.format, []).append(f"{folder}{self.export_name(variant)} {variant.width}w")
+        # The original closes the fallback srcset at its full width
+        fallback = srcsets.pop(self.source_format, []) + [f"{src} {self.width}w"]
+        return {
+            "sources": [{"type": FORMATS[name][1], "srcset": ", ".join(srcset)} for name, srcset in srcsets.items()],
+            "srcset": ", ".join(fallback),
+            # Images are shown at most at their natural width, and full-width below it
+            "sizes": f"(max-width: {self.width}px) 100vw, {self.width}px",
+            "width": self.width,
+            "height": self.height
+        }
+
+
+def encodable_formats(names: List[str]) -> List[str]:
+    Image.init()
+    return [name for name in names if name in FORMATS and FORMATS[name][0] in Image.SAVE]
+
+
+def manifest_name(widths: List[int], formats: List[str], quality: int) -> str:
+    """Filename recording a complete derivative set for these settings"""
+    settings = json.dumps([sorted(set(widths)), formats, quality]).encode('utf-8')
+    return f"set-{hashlib.sha256(settings).hexdigest()[:16]}.json"
+
+
+def _derivative_targets(width: int, source_format: str, widths: List[int], formats: List[str]) -> List[Tuple[int, str]]:
+    """(width, format) pairs to write: modern formats also at full width, the source's format only below it"""
+    smaller = sorted(w for w in set(widths) if w < width)
+    targets = [(w, name) for name in formats if name != source_format for w in smaller + [width]]
+    targets += [(w, source_format) for w in smaller]
+    return targets
+
+
+def build_derivatives(
+    source: Path,
+    directory: Path,
+    widths: List[int],
+    formats: List[str],
+    quality: int
+) -> Tuple[int, int, str, List[Tuple[int, str, str]]]:
+    """Write the missing derivatives of one image; runs on the encode pool
+
+    Returns:
+        (width, height, source format, [(width, format, filename)]) with
+        width and height as displayed, after EXIF rotation; also written
+        to the set's manifest once every file exists
+    """
+    with Image.open(source) as image:
+        _check_pixels(image)
+        source_format = SOURCE_FORMATS.get(image.format, "png")
+        width, height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+
+        targets = _derivative_targets(width, source_format, widths, formats)
+        written = []
+        upright = None
+        for target_width, name in targets:
+            filename = f"{target_width}w-q{quality}.{FORMATS[name][2]}"
+            written.append((target_width, name, filename))
+            path = directory / filename
+            if path.exists():
+                continue
+
+            if upright is None:
+                upright = _upright(image, max(w for w, _ in targets) / width)
+
+            target_height = max(1, round(height * target_width / width))
+            resized = upright if upright.width == target_width else upright.resize((target_width, target_height), Image.LANCZOS)
+            _save(resized, path, name, quality)
+
+    manifest = {"width": width, "height": height, "sourceFormat": source_format, "variants": written}
+    directory.mkdir(parents=True, exist_ok=True)
+    _write_atomic(directory / manifest_name(widths, formats, quality), json.dumps(manifest).encode('utf-8'))
+    return width, height, source_format, written
+
+
+def render_variant(
+    source: Path,
+    target: Path,
+    width: Optional[int],
+    height: Optional[int],
+    fit: str,
+    format_name: str,
+    quality: int
+) -> None:
+    """Write one resized, re-encoded copy of an image to `target`; runs on the encode pool
+
+    Images are never enlarged. "contain" fits inside width x height keeping
+    the aspect ratio, "cover" fills the box and crops the overflow around
+    the center, "fill" stretches to the box. A missing side is unbounded.
+    """
+    with Image.open(source) as image:
+        _check_pixels(image)
+        source_width, source_height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            source_width, source_height = source_height, source_width
+        box_width, box_height = width or source_width, height or source_height
+
+        if fit == 'cover' and width and height:
+            # Shrink the box until the source covers it
+            scale = min(1.0, source_width / box_width, source_height / box_height)
+            size = (max(1, round(box_width * scale)), max(1, round(box_height * scale)))
+            upright = _upright(image, max(size[0] / source_width, size[1] / source_height))
+            result = ImageOps.fit(upright, size, Image.LANCZOS)
+        elif fit == 'fill':
+            size = (min(box_width, source_width), min(box_height, source_height))
+            upright = _upright(image, max(size[0] / source_width, size[1] / source_height))
+            result = upright.resize(size, Image.LANCZOS)
+        else:
+            scale = min(1.0, box_width / source_width, box_height / source_height)
+            size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+            upright = _upright(image, scale)
+            result = upright if upright.size == size else upright.resize(size, Image.LANCZOS)
+        _save(result, target, format_name, quality)
+
+
+def _check_pixels(image: Image.Image) -> None:
+    """Refuse to decode images over IMAGE_MAX_PIXELS; opening only read the header"""
+    width, height = image.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise Image.DecompressionBombError(
+            f"Image of {width}x{height} pixels exceeds the limit of {IMAGE_MAX_PIXELS} pixels"
+        )
+
+
+def _upright(image: Image.Image, scale: float) -> Image.Image:
+    """The image decoded for output at `scale` of its size, EXIF-rotated, in RGB or RGBA"""
+    if scale < 1:
+        # JPEGs decode at the smallest power-of-two reduction still covering the output
+        image.draft('RGB', (max(1, round(image.width * scale)), max(1, round(image.height * scale))))
+    upright = ImageOps.exif_transpose(image)
+    if upright.mode not in ('RGB', 'RGBA'):
+        upright = upright.convert('RGBA' if 'transparency' in upright.info or upright.mode in ('LA', 'PA') else 'RGB')
+    return upright
+
+
+def _save(image: Image.Image, path: Path, format_name: str, quality: int) -> None:
+    """Encode to a temp file next to `path` and rename it into place"""
+    pillow_format = FORMATS[format_name][0]
+    if pillow_format == 'JPEG' and image.mode == 'RGBA':
+        image = image.convert('RGB')
+    # PNG's optimize pass costs seconds per image for a few percent
+    options = {} if pillow_format == 'PNG' else {"quality": quality}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+    try:
+        image.save(temp, format=pillow_format, **options)
+        os.replace(temp, path)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    temp = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+    try:
+        temp.write_bytes(data)
+        os.replace(temp, path)
+    finally:
+        temp.unlink(missing_ok=True)
+
+
+def get_derivative_executor() -> Executor:
+    """The shared encode pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers only import this module; forking a threaded server is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=IMAGE_DERIVATIVE_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Started image derivative pool with {IMAGE_DERIVATIVE_WORKERS} workers")
+        return _executor
+
+
+def get_background_executor(workers: int) -> Executor:
+    """Where queued derivative sets encode: the shared pool, or one thread when workers is 1"""
+    global _background_executor
+    if workers > 1:
+        return get_derivative_executor()
+    with _executor_lock:
+        if _background_executor is None:
+            _background_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='derivatives')
+        return _background_executor
+
+
+def shutdown_derivative_executor() -> None:
+    global _executor, _background_executor
+    with _executor_lock:
+        for executor in (_executor, _background_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _background_executor = None
+
+
+class DerivativeStore:
+    """Derivatives on disk at <directory>/<sha[:2]>/<sha256>/<width>w-q<quality>.<ext>
+
+    available() only reads what is on disk; schedule() queues the missing
+    sets on the encode pool and returns at once; ensure() blocks until
+    every set is built.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        widths: List[int] = IMAGE_DERIVATIVE_WIDTHS,
+        formats: List[str] = IMAGE_DERIVATIVE_FORMATS,
+        quality: int = IMAGE_DERIVATIVE_QUALITY,
+        workers: int = IMAGE_DERIVATIVE_WORKERS
+    ):
+        self.directory = directory
+        self.widths = widths
+        self.formats = encodable_formats(formats)
+        self.quality = quality
+        self.workers = workers
+        self.manifest_name = manifest_name(self.widths, self.formats, self.quality)
+        self._sets: Dict[str, DerivativeSet] = {}
+        self._pending: Dict[str, Future] = {}
+        # Sources Pillow could not read; not retried until the process restarts
+        self._failed: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def directory_for(self, sha256: str) -> Path:
+        return self.directory / sha256[:2] / sha256
+
+    def available(self, sources: List[Tuple[str, Path]]) -> Dict[str, DerivativeSet]:
+        """Complete derivative sets already on disk, by source hash; never encodes"""
+        results: Dict[str, DerivativeSet] = {}
+        for sha256, _ in sources:
+            if sha256 in results:
+                continue
+            with self._lock:
+                known = self._sets.get(sha256)
+            # Derivatives deleted from disk make the set unavailable until it is rebuilt
+            if known is not None and all(variant.path.exists() for variant in known.variants):
+                results[sha256] = known
+                continue
+            loaded = self._load_manifest(sha256)
+            if loaded is not None:
+                self._remember({sha256: loaded})
+                results[sha256] = loaded
+        return results
+
+    def schedule(self, sources: List[Tuple[str, Path]]) -> int:
+        """Queue encoding of every source without a complete set; returns how many were queued"""
+        available = self.available(sources)
+        queued = 0
+        for sha256, path in sources:
+            with self._lock:
+                if sha256 in available or sha256 in self._pending or sha256 in self._failed:
+                    continue
+                future = get_background_executor(self.workers).submit(
+                    build_derivatives, path, self.directory_for(sha256), self.widths, self.formats, self.quality
+                )
+                self._pending[sha256] = future
+            future.add_done_callback(functools.partial(self._built, sha256, path))
+            queued += 1
+        return queued
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def ensure(self, sources: List[Tuple[str, Path]]) -> Dict[str, DerivativeSet]:
+        """Derivatives of every (sha256, path) source, encoding those missing; blocks until done
+
+        Sources Pillow cannot read are logged and left out.
+        """
+        results = self.available(sources)
+        missing = list({sha256: (sha256, path) for sha256, path in sources if sha256 not in results}.values())
+
+        arguments = [(path, self.directory_for(sha256), self.widths, self.formats, self.quality) for sha256, path in missing]
+        if self.workers <= 1 or len(missing) <= 1:
+            outcomes = [self._build(*args) for args in arguments]
+        else:
+            executor = get_derivative_executor()
+            futures = [executor.submit(build_derivatives, *args) for args in arguments]
+            outcomes = [self._outcome(future) for future in futures]
+
+        built = {}
+        for (sha256, path), outcome in zip(missing, outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Could not build derivatives of {path.name}: {outcome}")
+                continue
+            built[sha256] = self._derivative_set(sha256, *outcome)
+        self._remember(built)
+        results.update(built)
+        return results
+
+    def _built(self, sha256: str, path: Path, future: Future) -> None:
+        outcome = self._outcome(future)
+        with self._lock:
+            self._pending.pop(sha256, None)
+        if isinstance(outcome, BaseException):
+            if not future.cancelled():
+                logger.warning(f"Could not build derivatives of {path.name}: {outcome}")
+                with self._lock:
+                    self._failed.add(sha256)
+            return
+        self._remember({sha256: self._derivative_set(sha256, *outcome)})
+        logger.info(f"Built {len(outcome[3])} derivatives of {path.name}")
+
+    def _load_manifest(self, sha256: str) -> Optional[DerivativeSet]:
+        try:
+            manifest = json.loads((self.directory_for(sha256) / self.manifest_name).read_bytes())
+        except (FileNotFoundError, ValueError):
+            return None
+        derivatives = self._derivative_set(
+            sha256, manifest['width'], manifest['height'], manifest['sourceFormat'], manifest['variants']
+        )
+        if not all(variant.path.exists() for variant in derivatives.variants):
+            return None
+        return derivatives
+
+    def _derivative_set(self, sha256: str, width: int, height: int, source_format: str, written: List) -> DerivativeSet:
+        directory = self.directory_for(sha256)
+        variants = tuple(Variant(w, name, directory / filename) for w, name, filename in written)
+        return DerivativeSet(sha256, width, height, source_format, variants)
+
+    def _remember(self, sets: Dict[str, DerivativeSet]) -> None:
+        with self._lock:
+            if len(self._sets) + len(sets) > MAX_MEMOIZED_SETS:
+                self._sets.clear()
+            self._sets.update(sets)
+
+    @staticmethod
+    def _build(*args) -> Any:
+        try:
+            return build_derivatives(*args)
+        except Exception as e:
+            return e
+
+    @staticmethod
+    def _outcome(future) -> Any:
+        try:
+            return future.result()
+        except BaseException as e:
+            return e
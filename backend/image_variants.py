@@ -0,0 +1,174 @@
+"""On-demand image variants: uploads resized and re-encoded per request, cached on disk
+
+A variant is named by the upload's SHA-256 and the transform parameters,
+so its bytes never change: it can carry a strong ETag and be cached as
+immutable. Rendered variants live in a size-bounded LRU directory;
+concurrent requests for a variant that isn't cached yet share one encode.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, Optional
+
+from export_cache import open_cached
+from image_derivatives import (
+    FORMATS,
+    IMAGE_DERIVATIVE_WORKERS,
+    get_derivative_executor,
+    render_variant,
+    shutdown_derivative_executor
+)
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANT_CACHE_MAX_BYTES = int(os.environ.get('IMAGE_VARIANT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Largest width or height a variant can be asked for
+MAX_VARIANT_DIMENSION = 4096
+DEFAULT_VARIANT_QUALITY = 75
+
+
+@dataclass(frozen=True)
+class VariantParams:
+    width: Optional[int]
+    height: Optional[int]
+    fit: str
+    format: str
+    quality: int
+
+    def filename(self, sha256: str) -> str:
+        """Cache filename; PNG ignores quality, so it is left out of the name"""
+        quality = '' if self.format == 'png' else f"-q{self.quality}"
+        return f"{sha256}-{self.width or ''}x{self.height or ''}-{self.fit}{quality}.{FORMATS[self.format][2]}"
+
+    def etag(self, sha256: str) -> str:
+        return '"' + hashlib.sha256(self.filename(sha256).encode('utf-8')).hexdigest()[:32] + '"'
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.format][1]
+
+
+class VariantCache:
+    """Size-bounded LRU of rendered variants under <directory>/<sha[:2]>/
+
+    Like the export cache, recency is the file mtime, refreshed on every
+    hit, the least recently used files go once the directory grows past
+    max_bytes, and hits are handed out as open files so an eviction can't
+    cut a response short.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path_for(self, filename: str) -> Path:
+        return self.directory / filename[:2] / filename
+
+    def open(self, filename: str) -> Optional[BinaryIO]:
+        """The cached variant opened for reading, None on a miss; the caller closes it"""
+        return open_cached(self.path_for(filename))
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Remove least recently used variants until the cache fits, never `keep`"""
+        with self._lock:
+            variants = []
+            for path in self.directory.glob("??/*"):
+                if path.name.startswith('.') or path == keep:
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                variants.append((stat.st_mtime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in variants)
+            for _, size, path in sorted(variants):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+                logger.info(f"Evicted image variant {path.name}")
+
+
+class ImageVariants:
+    """Serves variants from the cache, encoding each missing one once however many requests wait for it"""
+
+    def __init__(self, cache: VariantCache, source_path: Callable[[str], Awaitable[Optional[Path]]]):
+        """
+        Args:
+            cache: Where rendered variants are kept
+            source_path: Local file of the upload with a given SHA-256, None if unknown
+        """
+        self.cache = cache
+        self.source_path = source_path
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.encodes = 0
+        self.coalesced = 0
+
+    async def get(self, sha256: str, params: VariantParams) -> Optional[BinaryIO]:
+        """The rendered variant opened for reading; None when no upload has this hash
+
+        The caller closes the file.
+        """
+        filename = params.filename(sha256)
+        f = self.cache.open(filename)
+        if f is not None:
+            self.hits += 1
+            return f
+
+        while True:
+            render = self._in_flight.get(filename)
+            if render is None:
+                render = asyncio.ensure_future(self._render(sha256, params, filename))
+                self._in_flight[filename] = render
+                render.add_done_callback(lambda _: self._in_flight.pop(filename, None))
+            else:
+                self.coalesced += 1
+            # A client going away must not cancel an encode other requests are waiting for
+            if await asyncio.shield(render) is None:
+                return None
+            f = self.cache.open(filename)
+            if f is not None:
+                return f
+            # Another render's eviction removed it before it could be opened: render it again
+
+    async def _render(self, sha256: str, params: VariantParams, filename: str) -> Optional[Path]:
+        source = await self.source_path(sha256)
+        if source is None:
+            return None
+
+        target = self.cache.path_for(filename)
+        start = time.perf_counter()
+        self.encodes += 1
+        arguments = (source, target, params.width, params.height, params.fit, params.format, params.quality)
+        loop = asyncio.get_running_loop()
+        if IMAGE_DERIVATIVE_WORKERS <= 1:
+            await loop.run_in_executor(None, render_variant, *arguments)
+        else:
+            try:
+                await loop.run_in_executor(get_derivative_executor(), render_variant, *arguments)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory on a huge image); start a fresh pool next time
+                shutdown_derivative_executor()
+                raise
+        logger.info(f"Rendered image variant {filename} in {(time.perf_counter() - start) * 1000:.0f} ms")
+        await loop.run_in_executor(None, self.cache.evict, target)
+        return target
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "encodes": self.encodes,
+            "coalesced": self.coalesced,
+            "inFlight": len(self._in_flight),
+            "maxBytes": self.cache.max_bytes
+        }
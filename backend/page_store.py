@@ -0,0 +1,317 @@
+"""Where site pages are stored
+
+- embedded (default): a `pages` array inside the site document
+- collection: one document per page in the `pages` collection, keyed by
+  (site_id, id) and ordered by `order`; the site document keeps the rest
+
+PAGE_STORAGE selects the layout. Both stores bump the site's revision and
+updatedAt on every page change, so revisions, delta syncs and the export
+cache behave the same either way. move_pages_to_collection() migrates
+embedded sites to the collection layout.
+"""
+import logging
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, DeleteMany, ReplaceOne, ReturnDocument, UpdateOne
+
+from site_delta import PAGE_STRUCTURE_OPS, BLOCK_OPS, load_pipeline, revision_filter
+
+
+logger = logging.getLogger(__name__)
+
+PAGE_STORAGE = os.environ.get('PAGE_STORAGE', 'embedded')
+
+# Page documents carry their site and position; neither is part of the API's Page
+PAGE_PROJECTION = {"_id": 0, "site_id": 0, "order": 0}
+_PAGE_PATH = re.compile(r'^pages\.(\d+)\.(\w+)$')
+
+
+def _touch(now: datetime) -> Dict[str, Any]:
+    return {"$set": {"updatedAt": now}, "$inc": {"revision": 1}}
+
+
+class EmbeddedPageStore:
+    """Pages as an array inside the site document"""
+
+    name = 'embedded'
+
+    def __init__(self, db):
+        self.db = db
+
+    async def load_site(self, site_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.sites.find_one({"id": site_id}, {"_id": 0})
+
+    async def load_site_fields(self, site_id: str, *fields: str) -> Optional[Dict[str, Any]]:
+        """Only the given fields of the site document (never pages), plus id; None when the site doesn't exist"""
+        return await self.db.sites.find_one({"id": site_id}, {"_id": 0, "id": 1, **{field: 1 for field in fields}})
+
+    async def load_page(self, site_id: str, page_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """(site id and name, page); either is None when missing"""
+        site = await self.db.sites.find_one(
+            {"id": site_id},
+            {"_id": 0, "id": 1, "name": 1, "pages": {"$elemMatch": {"id": page_id}}}
+        )
+        if not site:
+            return None, None
+        pages = site.pop('pages', None)
+        return site, pages[0] if pages else None
+
+    def detach_pages(self, site_fields: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Pages to store separately from a site document about to be written; None keeps them in it"""
+        return None
+
+    async def delete_pages(self, site_id: str) -> None:
+        """Pages go with the site document"""
+
+    async def fill_page_counts(self, sites: List[Dict[str, Any]]) -> None:
+        """Set pageCount on listed sites; the listing pipeline already counted the embedded array"""
+
+    async def add_page(self, site_id: str, page: Dict[str, Any], now: datetime) -> bool:
+        """Append a page; False when the site doesn't exist"""
+        update = _touch(now)
+        update["$push"] = {"pages": page}
+        result = await self.db.sites.update_one({"id": site_id}, update)
+        return result.matched_count > 0
+
+    async def update_page(self, site_id: str, page_id: str, fields: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        """$set fields on one page in place and return it; None when the site or page doesn't exist"""
+        update_fields = {f"pages.$[p].{key}": value for key, value in fields.items()}
+        update_fields["updatedAt"] = now
+
+        updated_site = await self.db.sites.find_one_and_update(
+            {"id": site_id, "pages.id": page_id},
+            {"$set": update_fields, "$inc": {"revision": 1}},
+            # MongoDB rejects array filters no update path refers to
+            array_filters=[{"p.id": page_id}] if fields else None,
+            projection={"_id": 0, "pages": {"$elemMatch": {"id": page_id}}},
+            return_document=ReturnDocument.AFTER
+        )
+        return updated_site['pages'][0] if updated_site else None
+
+    async def delete_page(self, site_id: str, page_id: str, now: datetime) -> bool:
+        """False when the site doesn't exist"""
+        update = _touch(now)
+        update["$pull"] = {"pages": {"id": page_id}}
+        result = await self.db.sites.update_one({"id": site_id}, update)
+        return result.matched_count > 0
+
+    async def load_for_delta(self, site_id: str, operations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """The site's revision and the pages as load_pipeline describes them"""
+        loaded = await self.db.sites.aggregate(load_pipeline(site_id, operations)).to_list(1)
+        return loaded[0] if loaded else None
+
+    async def apply_delta(self, site_id: str, base_revision: int, pages: List[Dict[str, Any]], update: Dict[str, Any]) -> bool:
+        """Write a build_update result if the site is still at base_revision"""
+        result = await self.db.sites.update_one(
+            revision_filter(site_id, base_revision),
+            {"$set": update, "$inc": {"revision": 1}}
+        )
+        return result.matched_count > 0
+
+
+class CollectionPageStore(EmbeddedPageStore):
+    """Pages as documents of their own in the `pages` collection
+
+    Page writes touch one small document instead of rewriting into a site
+    document that grows with every page, and site-level reads never load
+    page content. The site document is updated separately, without a
+    transaction, to bump its revision.
+    """
+
+    name = 'collection'
+
+    async def _pages(self, site_id: str, projection: Dict[str, Any] = PAGE_PROJECTION, **filters) -> List[Dict[str, Any]]:
+        return await self.db.pages.find({"site_id": site_id, **filters}, projection).sort("order", ASCENDING).to_list(None)
+
+    async def load_site(self, site_id: str) -> Optional[Dict[str, Any]]:
+        site = await self.db.sites.find_one({"id": site_id}, {"_id": 0, "nextPageOrder": 0})
+        if site is not None:
+            site['pages'] = await self._pages(site_id)
+        return site
+
+    async def load_page(self, site_id: str, page_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        site = await self.load_site_fields(site_id, "name")
+        if not site:
+            return None, None
+        return site, await self.db.pages.find_one({"site_id": site_id, "id": page_id}, PAGE_PROJECTION)
+
+    def detach_pages(self, site_fields: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        return site_fields.pop('pages', None)
+
+    async def replace_pages(self, site_id: str, pages: List[Dict[str, Any]]) -> None:
+        """Store exactly these pages, in this order"""
+        operations = [
+            ReplaceOne({"site_id": site_id, "id": page['id']}, {**page, "site_id": site_id, "order": i}, upsert=True)
+            for i, page in enumerate(pages)
+        ]
+        operations.append(DeleteMany({"site_id": site_id, "id": {"$nin": [page['id'] for page in pages]}}))
+        await self.db.pages.bulk_write(operations, ordered=True)
+        # Pages added from now on go after these
+        await self.db.sites.update_one({"id": site_id}, {"$max": {"nextPageOrder": len(pages)}})
+
+    async def delete_pages(self, site_id: str) -> None:
+        await self.db.pages.delete_many({"site_id": site_id})
+
+    async def fill_page_counts(self, sites: List[Dict[str, Any]]) -> None:
+        counts = {
+            group['_id']: group['count']
+            for group in await self.db.pages.aggregate([
+                {"$match": {"site_id": {"$in": [site['id'] for site in sites]}}},
+                {"$group": {"_id": "$site_id", "count": {"$sum": 1}}}
+            ]).to_list(None)
+        }
+        for site in sites:
+            site['pageCount'] = counts.get(site['id'], 0)
+
+    async def add_page(self, site_id: str, page: Dict[str, Any], now: datetime) -> bool:
+        order = await self._claim_page_order(site_id, now)
+        if order is None:
+            return False
+        await self.db.pages.insert_one({**page, "site_id": site_id, "order": order})
+        return True
+
+    async def _claim_page_order(self, site_id: str, now: datetime) -> Optional[int]:
+        """Take the next page position from the site's nextPageOrder counter while touching the site
+
+        The $inc is atomic, so concurrent addPage operations never share a
+        position. None if the site doesn't exist.
+        """
+        while True:
+            update = _touch(now)
+            update["$inc"]["nextPageOrder"] = 1
+            site = await self.db.sites.find_one_and_update(
+                {"id": site_id, "nextPageOrder": {"$exists": True}},
+                update,
+                projection={"_id": 0, "nextPageOrder": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+            if site is not None:
+                return site['nextPageOrder']
+
+            # Sites stored before the counter existed start it after their last page;
+            # of concurrent seeds only the first applies, and everyone retries the $inc
+            last = await self.db.pages.find_one({"site_id": site_id}, {"order": 1}, sort=[("order", DESCENDING)])
+            seeded = await self.db.sites.update_one(
+                {"id": site_id, "nextPageOrder": {"$exists": False}},
+                {"$set": {"nextPageOrder": last['order'] + 1 if last else 0}}
+            )
+            if seeded.matched_count == 0 and await self.db.sites.find_one({"id": site_id}, {"_id": 1}) is None:
+                return None
+
+    async def update_page(self, site_id: str, page_id: str, fields: Dict[str, Any], now: datetime) -> Optional[Dict[str, Any]]:
+        if fields:
+            page = await self.db.pages.find_one_and_update(
+                {"site_id": site_id, "id": page_id},
+                {"$set": fields},
+                projection=PAGE_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            page = await self.db.pages.find_one({"site_id": site_id, "id": page_id}, PAGE_PROJECTION)
+        if page is not None:
+            await self.db.sites.update_one({"id": site_id}, _touch(now))
+        return page
+
+    async def delete_page(self, site_id: str, page_id: str, now: datetime) -> bool:
+        result = await self.db.sites.update_one({"id": site_id}, _touch(now))
+        if result.matched_count == 0:
+            return False
+        await self.db.pages.delete_one({"site_id": site_id, "id": page_id})
+        return True
+
+    async def load_for_delta(self, site_id: str, operations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        site = await self.db.sites.find_one({"id": site_id}, {"_id": 0, "revision": 1})
+        if site is None:
+            return None
+
+        if any(op['op'] in PAGE_STRUCTURE_OPS for op in operations):
+            site['pages'] = await self._pages(site_id)
+            return site
+
+        # Same shape as load_pipeline: every page's id, plus blocks for pages a block operation touches
+        site['pages'] = await self._pages(site_id, {"_id": 0, "id": 1})
+        touched = list({op['pageId'] for op in operations if op['op'] in BLOCK_OPS})
+        if touched:
+            blocks = {
+                page['id']: page.get('blocks', [])
+                for page in await self._pages(site_id, {"_id": 0, "id": 1, "blocks": 1}, id={"$in": touched})
+            }
+            for page in site['pages']:
+                if page['id'] in blocks:
+                    page['blocks'] = blocks[page['id']]
+        return site
+
+    async def apply_delta(self, site_id: str, base_revision: int, pages: List[Dict[str, Any]], update: Dict[str, Any]) -> bool:
+        """Claim the next revision on the site document, then write the page changes
+
+        build_update addresses pages by position (pages.<i>.<field>); those
+        positions are mapped back to page ids of the loaded pages.
+        """
+        site_fields: Dict[str, Any] = {}
+        page_fields: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        for path, value in update.items():
+            match = _PAGE_PATH.match(path)
+            if match:
+                page_fields[pages[int(match.group(1))]['id']][match.group(2)] = value
+            elif path != 'pages':
+                site_fields[path] = value
+
+        result = await self.db.sites.update_one(
+            revision_filter(site_id, base_revision),
+            {"$set": site_fields, "$inc": {"revision": 1}}
+        )
+        if result.matched_count == 0:
+            return False
+
+        if 'pages' in update:
+            await self.replace_pages(site_id, update['pages'])
+        elif page_fields:
+            await self.db.pages.bulk_write([
+                UpdateOne({"site_id": site_id, "id": page_id}, {"$set": fields})
+                for page_id, fields in page_fields.items()
+            ], ordered=False)
+        return True
+
+
+PAGE_STORES = {store.name: store for store in (EmbeddedPageStore, CollectionPageStore)}
+
+
+def get_page_store(db, storage: str = PAGE_STORAGE) -> EmbeddedPageStore:
+    if storage not in PAGE_STORES:
+        raise ValueError(f"PAGE_STORAGE must be one of {', '.join(PAGE_STORES)}, not {storage!r}")
+    return PAGE_STORES[storage](db)
+
+
+async def move_pages_to_collection(db, batch_size: int = 100) -> Dict[str, int]:
+    """Move every embedded pages array into the pages collection
+
+    Each site is moved with its pages copied first and the array removed
+    only while the site is still at the revision that was copied, so an
+    edit made meanwhile is never lost: that site is left embedded and
+    picked up by the next run. Safe to run repeatedly.
+
+    Returns:
+        Counts of sites moved, pages moved and sites left for a later run
+    """
+    store = CollectionPageStore(db)
+    counts = {"sites": 0, "pages": 0, "retry": 0}
+    cursor = db.sites.find({"pages": {"$exists": True}}, {"_id": 0, "id": 1, "revision": 1, "pages": 1}, batch_size=batch_size)
+    async for site in cursor:
+        await store.replace_pages(site['id'], site['pages'])
+        result = await db.sites.update_one(
+            revision_filter(site['id'], site.get('revision', 0)),
+            {"$unset": {"pages": ""}}
+        )
+        if result.modified_count:
+            counts["sites"] += 1
+            counts["pages"] += len(site['pages'])
+        else:
+            counts["retry"] += 1
+        if (counts["sites"] + counts["retry"]) % batch_size == 0:
+            logger.info(f"Page migration: {counts['sites']} site(s) moved, {counts['retry']} changed meanwhile")
+    logger.info(f"Page migration finished: {counts}")
+    return counts
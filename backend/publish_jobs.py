@@ -0,0 +1,224 @@
+"""Background publish jobs: persisted job state, per-site publish locks and progress streaming"""
+import asyncio
+import json
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from db_codec import json_default, utc_now
+from ftp_publish import PublishCancelled, PublishProgress
+
+
+logger = logging.getLogger(__name__)
+
+JOB_TERMINAL_STATES = {"succeeded", "failed", "cancelled"}
+PROGRESS_FLUSH_INTERVAL = 0.5
+# A lock outlives a crashed worker by at most this long; running jobs keep refreshing it
+SITE_LOCK_TTL = timedelta(minutes=5)
+# How often a lock held through site_lock() is pushed forward
+SITE_LOCK_REFRESH_INTERVAL = SITE_LOCK_TTL.total_seconds() / 5
+
+PublishRunner = Callable[[PublishProgress], Awaitable[Dict[str, Any]]]
+
+
+class SitePublishLocked(Exception):
+    """Another publish of the same site is already in progress"""
+
+    def __init__(self, site_id: str, owner: Optional[str]):
+        super().__init__(f"Site {site_id} is already being published")
+        self.site_id = site_id
+        self.owner = owner
+
+
+class PublishJobManager:
+    """Runs publishes as background tasks and persists their state in MongoDB
+
+    Job documents live in `publish_jobs`; the per-site lock is a document in
+    `publish_locks` keyed by site id, so two workers can't publish one site at once.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    # ----- site locks -----
+
+    async def acquire_site_lock(self, site_id: str, owner: str) -> None:
+        now = utc_now()
+        lock = {"owner": owner, "acquiredAt": now, "expiresAt": now + SITE_LOCK_TTL}
+        try:
+            await self.db.publish_locks.insert_one({"_id": site_id, **lock})
+        except DuplicateKeyError:
+            # Take over a lock left behind by a crashed worker
+            stolen = await self.db.publish_locks.find_one_and_update(
+                {"_id": site_id, "expiresAt": {"$lt": now}},
+                {"$set": lock}
+            )
+            if stolen is None:
+                current = await self.db.publish_locks.find_one({"_id": site_id})
+                raise SitePublishLocked(site_id, (current or {}).get("owner"))
+
+    async def refresh_site_lock(self, site_id: str, owner: str) -> None:
+        expires_at = utc_now() + SITE_LOCK_TTL
+        await self.db.publish_locks.update_one(
+            {"_id": site_id, "owner": owner},
+            {"$set": {"expiresAt": expires_at}}
+        )
+
+    async def release_site_lock(self, site_id: str, owner: str) -> None:
+        await self.db.publish_locks.delete_one({"_id": site_id, "owner": owner})
+
+    @asynccontextmanager
+    async def site_lock(self, site_id: str, owner: Optional[str] = None):
+        """Hold the site lock for the duration of the block, refreshing it so it outlives SITE_LOCK_TTL"""
+        owner = owner or str(uuid.uuid4())
+        await self.acquire_site_lock(site_id, owner)
+        heartbeat = asyncio.create_task(self._keep_site_lock(site_id, owner))
+        try:
+            yield owner
+        finally:
+            heartbeat.cancel()
+            await self.release_site_lock(site_id, owner)
+
+    async def _keep_site_lock(self, site_id: str, owner: str) -> None:
+        while True:
+            await asyncio.sleep(SITE_LOCK_REFRESH_INTERVAL)
+            try:
+                await self.refresh_site_lock(site_id, owner)
+            except Exception as e:
+                # The next beat tries again; the lock only lapses after SITE_LOCK_TTL
+                logger.warning(f"Could not refresh publish lock of site {site_id}: {e}")
+
+    # ----- jobs -----
+
+    async def start(self, site_id: str, runner: PublishRunner, options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Create a job, take the site lock and run the publish in the background
+
+        Raises:
+            SitePublishLocked: if the site is already being published
+        """
+        job_id = str(uuid.uuid4())
+        await self.acquire_site_lock(site_id, job_id)
+
+        now = utc_now()
+        job = {
+            "id": job_id,
+            "site_id": site_id,
+            "status": "queued",
+            "options": options or {},
+            "progress": PublishProgress().snapshot(),
+            "result": None,
+            "error": None,
+            "cancelRequested": False,
+            "createdAt": now,
+            "updatedAt": now,
+            "finishedAt": None
+        }
+        await self.db.publish_jobs.insert_one(dict(job))
+
+        task = asyncio.create_task(self._run(job_id, site_id, runner))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return job
+
+    async def fail_interrupted(self) -> int:
+        """Mark unfinished jobs whose worker stopped as failed and release their site locks
+
+        A running job updates its document every PROGRESS_FLUSH_INTERVAL
+        from the process that started it, so one not updated for
+        SITE_LOCK_TTL has lost that process; its lock has lapsed by then too.
+        Jobs of other live workers keep being updated and are left alone.
+        Left unmarked, a dead job's event stream never ends. Returns the
+        number of jobs marked.
+        """
+        stale = utc_now() - SITE_LOCK_TTL
+        interrupted = 0
+        async for job in self.db.publish_jobs.find(
+            {"status": {"$nin": list(JOB_TERMINAL_STATES)}, "updatedAt": {"$lt": stale}},
+            {"_id": 0, "id": 1, "site_id": 1}
+        ):
+            now = utc_now()
+            marked = await self.db.publish_jobs.update_one(
+                {"id": job["id"], "status": {"$nin": list(JOB_TERMINAL_STATES)}, "updatedAt": {"$lt": stale}},
+                {"$set": {"status": "failed", "error": "Publish interrupted: the server running it stopped", "updatedAt": now, "finishedAt": now}}
+            )
+            if not marked.modified_count:
+                continue
+            # Only a lapsed lock; a live one belongs to a worker still publishing
+            await self.db.publish_locks.delete_one({"_id": job["site_id"], "owner": job["id"], "expiresAt": {"$lt": now}})
+            interrupted += 1
+        if interrupted:
+            logger.warning(f"Marked {interrupted} interrupted publish job(s) as failed")
+        return interrupted
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.db.publish_jobs.find_one({"id": job_id}, {"_id": 0})
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Request cancellation; the worker running the job picks it up on its next progress flush"""
+        await self.db.publish_jobs.update_one(
+            {"id": job_id, "status": {"$nin": list(JOB_TERMINAL_STATES)}},
+            {"$set": {"cancelRequested": True, "updatedAt": utc_now()}}
+        )
+        return await self.get(job_id)
+
+    async def _update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        fields["updatedAt"] = utc_now()
+        await self.db.publish_jobs.update_one({"id": job_id}, {"$set": fields})
+
+    async def _report_progress(self, job_id: str, site_id: str, progress: PublishProgress) -> None:
+        """Flush progress to MongoDB and watch for cancellation until cancelled by _run"""
+        while True:
+            await asyncio.sleep(PROGRESS_FLUSH_INTERVAL)
+            await self._update(job_id, {"progress": progress.snapshot()})
+            await self.refresh_site_lock(site_id, job_id)
+            job = await self.db.publish_jobs.find_one({"id": job_id}, {"cancelRequested": 1})
+            if job and job.get("cancelRequested"):
+                progress.cancelled.set()
+
+    async def _run(self, job_id: str, site_id: str, runner: PublishRunner) -> None:
+        progress = PublishProgress()
+        reporter = None
+        try:
+            await self._update(job_id, {"status": "running"})
+            reporter = asyncio.create_task(self._report_progress(job_id, site_id, progress))
+            result = await runner(progress)
+            final = {"status": "succeeded", "result": result}
+        except PublishCancelled:
+            final = {"status": "cancelled"}
+        except Exception as e:
+            # HTTPException carries its message in detail
+            error = getattr(e, "detail", None) or str(e)
+            logger.warning(f"Publish job {job_id} for site {site_id} failed: {error}")
+            final = {"status": "failed", "error": error}
+        finally:
+            if reporter:
+                reporter.cancel()
+            await self.release_site_lock(site_id, job_id)
+
+        final["progress"] = progress.snapshot()
+        final["finishedAt"] = utc_now()
+        await self._update(job_id, final)
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """Server-Sent Events feed of the job document until it reaches a terminal state"""
+        last = None
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+                return
+
+            payload = json.dumps(job, default=json_default)
+            if payload != last:
+                last = payload
+                yield f"event: progress\ndata: {payload}\n\n"
+
+            if job["status"] in JOB_TERMINAL_STATES:
+                yield f"event: done\ndata: {payload}\n\n"
+                return
+            await asyncio.sleep(PROGRESS_FLUSH_INTERVAL)
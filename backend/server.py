@@ -1,37 +1,181 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import BinaryIO, List, Literal, Optional, Dict, Any, Iterator, Set, Tuple, Union
 import uuid
+import time
 from datetime import datetime, timezone
 import aiofiles
-import shutil
+from concurrent.futures.process import BrokenProcessPool
+from PIL.Image import DecompressionBombError
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Local modules read their settings from the environment, so import them after .env is loaded
+from ftp_publish import (
+    DEFAULT_FTP_CONNECTIONS,
+    FTPPublishError,
+    ParallelFTPUploader,
+    PublishArtifact,
+    PublishCancelled,
+    PublishProgress,
+    delete_remote_files,
+    ensure_remote_dirs,
+    ftp_check_executor,
+    ftp_executor,
+    manifest_target_key,
+    open_ftp_session,
+    plan_publish,
+    read_remote_manifest,
+    run_ftp,
+    run_ftp_check,
+    write_remote_manifest,
+)
+from publish_jobs import PublishJobManager, SitePublishLocked
+from zip_export import stream_zip
+from export_cache import ExportCache, file_sha256, site_revision
+from html_render import export_asset_url, render_page
+from site_build import StageTimings, render_site_pages, shutdown_render_executor, timed_iter
+from db_codec import CODEC_OPTIONS, datetime_migration, migrate_timestamps, utc_now
+from db_indexes import ensure_indexes
+from fast_json import TrustedJSONResponse, model_defaults
+from site_delta import InvalidOperation, build_update
+from page_store import get_page_store
+from site_cache import should_watch_site_changes, site_cache, watch_site_changes
+from site_listing import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidListing, listing_page, listing_pipeline, parse_fields
+from upload_store import SHA256_PATTERN, InvalidUpload, UploadStore, UploadTooLarge, upload_hash
+from upload_serving import UploadFiles
+from image_derivatives import DerivativeStore, encodable_formats, shutdown_derivative_executor
+from image_variants import (
+    DEFAULT_VARIANT_QUALITY,
+    IMAGE_VARIANT_CACHE_MAX_BYTES,
+    MAX_VARIANT_DIMENSION,
+    ImageVariants,
+    VariantCache,
+    VariantParams,
+)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Timestamps are stored as BSON datetimes and read back timezone-aware
+db = client.get_database(os.environ['DB_NAME'], codec_options=CODEC_OPTIONS)
+
+# Background FTP publishes and per-site publish locks
+publish_jobs = PublishJobManager(db)
+
+# Pages embedded in site documents or in their own collection (PAGE_STORAGE)
+page_store = get_page_store(db)
 
 # Create uploads directory
 UPLOAD_DIR = ROOT_DIR / 'uploads'
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Uploaded images, stored once per distinct content
+upload_store = UploadStore(db, UPLOAD_DIR)
+
+# Resized, re-encoded copies of uploaded images shipped with exports and publishes
+derivative_store = DerivativeStore(UPLOAD_DIR / 'derivatives')
+
+# Sizes of uploaded images rendered on request for the editor (/api/images)
+image_variants = ImageVariants(
+    VariantCache(ROOT_DIR / 'image_cache', IMAGE_VARIANT_CACHE_MAX_BYTES),
+    upload_store.path_of
+)
+
+# Exported site archives, cached per site revision
+export_cache = ExportCache(
+    ROOT_DIR / 'export_cache',
+    max_bytes=int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+)
+
+async def load_site(site_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    """Full site with its pages, from the site cache when possible; the result must not be mutated
+    
+    Without a change stream, a cached site can miss writes made on another
+    worker for up to SITE_CACHE_TTL. Exports and publishes pass fresh=True
+    to read MongoDB instead (refreshing the cache with the result).
+    """
+    if fresh:
+        return await site_cache.reload(site_id, page_store.load_site)
+    return await site_cache.get_or_load(site_id, page_store.load_site)
+
+def invalidate_site(site_id: str) -> None:
+    """Drop everything cached for a site and recount the uploads it references; every write to a site calls this"""
+    site_cache.invalidate(site_id)
+    export_cache.invalidate(site_id)
+    recount_upload_references(site_id)
+
+# Sites whose upload references are being recounted, and those written to again since their recount started
+_reference_recounts: Dict[str, asyncio.Task] = {}
+_stale_references: Set[str] = set()
+
+def recount_upload_references(site_id: str) -> None:
+    """Recount in the background which uploads a site references; a burst of writes shares one recount"""
+    _stale_references.add(site_id)
+    if site_id not in _reference_recounts:
+        task = asyncio.create_task(_recount_upload_references(site_id))
+        _reference_recounts[site_id] = task
+        task.add_done_callback(lambda _: _reference_recounts.pop(site_id, None))
+
+async def _recount_upload_references(site_id: str) -> None:
+    while site_id in _stale_references:
+        _stale_references.discard(site_id)
+        try:
+            site = await page_store.load_site(site_id)
+            # A deleted site references nothing
+            await upload_store.set_site_references(site_id, site_upload_hashes(site) if site else ())
+        except Exception as e:
+            logger.warning(f"Could not recount uploads referenced by site {site_id}: {e}")
+            return
+
+async def backfill_upload_references():
+    """Record the references of every site once, for uploads stored before references were tracked"""
+    if not await upload_store.untracked():
+        return
+    await upload_store.start_tracking()
+    count = 0
+    async for document in db.sites.find({}, {"_id": 0, "id": 1}):
+        site = await page_store.load_site(document['id'])
+        if site:
+            await upload_store.set_site_references(site['id'], site_upload_hashes(site))
+            count += 1
+    logger.info(f"Recorded upload references of {count} sites")
+
+FILE_RESPONSE_CHUNK_SIZE = 64 * 1024
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names this ETag"""
+    header = request.headers.get("if-none-match", "")
+    return etag in [tag.strip() for tag in header.split(",")] or header.strip() == "*"
+
+def open_file_response(file: BinaryIO, media_type: str, headers: Dict[str, str]) -> StreamingResponse:
+    """Stream a file opened beforehand, so a cache eviction unlinking it meanwhile can't cut it short"""
+    def chunks() -> Iterator[bytes]:
+        with file:
+            yield from iter(lambda: file.read(FILE_RESPONSE_CHUNK_SIZE), b'')
+    
+    headers = {**headers, "Content-Length": str(os.fstat(file.fileno()).st_size)}
+    return StreamingResponse(chunks(), media_type=media_type, headers=headers)
+
 # Create the main app without a prefix
 app = FastAPI()
 
-# Mount uploads directory for static file serving
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+# Mount uploads directory for static file serving: hashed uploads are cached as immutable,
+# with conditional and range requests
+app.mount("/uploads", UploadFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -120,8 +264,10 @@ class Site(BaseModel):
     status: str = "unpublished"
     pages: List[Page] = []
     siteStyles: SiteStyles = Field(default_factory=SiteStyles)
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-    updatedAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Bumped by every change; delta syncs are applied against it
+    revision: int = 0
+    createdAt: datetime = Field(default_factory=utc_now)
+    updatedAt: datetime = Field(default_factory=utc_now)
 
 class SiteCreate(BaseModel):
     name: str
@@ -139,12 +285,57 @@ class SiteSync(BaseModel):
     pages: List[Page]
     siteStyles: Optional[SiteStyles] = Field(default_factory=SiteStyles)
 
+class SitePatch(BaseModel):
+    """Site-level fields a delta `patch` may set"""
+    name: Optional[str] = None
+    status: Optional[str] = None
+    siteStyles: Optional[SiteStyles] = None
+
+class SiteOperation(BaseModel):
+    """One editor change in a delta sync
+    
+    - addPage: page, optional index
+    - removePage: pageId
+    - reorderPages: pageIds (every page, in the new order)
+    - upsertBlock: pageId, block, optional index (replaces a block with the same id)
+    - deleteBlock: pageId, blockId
+    - patch: fields, on the page pageId or on the site when pageId is omitted
+    """
+    op: Literal['addPage', 'removePage', 'reorderPages', 'upsertBlock', 'deleteBlock', 'patch']
+    pageId: Optional[str] = None
+    page: Optional[Page] = None
+    pageIds: Optional[List[str]] = None
+    block: Optional[Block] = None
+    blockId: Optional[str] = None
+    index: Optional[int] = Field(default=None, ge=0)
+    fields: Optional[Dict[str, Any]] = None
+
+class SiteDelta(BaseModel):
+    """Changes made on top of baseRevision"""
+    baseRevision: int
+    operations: List[SiteOperation]
+
+# Read responses skip re-validation (see fast_json); these fill fields older documents may lack
+PAGE_DEFAULTS = model_defaults(Page, exclude=('id',))
+SITE_DEFAULTS = model_defaults(Site, exclude=('id', 'createdAt', 'updatedAt'))
+
+def site_response(site: Dict[str, Any]) -> TrustedJSONResponse:
+    """A stored site as the Site response, without rebuilding its models"""
+    site = {**SITE_DEFAULTS, **site}
+    site['pages'] = [{**PAGE_DEFAULTS, **page} for page in site['pages']]
+    return TrustedJSONResponse(site)
+
+class SiteListPage(BaseModel):
+    """One page of the site listing; each site holds only the selected fields"""
+    sites: List[Dict[str, Any]]
+    nextCursor: Optional[str] = None
+
 class StatusCheck(BaseModel):
     model_config = ConfigDict(extra="ignore")  # Ignore MongoDB's _id field
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_name: str
-    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    timestamp: datetime = Field(default_factory=utc_now)
 
 class StatusCheckCreate(BaseModel):
     client_name: str
@@ -159,23 +350,13 @@ async def create_status_check(input: StatusCheckCreate):
     status_dict = input.model_dump()
     status_obj = StatusCheck(**status_dict)
     
-    # Convert to dict and serialize datetime to ISO string for MongoDB
-    doc = status_obj.model_dump()
-    doc['timestamp'] = doc['timestamp'].isoformat()
-    
-    _ = await db.status_checks.insert_one(doc)
+    _ = await db.status_checks.insert_one(status_obj.model_dump())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
 async def get_status_checks():
     # Exclude MongoDB's _id field from the query results
     status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO string timestamps back to datetime objects
-    for check in status_checks:
-        if isinstance(check['timestamp'], str):
-            check['timestamp'] = datetime.fromisoformat(check['timestamp'])
-    
     return status_checks
 
 
@@ -200,43 +381,47 @@ async def create_site(site_input: SiteCreate):
         pages=[home_page]
     )
     
-    # Convert to dict for MongoDB
     site_dict = site.model_dump()
-    site_dict['createdAt'] = site_dict['createdAt'].isoformat()
-    site_dict['updatedAt'] = site_dict['updatedAt'].isoformat()
-    
+    pages = page_store.detach_pages(site_dict)
     await db.sites.insert_one(site_dict)
+    if pages is not None:
+        await page_store.replace_pages(site.id, pages)
     return site
 
-@api_router.get("/sites", response_model=List[Site])
-async def get_sites():
-    """Get all sites"""
-    sites = await db.sites.find({}, {"_id": 0}).to_list(1000)
-    
-    # Convert ISO timestamps back to datetime
-    for site in sites:
-        if isinstance(site.get('createdAt'), str):
-            site['createdAt'] = datetime.fromisoformat(site['createdAt'])
-        if isinstance(site.get('updatedAt'), str):
-            site['updatedAt'] = datetime.fromisoformat(site['updatedAt'])
+@api_router.get("/sites", response_model=SiteListPage)
+async def get_sites(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """List sites, most recently updated first
+    
+    Returns summaries (id, name, status, pageCount, createdAt, updatedAt) by
+    default; `fields` selects others as a comma separated list, e.g.
+    `fields=name,revision,siteStyles`. Pass `nextCursor` back as `cursor`
+    for the following page; it is null on the last one.
+    """
+    try:
+        selected = parse_fields(fields)
+        pipeline = listing_pipeline(selected, limit, cursor)
+    except InvalidListing as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return sites
+    sites = await db.sites.aggregate(pipeline).to_list(limit + 1)
+    listing = listing_page(sites, selected, limit)
+    if 'pageCount' in selected:
+        await page_store.fill_page_counts(listing['sites'])
+    return TrustedJSONResponse(listing)
 
 @api_router.get("/sites/{site_id}", response_model=Site)
 async def get_site(site_id: str):
     """Get a specific site by ID"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
+    site = await load_site(site_id)
     
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
     
-    # Convert ISO timestamps
-    if isinstance(site.get('createdAt'), str):
-        site['createdAt'] = datetime.fromisoformat(site['createdAt'])
-    if isinstance(site.get('updatedAt'), str):
-        site['updatedAt'] = datetime.fromisoformat(site['updatedAt'])
-    
-    return site
+    return site_response(site)
 
 @api_router.put("/sites/{site_id}", response_model=Site)
 async def update_site(site_id: str, site_update: SiteUpdate):
@@ -246,39 +431,134 @@ async def update_site(site_id: str, site_update: SiteUpdate):
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
     
-    update_data['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    update_data['updatedAt'] = utc_now()
+    pages = page_store.detach_pages(update_data)
     
     result = await db.sites.update_one(
         {"id": site_id},
-        {"$set": update_data}
+        {"$set": update_data, "$inc": {"revision": 1}}
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Site not found")
+    if pages is not None:
+        await page_store.replace_pages(site_id, pages)
     
+    invalidate_site(site_id)
     return await get_site(site_id)
 
 @api_router.post("/sites/sync")
 async def sync_site(site_data: SiteSync):
-    """Sync site from frontend - Create if doesn't exist, Update if exists"""
-    existing_site = await db.sites.find_one({"id": site_data.id}, {"_id": 0})
+    """Sync site from frontend - Create if doesn't exist, Update if exists
     
+    One upsert both creates and updates; createdAt is only written on
+    insert. The unique index on sites.id turns a concurrent first sync of
+    the same site into a duplicate key error, which is retried as an update.
+    """
     site_dict = site_data.model_dump()
+    now = utc_now()
+    site_dict['updatedAt'] = now
+    pages = page_store.detach_pages(site_dict)
+    
+    for attempt in range(2):
+        try:
+            previous = await db.sites.find_one_and_update(
+                {"id": site_data.id},
+                {
+                    "$set": site_dict,
+                    "$setOnInsert": {"createdAt": now},
+                    "$inc": {"revision": 1}
+                },
+                projection={"_id": 0, "revision": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            break
+        except DuplicateKeyError:
+            if attempt:
+                raise
+    
+    if pages is not None:
+        await page_store.replace_pages(site_data.id, pages)
+    
+    # A created site may still have cached entries: a cached miss, or archives of a deleted site with this id
+    invalidate_site(site_data.id)
+    if previous is None:
+        return {"success": True, "action": "created", "site_id": site_data.id, "revision": 1}
+    return {"success": True, "action": "updated", "site_id": site_data.id, "revision": previous.get('revision', 0) + 1}
+
+def validate_site_operation(op: SiteOperation) -> Dict[str, Any]:
+    """Check an operation carries what its kind needs and return it as a plain dict"""
+    required = {
+        'addPage': ['page'],
+        'removePage': ['pageId'],
+        'reorderPages': ['pageIds'],
+        'upsertBlock': ['pageId', 'block'],
+        'deleteBlock': ['pageId', 'blockId'],
+        'patch': ['fields']
+    }[op.op]
+    missing = [name for name in required if getattr(op, name) is None]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"{op.op} requires {', '.join(missing)}")
+    
+    operation = op.model_dump(exclude_none=True)
+    if op.op == 'patch':
+        model, target = (SitePatch, 'site') if op.pageId is None else (PageUpdate, 'page')
+        unknown = set(op.fields) - set(model.model_fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Cannot patch {target} fields: {', '.join(sorted(unknown))}")
+        nulls = [name for name, value in op.fields.items() if value is None]
+        if nulls:
+            raise HTTPException(status_code=400, detail=f"Cannot set {target} fields to null: {', '.join(sorted(nulls))}")
+        # Raises ValidationError (a ValueError) on wrong types; nested models are dumped whole
+        operation['fields'] = model.model_validate(op.fields).model_dump(include=set(op.fields))
+    return operation
+
+@api_router.post("/sites/{site_id}/delta")
+async def sync_site_delta(site_id: str, delta: SiteDelta):
+    """Apply editor operations made on top of baseRevision
+    
+    Only the touched parts of the site are read and written, in a single
+    update guarded by the revision, so an autosave costs the size of the
+    change instead of the size of the site. If the site moved past
+    baseRevision, nothing is applied and 409 returns the current revision.
+    """
+    try:
+        operations = [validate_site_operation(op) for op in delta.operations]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if existing_site:
-        # Update existing site
-        site_dict['updatedAt'] = datetime.now(timezone.utc).isoformat()
-        site_dict['createdAt'] = existing_site.get('createdAt', datetime.now(timezone.utc).isoformat())
-        
-        await db.sites.replace_one({"id": site_data.id}, site_dict)
-        return {"success": True, "action": "updated", "site_id": site_data.id}
-    else:
-        # Create new site
-        site_dict['createdAt'] = datetime.now(timezone.utc).isoformat()
-        site_dict['updatedAt'] = datetime.now(timezone.utc).isoformat()
-        
-        await db.sites.insert_one(site_dict)
-        return {"success": True, "action": "created", "site_id": site_data.id}
+    loaded = await page_store.load_for_delta(site_id, operations)
+    if not loaded:
+        raise HTTPException(status_code=404, detail="Site not found")
+    
+    current_revision = loaded.get('revision', 0)
+    if current_revision != delta.baseRevision:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Site was changed since baseRevision", "revision": current_revision}
+        )
+    
+    try:
+        update_fields = build_update(loaded.get('pages', []), operations)
+    except InvalidOperation as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    update_fields['updatedAt'] = utc_now()
+    
+    applied = await page_store.apply_delta(site_id, delta.baseRevision, loaded.get('pages', []), update_fields)
+    
+    if not applied:
+        # Someone else saved between our read and write
+        site = await db.sites.find_one({"id": site_id}, {"_id": 0, "revision": 1})
+        if not site:
+            raise HTTPException(status_code=404, detail="Site not found")
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Site was changed since baseRevision", "revision": site.get('revision', 0)}
+        )
+    
+    invalidate_site(site_id)
+    return {"success": True, "site_id": site_id, "revision": delta.baseRevision + 1}
 
 @api_router.delete("/sites/{site_id}")
 async def delete_site(site_id: str):
@@ -288,6 +568,11 @@ async def delete_site(site_id: str):
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Site not found")
     
+    # Forget its pages and what was published or exported for this site
+    await page_store.delete_pages(site_id)
+    await db.publish_manifests.delete_many({"site_id": site_id})
+    invalidate_site(site_id)
+    
     return {"message": "Site deleted successfully"}
 
 
@@ -296,11 +581,6 @@ async def delete_site(site_id: str):
 @api_router.post("/sites/{site_id}/pages", response_model=Page)
 async def create_page(site_id: str, page_input: PageCreate):
     """Create a new page in a site"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
-    
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
-    
     # Create new page
     new_page = Page(
         id=str(uuid.uuid4()),
@@ -310,102 +590,148 @@ async def create_page(site_id: str, page_input: PageCreate):
     )
     
     # Add page to site
-    await db.sites.update_one(
-        {"id": site_id},
-        {
-            "$push": {"pages": new_page.model_dump()},
-            "$set": {"updatedAt": datetime.now(timezone.utc).isoformat()}
-        }
-    )
+    if not await page_store.add_page(site_id, new_page.model_dump(), utc_now()):
+        raise HTTPException(status_code=404, detail="Site not found")
+    invalidate_site(site_id)
     
     return new_page
 
 @api_router.put("/sites/{site_id}/pages/{page_id}", response_model=Page)
 async def update_page(site_id: str, page_id: str, page_update: PageUpdate):
-    """Update a page's settings and content"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
+    """Update a page's settings and content
     
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
+    Only the provided fields of the matching page are $set in place, so
+    concurrent edits to other pages (or other fields) are never lost and
+    only the updated page travels back from MongoDB.
+    """
+    # Update only provided fields
+    update_data = {k: v for k, v in page_update.model_dump().items() if v is not None}
     
-    # Find the page to update
-    page_found = False
-    for i, page in enumerate(site['pages']):
-        if page['id'] == page_id:
-            page_found = True
-            # Update only provided fields
-            update_data = {k: v for k, v in page_update.model_dump().items() if v is not None}
-            
-            for key, value in update_data.items():
-                site['pages'][i][key] = value
-            
-            break
+    updated_page = await page_store.update_page(site_id, page_id, update_data, utc_now())
     
-    if not page_found:
+    if not updated_page:
+        if await db.sites.count_documents({"id": site_id}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Site not found")
         raise HTTPException(status_code=404, detail="Page not found")
     
-    # Save updated site
-    await db.sites.update_one(
-        {"id": site_id},
-        {
-            "$set": {
-                "pages": site['pages'],
-                "updatedAt": datetime.now(timezone.utc).isoformat()
-            }
-        }
-    )
+    invalidate_site(site_id)
     
     # Return updated page
-    updated_page = next((p for p in site['pages'] if p['id'] == page_id), None)
-    return Page(**updated_page)
+    return TrustedJSONResponse({**PAGE_DEFAULTS, **updated_page})
 
 @api_router.delete("/sites/{site_id}/pages/{page_id}")
 async def delete_page(site_id: str, page_id: str):
     """Delete a page from a site"""
-    result = await db.sites.update_one(
-        {"id": site_id},
-        {
-            "$pull": {"pages": {"id": page_id}},
-            "$set": {"updatedAt": datetime.now(timezone.utc).isoformat()}
-        }
-    )
-    
-    if result.matched_count == 0:
+    if not await page_store.delete_page(site_id, page_id, utc_now()):
         raise HTTPException(status_code=404, detail="Site not found")
     
+    invalidate_site(site_id)
     return {"message": "Page deleted successfully"}
 
 
 # ============= IMAGE UPLOAD ENDPOINT =============
 
-@api_router.post("/upload-image")
-async def upload_image(file: UploadFile = File(...)):
-    """Upload an image for social sharing"""
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type. Allowed types: {', '.join(allowed_types)}"
-        )
-    
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1]
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = UPLOAD_DIR / unique_filename
+# The endpoint reads the body itself, so describe the form for the API docs
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+@api_router.post("/upload-image", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_image(request: Request):
+    """Upload an image for social sharing
     
-    # Save file
+    The multipart body is streamed to disk rather than spooled by the
+    framework, so a large image neither blocks the event loop nor gets read
+    past UPLOAD_MAX_BYTES before being refused with 413. Files are named by
+    their SHA-256, so uploading the same image again returns the URL of
+    the stored copy.
+    """
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
+        upload = await upload_store.save(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError as e:
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
     
+    # Encode responsive derivatives in the background, so exports and publishes find them ready
+    await run_in_threadpool(derivative_store.schedule, [(upload.sha256, UPLOAD_DIR / upload.filename)])
+    
     # Return URL
     backend_url = os.environ.get('BACKEND_URL', 'http://localhost:8001')
-    image_url = f"{backend_url}/uploads/{unique_filename}"
+    image_url = f"{backend_url}/uploads/{upload.filename}"
+    
+    return {
+        "imageUrl": image_url,
+        "filename": upload.filename,
+        "size": upload.size,
+        "sha256": upload.sha256,
+        "deduplicated": upload.deduplicated
+    }
+
+@api_router.get("/uploads/unused")
+async def list_unused_uploads(limit: int = Query(100, ge=1, le=1000)):
+    """Uploaded files no site references any more, oldest first, e.g. for cleaning up the upload directory"""
+    return {"uploads": await upload_store.unused(limit)}
+
+
+# ============= IMAGE VARIANT ENDPOINT =============
+
+# A variant's URL names its exact bytes
+VARIANT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@api_router.get("/images/{sha256}")
+async def get_image_variant(
+    sha256: str,
+    request: Request,
+    width: Optional[int] = Query(None, ge=1, le=MAX_VARIANT_DIMENSION),
+    height: Optional[int] = Query(None, ge=1, le=MAX_VARIANT_DIMENSION),
+    fit: Literal['contain', 'cover', 'fill'] = 'contain',
+    image_format: Literal['webp', 'avif', 'jpeg', 'png'] = Query('webp', alias='format'),
+    quality: int = Query(DEFAULT_VARIANT_QUALITY, ge=1, le=100)
+):
+    """An uploaded image resized and re-encoded, for thumbnails and previews
+    
+    Variants are rendered on the image pool the first time they are asked
+    for and cached on disk (IMAGE_VARIANT_CACHE_MAX_BYTES, least recently
+    used first out). Simultaneous requests for a variant that is being
+    rendered wait for that one encode. The ETag follows from the hash and
+    parameters alone, so revalidations are answered without touching disk.
+    """
+    if not SHA256_PATTERN.fullmatch(sha256):
+        raise HTTPException(status_code=404, detail="Image not found")
+    if image_format not in encodable_formats([image_format]):
+        raise HTTPException(status_code=400, detail=f"Format {image_format} is not supported by this server")
+    
+    params = VariantParams(width, height, fit, image_format, quality)
+    headers = {"ETag": params.etag(sha256), "Cache-Control": VARIANT_CACHE_CONTROL}
+    if if_none_match(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        variant = await image_variants.get(sha256, params)
+    except (OSError, DecompressionBombError) as e:
+        raise HTTPException(status_code=422, detail=f"Image could not be transformed: {str(e)}")
+    except BrokenProcessPool:
+        # The pool is restarted on the next request
+        raise HTTPException(status_code=503, detail="Image workers restarting, try again", headers={"Retry-After": "1"})
+    if variant is None:
+        raise HTTPException(status_code=404, detail="Image not found")
     
-    return {"imageUrl": image_url, "filename": unique_filename}
+    return open_file_response(variant, params.media_type, headers)
 
 
 # ============= HTML EXPORT ENDPOINT =============
@@ -413,13 +739,15 @@ async def upload_image(file: UploadFile = File(...)):
 @api_router.get("/sites/{site_id}/pages/{page_id}/export")
 async def export_page_html(site_id: str, page_id: str):
     """Export a page as complete HTML file"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
+    site = site_cache.get(site_id)
+    if site is not None:
+        page = next((p for p in site['pages'] if p['id'] == page_id), None)
+    else:
+        site, page = await page_store.load_page(site_id, page_id)
     
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
     
-    # Find the page
-    page = next((p for p in site['pages'] if p['id'] == page_id), None)
     if not page:
         raise HTTPException(status_code=404, detail="Page not found")
     
@@ -447,123 +775,7 @@ def generate_html_export(page: Dict[str, Any], site_name: str, use_external_css:
         site_name: Name of the site
         use_external_css: If True, link to external styles.css instead of inline styles
     """
-    
-    # Build blocks HTML
-    blocks_html = ""
-    for block in page.get('blocks', []):
-        if block['type'] == 'hero':
-            blocks_html += f"""
-    <section class="hero">
-        <h1>{block.get('content', 'Hero Section')}</h1>
-    </section>
-"""
-        elif block['type'] == 'text':
-            blocks_html += f"""
-    <section class="text-block">
-        <p>{block.get('content', 'Text content')}</p>
-    </section>
-"""
-        elif block['type'] == 'features':
-            blocks_html += """
-    <section class="features">
-        <div class="feature-grid">
-            <div class="feature">Feature 1</div>
-            <div class="feature">Feature 2</div>
-            <div class="feature">Feature 3</div>
-        </div>
-    </section>
-"""
-        elif block['type'] == 'image':
-            # Extract filename from full URL if it's a backend URL
-            image_src = block.get('content', 'placeholder.jpg')
-            if '/uploads/' in image_src:
-                # Extract just the filename and reference it from images folder
-                filename = image_src.split('/uploads/')[-1]
-                image_src = f"images/{filename}"
-            blocks_html += f"""
-    <section class="image-block">
-        <img src="{image_src}" alt="Image">
-    </section>
-"""
-        elif block['type'] == 'footer':
-            blocks_html += """
-    <footer>
-        <p>&copy; 2025 All rights reserved</p>
-    </footer>
-"""
-    
-    # Build meta tags
-    meta_tags = f"""
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{page.get('name', 'Page')}</title>"""
-    
-    if page.get('pageDescription'):
-        meta_tags += f"""
-    <meta name="description" content="{page['pageDescription']}">"""
-    
-    # Handle social sharing image
-    if page.get('socialSharingEnabled') and page.get('socialSharingImageUrl'):
-        social_image = page['socialSharingImageUrl']
-        if '/uploads/' in social_image:
-            # Convert to relative path for exported site
-            filename = social_image.split('/uploads/')[-1]
-            social_image = f"images/{filename}"
-        
-        meta_tags += f"""
-    <meta property="og:image" content="{social_image}">
-    <meta property="og:title" content="{page.get('name', 'Page')}">
-    <meta property="og:description" content="{page.get('pageDescription', '')}">
-    <meta name="twitter:card" content="summary_large_image">
-    <meta name="twitter:image" content="{social_image}">"""
-    
-    # Build complete HTML
-    html = ""
-    
-    # Before DOCTYPE code
-    if page.get('beforeDoctypeCode'):
-        html += page['beforeDoctypeCode'] + "\n"
-    
-    html += f"""<!DOCTYPE html>
-<html lang="en">
-<head>{meta_tags}"""
-    
-    # CSS - either external or inline
-    if use_external_css:
-        html += """
-    <link rel="stylesheet" href="styles.css">"""
-    else:
-        html += """
-    <style>
-        body { font-family: Arial, sans-serif; margin: 0; padding: 0; }
-        .hero { background: #007bff; color: white; padding: 100px 20px; text-align: center; }
-        .text-block { padding: 50px 20px; }
-        .features { padding: 50px 20px; }
-        .feature-grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 20px; }
-        .feature { padding: 20px; border: 1px solid #ddd; border-radius: 8px; }
-        .image-block { text-align: center; padding: 20px; }
-        .image-block img { max-width: 100%; height: auto; }
-        footer { background: #333; color: white; text-align: center; padding: 20px; }
-    </style>"""
-    
-    # Inside <head> code
-    if page.get('headCode'):
-        html += "\n    " + page['headCode']
-    
-    html += f"""
-</head>
-<body>
-{blocks_html}"""
-    
-    # End of <body> code
-    if page.get('bodyEndCode'):
-        html += "\n    " + page['bodyEndCode']
-    
-    html += """
-</body>
-</html>"""
-    
-    return html
+    return render_page(page, use_external_css=use_external_css)
 
 
 def generate_css_file() -> str:
@@ -641,64 +853,95 @@ def extract_image_urls_from_page(page: Dict[str, Any]) -> List[str]:
     return image_urls
 
 
-# ============= ZIP EXPORT ENDPOINT =============
+def site_upload_hashes(site: Dict[str, Any]) -> Set[str]:
+    """Hashes of the content-addressed uploads a site's pages reference"""
+    hashes = {upload_hash(url) for page in site.get('pages', []) for url in extract_image_urls_from_page(page)}
+    hashes.discard(None)
+    return hashes
 
-@api_router.get("/sites/{site_id}/export-zip")
-async def export_site_as_zip(site_id: str):
-    """Export entire site as ZIP file with HTML, CSS, and images"""
-    import zipfile
-    import io
-    from fastapi.responses import StreamingResponse
-    
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
-    
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
+
+def collect_site_images(site: Dict[str, Any]) -> List[Tuple[str, Path]]:
+    """(filename in images/, local path) of every uploaded image a site references, de-duplicated and sorted
     
-    # Collect all images from all pages
+    Exports keep images/ flat: a content-addressed upload ab/cd/<sha256>.png
+    is exported as images/<sha256>.png, so every URL of the same content
+    becomes one file.
+    """
     all_images = set()
     for page in site.get('pages', []):
-        images = extract_image_urls_from_page(page)
-        all_images.update(images)
+        all_images.update(extract_image_urls_from_page(page))
+    
+    images = {}
+    for image_url in sorted(all_images):
+        relative = image_url.split('/uploads/')[-1]
+        local_path = UPLOAD_DIR / relative
+        if not local_path.resolve().is_relative_to(UPLOAD_DIR.resolve()):
+            logger.warning(f"Image {relative} referenced by site {site.get('id')} is outside uploads")
+        elif local_path.is_file():
+            images[export_asset_url(image_url)[len('images/'):]] = local_path
+        else:
+            logger.warning(f"Image {relative} referenced by site {site.get('id')} not found in uploads")
+    return sorted(images.items())
+
+
+def build_site_images(site: Dict[str, Any]) -> Tuple[List[Tuple[str, Path]], Dict[str, Dict[str, Any]]]:
+    """Every image file an export or publish ships, and the <picture> of each image by its exported src
     
-    # Create a ZIP file in memory
-    zip_buffer = io.BytesIO()
+    Only derivatives already on disk are used; images still without them
+    are queued on the image pool and ship as a plain <img> this time, so an
+    export never waits for an encode. Reads the disk, so call it off the
+    event loop.
+    """
+    images = collect_site_images(site)
+    hashes = [file_sha256(local_path) for _, local_path in images]
+    sources = [(sha256, local_path) for sha256, (_, local_path) in zip(hashes, images)]
+    derivative_sets = derivative_store.available(sources)
+    derivative_store.schedule([source for source in sources if source[0] not in derivative_sets])
+    
+    files = dict(images)
+    pictures = {}
+    for (filename, _), sha256 in zip(images, hashes):
+        derivatives = derivative_sets.get(sha256)
+        if derivatives is None:
+            continue
+        src = f"images/{filename}"
+        pictures[src] = derivatives.picture(src)
+        for variant in derivatives.variants:
+            files[derivatives.export_name(variant)] = variant.path
+    return sorted(files.items()), pictures
+
+
+def with_pictures(site: Dict[str, Any], pictures: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Copy of a site whose image blocks carry their <picture> for the renderer; the site itself is not changed"""
+    if not pictures:
+        return site
+    
+    def picture_of(block: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if block.get('type') != 'image' or not block.get('content'):
+            return None
+        return pictures.get(export_asset_url(block['content']))
+    
+    pages = []
+    for page in site.get('pages', []):
+        blocks = page.get('blocks', [])
+        found = [picture_of(block) for block in blocks]
+        if any(found):
+            page = dict(page, blocks=[
+                dict(block, picture=picture) if picture else block for block, picture in zip(blocks, found)
+            ])
+        pages.append(page)
+    return dict(site, pages=pages)
+
+
+# ============= ZIP EXPORT ENDPOINT =============
+
+def generate_readme(site: Dict[str, Any]) -> str:
+    """README.txt shipped with exported sites"""
+    site_name = site['name']
+    pages_list = '\n'.join([f"- {page['name']}: {page.get('pageUrl', page['name'] + '.html')}" for page in site.get('pages', [])])
+    generated_time = datetime.now(timezone.utc).isoformat()
     
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Add CSS file
-        css_content = generate_css_file()
-        zip_file.writestr("styles.css", css_content)
-        
-        # Add images
-        for image_url in all_images:
-            try:
-                filename = image_url.split('/uploads/')[-1]
-                local_path = UPLOAD_DIR / filename
-                
-                if local_path.exists():
-                    zip_file.write(local_path, f"images/{filename}")
-            except Exception as e:
-                logger.warning(f"Failed to add image {filename} to ZIP: {str(e)}")
-        
-        # Export each page as HTML (with external CSS)
-        for i, page in enumerate(site.get('pages', [])):
-            html_content = generate_html_export(page, site['name'], use_external_css=True)
-            page_name = page.get('name', 'page')
-            page_filename = page.get('pageUrl', f"{page_name}.html")
-            
-            # Add to ZIP
-            zip_file.writestr(page_filename, html_content)
-            
-            # First page also gets copied as index.html if it's not already named that
-            if i == 0 and page_filename != 'index.html':
-                zip_file.writestr("index.html", html_content)
-        
-        # Add a README file
-        site_name = site['name']
-        pages_list = '\n'.join([f"- {page['name']}: {page.get('pageUrl', page['name'] + '.html')}" for page in site.get('pages', [])])
-        generated_time = datetime.now(timezone.utc).isoformat()
-        
-        readme_content = f"""# {site_name}
+    return f"""# {site_name}
 
 This site was exported from Mobirise Builder Clone.
 
@@ -717,18 +960,108 @@ To use this site:
 
 Generated on: {generated_time}
 """
-        zip_file.writestr("README.txt", readme_content)
+
+
+def iter_export_entries(
+    site: Dict[str, Any],
+    images: List[Tuple[str, Path]],
+    timings: Optional[StageTimings] = None
+) -> Iterator[Tuple[str, Union[str, Path]]]:
+    """Yield (archive name, content) for every file of a site export
+    
+    Pages are rendered on the site build pool and yielded as each one
+    finishes, so the archive order of pages follows render completion.
+    """
+    # Add CSS file
+    yield "styles.css", generate_css_file()
+    
+    # Add images, streamed from disk by the ZIP writer
+    for filename, local_path in images:
+        yield f"images/{filename}", local_path
+    
+    # Export each page as HTML (with external CSS)
+    for i, page, html_content in render_site_pages(site.get('pages', []), use_external_css=True, timings=timings):
+        page_name = page.get('name', 'page')
+        page_filename = page.get('pageUrl', f"{page_name}.html")
+        
+        yield page_filename, html_content
+        
+        # First page also gets copied as index.html if it's not already named that
+        if i == 0 and page_filename != 'index.html':
+            yield "index.html", html_content
+    
+    # Add a README file
+    yield "README.txt", generate_readme(site)
+
+
+def stream_site_export(
+    site: Dict[str, Any],
+    images: List[Tuple[str, Path]],
+    revision: str,
+    timings: StageTimings
+) -> Iterator[bytes]:
+    """ZIP bytes of a site export, written through to the export cache
+    
+    Stage timings are logged once the archive is complete: render (summed
+    over pages), package (ZIP writer, excluding waits for rendered pages)
+    and upload (time the client took to take each chunk).
+    """
+    waits = StageTimings()
+    entries = timed_iter(iter_export_entries(site, images, timings), waits, 'entries')
+    chunks = timed_iter(stream_zip(entries), waits, 'zip')
+    start = time.perf_counter()
     
-    # Reset buffer position
-    zip_buffer.seek(0)
+    yield from export_cache.store(site['id'], revision, chunks)
+    
+    total = time.perf_counter() - start
+    zip_seconds = waits.seconds.get('zip', 0.0)
+    timings.add('package', zip_seconds - waits.seconds.get('entries', 0.0))
+    timings.add('upload', total - zip_seconds)
+    logger.info(f"Exported site {site['id']} ({len(site.get('pages', []))} pages): {timings.as_dict()}")
+
+
+@api_router.get("/sites/{site_id}/export-zip")
+async def export_site_as_zip(site_id: str, request: Request):
+    """Export entire site as ZIP file with HTML, CSS, and images
+    
+    Archives are cached on disk under a hash of the site content, served
+    with that hash as ETag. A cache miss is streamed while it is built;
+    Starlette iterates the generator in its threadpool and pages render on
+    the site build pool, so nothing blocks the event loop and memory stays
+    flat regardless of site size. The fetch stage is reported in the
+    Server-Timing header; the remaining stages are logged when the archive
+    is complete.
+    """
+    from fastapi.responses import StreamingResponse
+    
+    timings = StageTimings()
+    with timings.stage('fetch'):
+        site = await load_site(site_id, fresh=True)
+        
+        if not site:
+            raise HTTPException(status_code=404, detail="Site not found")
+        
+        images, pictures = await run_in_threadpool(build_site_images, site)
+        revision = await run_in_threadpool(site_revision, site, images)
+    etag = f'"{revision}"'
+    headers = {
+        "Content-Disposition": f"attachment; filename={site['name'].replace(' ', '-')}.zip",
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Server-Timing": timings.server_timing()
+    }
+    
+    if if_none_match(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": headers["Cache-Control"]})
+    
+    cached = export_cache.open(site_id, revision)
+    if cached:
+        return open_file_response(cached, "application/zip", headers)
     
-    # Return as streaming response
     return StreamingResponse(
-        io.BytesIO(zip_buffer.getvalue()),
+        stream_site_export(with_pictures(site, pictures), images, revision, timings),
         media_type="application/zip",
-        headers={
-            "Content-Disposition": f"attachment; filename={site['name'].replace(' ', '-')}.zip"
-        }
+        headers=headers
     )
 
 
@@ -749,20 +1082,23 @@ async def test_ftp_connection(settings: FTPSettings):
     import ftplib
     from contextlib import closing
     
+    def check_connection():
+        with closing(ftplib.FTP()) as ftp:
+            ftp.connect(settings.host, settings.port, timeout=10)
+            ftp.login(settings.username, settings.password)
+            
+            # Try to change to root folder if specified
+            if settings.rootFolder:
+                ftp.cwd(settings.rootFolder)
+    
     try:
         if settings.protocol == "FTP":
-            with closing(ftplib.FTP()) as ftp:
-                ftp.connect(settings.host, settings.port, timeout=10)
-                ftp.login(settings.username, settings.password)
-                
-                # Try to change to root folder if specified
-                if settings.rootFolder:
-                    ftp.cwd(settings.rootFolder)
-                
-                return {
-                    "success": True,
-                    "message": f"Successfully connected to {settings.host}"
-                }
+            await run_ftp_check(check_connection)
+            
+            return {
+                "success": True,
+                "message": f"Successfully connected to {settings.host}"
+            }
         else:
             # For FTPS/SFTP, we'd need additional libraries
             return {
@@ -778,125 +1114,166 @@ async def test_ftp_connection(settings: FTPSettings):
 class FTPPublishRequest(BaseModel):
     ftpSettings: FTPSettings
     onlyChanges: Optional[bool] = False
+    deleteOrphans: Optional[bool] = False
+    mirrorManifest: Optional[bool] = False
+    connections: Optional[int] = None
 
 
-@api_router.post("/sites/{site_id}/publish-ftp")
-async def publish_site_via_ftp(site_id: str, request: FTPPublishRequest):
-    """Publish site via FTP - Upload HTML files, CSS, and images to FTP server"""
-    import ftplib
-    from contextlib import closing
-    import io
-    
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
-    
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
+def collect_publish_artifacts(
+    site: Dict[str, Any],
+    timings: Optional[StageTimings] = None,
+    progress: Optional[PublishProgress] = None
+) -> List[PublishArtifact]:
+    """Build every file a publish sends: images and their derivatives, styles.css and one HTML file per page
     
-    ftp_settings = request.ftpSettings
+    Pages render on the site build pool and are hashed as each one is ready.
+    A cancelled `progress` stops the build between images and pages with
+    PublishCancelled; renders still queued are dropped with the generator.
+    """
+    artifacts = []
+    
+    if progress:
+        progress.check_cancelled()
+    images, pictures = build_site_images(site)
+    site = with_pictures(site, pictures)
+    for filename, local_path in images:
+        # Content-addressed uploads carry their hash; other images are hashed once per mtime
+        artifacts.append(PublishArtifact.from_file(f"images/{filename}", local_path, sha256=file_sha256(local_path)))
+    if progress:
+        progress.check_cancelled()
+    
+    artifacts.append(PublishArtifact.from_bytes('styles.css', generate_css_file().encode('utf-8')))
+    
+    # Each page as HTML file (with external CSS)
+    for i, page, html_content in render_site_pages(site.get('pages', []), use_external_css=True, timings=timings):
+        if progress:
+            progress.check_cancelled()
+        html_bytes = html_content.encode('utf-8')
+        page_filename = page.get('pageUrl', f"{page['name'].lower().replace(' ', '-')}.html")
+        artifacts.append(PublishArtifact.from_bytes(page_filename, html_bytes))
+        
+        # Ensure first page is also saved as index.html
+        if i == 0 and page_filename != 'index.html':
+            artifacts.append(PublishArtifact.from_bytes('index.html', html_bytes))
     
-    # Validate FTP settings
+    return artifacts
+
+
+def validate_ftp_settings(ftp_settings: FTPSettings) -> None:
+    """Reject publish requests that can't possibly succeed before any work starts"""
     if not ftp_settings.host or not ftp_settings.username:
         raise HTTPException(
             status_code=400, 
             detail="FTP settings incomplete. Please configure FTP in FTP Manager first."
         )
     
-    try:
-        uploaded_files = []
-        
-        # Only FTP is supported for now
-        if ftp_settings.protocol != "FTP":
-            raise HTTPException(
-                status_code=400,
-                detail=f"{ftp_settings.protocol} not yet implemented. Please use FTP for now."
-            )
-        
-        # Collect all images from all pages
-        all_images = set()
-        for page in site.get('pages', []):
-            images = extract_image_urls_from_page(page)
-            all_images.update(images)
+    # Only FTP is supported for now
+    if ftp_settings.protocol != "FTP":
+        raise HTTPException(
+            status_code=400,
+            detail=f"{ftp_settings.protocol} not yet implemented. Please use FTP for now."
+        )
+
+
+async def run_ftp_publish(
+    site: Dict[str, Any],
+    request: FTPPublishRequest,
+    progress: Optional[PublishProgress] = None,
+    timings: Optional[StageTimings] = None
+) -> Dict[str, Any]:
+    """Upload HTML files, CSS, and images to the FTP server
+    
+    With onlyChanges, files whose content hash matches the manifest of the
+    previous publish to the same target are skipped. Callers must hold the
+    site's publish lock. The response carries per-stage timings in ms:
+    fetch, render (summed over pages), package (hashing and planning) and
+    upload.
+    """
+    import ftplib
+    
+    site_id = site['id']
+    ftp_settings = request.ftpSettings
+    timings = timings or StageTimings()
+    
+    target = manifest_target_key(
+        ftp_settings.protocol, ftp_settings.host, ftp_settings.port,
+        ftp_settings.username, ftp_settings.rootFolder
+    )
+    with timings.stage('fetch'):
+        manifest = await db.publish_manifests.find_one({"site_id": site_id, "target": target}, {"_id": 0})
+    previous_files = {entry['path']: entry['sha256'] for entry in (manifest or {}).get('files', [])}
+    
+    def connect():
+        return open_ftp_session(
+            ftp_settings.host, ftp_settings.port, ftp_settings.username,
+            ftp_settings.password, ftp_settings.rootFolder
+        )
+    
+    def publish():
+        """Render, hash and upload; runs on the FTP executor"""
+        previous = previous_files
+        start = time.perf_counter()
+        rendered_before = timings.seconds.get('render', 0.0)
+        artifacts = collect_publish_artifacts(site, timings, progress)
+        # Render time is summed over parallel workers, so package is what's left of the wall time
+        render_seconds = timings.seconds.get('render', 0.0) - rendered_before
+        timings.add('package', max(time.perf_counter() - start - render_seconds, 0.0))
+        deleted_files = []
         
-        # Connect to FTP server
-        with closing(ftplib.FTP()) as ftp:
-            # Connect
-            ftp.connect(ftp_settings.host, ftp_settings.port, timeout=30)
+        # Upload over a pool of FTP sessions; session 0 also handles manifest and cleanup
+        connections = request.connections or DEFAULT_FTP_CONNECTIONS
+        upload_start = time.perf_counter()
+        with ParallelFTPUploader(connect, connections=connections, progress=progress) as uploader:
+            ftp = uploader.session(0)
             
-            # Login
-            ftp.login(ftp_settings.username, ftp_settings.password)
+            # Fall back to the mirrored manifest when this target has no manifest in MongoDB
+            if manifest is None and request.mirrorManifest and request.onlyChanges:
+                previous = read_remote_manifest(ftp)
             
-            # Change to root folder if specified
-            if ftp_settings.rootFolder:
-                try:
-                    ftp.cwd(ftp_settings.rootFolder)
-                except ftplib.error_perm:
-                    # Try to create the folder if it doesn't exist
-                    try:
-                        ftp.mkd(ftp_settings.rootFolder)
-                        ftp.cwd(ftp_settings.rootFolder)
-                    except Exception as e:
-                        raise HTTPException(
-                            status_code=400,
-                            detail=f"Cannot access or create root folder '{ftp_settings.rootFolder}': {str(e)}"
-                        )
+            with timings.stage('package'):
+                to_upload, skipped, orphans = plan_publish(artifacts, previous, request.onlyChanges)
+            if progress:
+                progress.begin(len(to_upload), sum(artifact.size for artifact in to_upload))
             
-            # Create images directory on FTP if there are images
-            if all_images:
-                try:
-                    ftp.mkd('images')
-                except ftplib.error_perm:
-                    # Directory already exists, that's fine
-                    pass
+            ensure_remote_dirs(ftp, [artifact.path for artifact in to_upload])
             
-            # Upload images
-            for image_url in all_images:
-                try:
-                    # Extract filename from URL
-                    filename = image_url.split('/uploads/')[-1]
-                    local_path = UPLOAD_DIR / filename
-                    
-                    # Check if file exists locally
-                    if local_path.exists():
-                        with open(local_path, 'rb') as img_file:
-                            ftp.storbinary(f'STOR images/{filename}', img_file)
-                        uploaded_files.append(f'images/{filename}')
-                except Exception as img_error:
-                    # Log but don't fail - continue uploading other files
-                    logger.warning(f"Failed to upload image {filename}: {str(img_error)}")
+            uploaded_files, failed_files = uploader.upload(to_upload)
             
-            # Generate and upload CSS file
-            css_content = generate_css_file()
-            css_buffer = io.BytesIO(css_content.encode('utf-8'))
-            ftp.storbinary('STOR styles.css', css_buffer)
-            uploaded_files.append('styles.css')
-            
-            # Upload each page as HTML file (with external CSS)
-            for page in site.get('pages', []):
-                # Generate HTML content with external CSS
-                html_content = generate_html_export(page, site['name'], use_external_css=True)
-                
-                # Get filename
-                page_filename = page.get('pageUrl', f"{page['name'].lower().replace(' ', '-')}.html")
-                
-                # Ensure first page is also saved as index.html
-                if page == site.get('pages', [])[0] and page_filename != 'index.html':
-                    # Upload with both names
-                    file_buffer = io.BytesIO(html_content.encode('utf-8'))
-                    ftp.storbinary(f'STOR {page_filename}', file_buffer)
-                    uploaded_files.append(page_filename)
-                    
-                    # Also upload as index.html
-                    file_buffer = io.BytesIO(html_content.encode('utf-8'))
-                    ftp.storbinary('STOR index.html', file_buffer)
-                    uploaded_files.append('index.html')
+            published = dict(previous)
+            for artifact in to_upload:
+                if artifact.path in failed_files:
+                    published.pop(artifact.path, None)
                 else:
-                    # Upload file
-                    file_buffer = io.BytesIO(html_content.encode('utf-8'))
-                    ftp.storbinary(f'STOR {page_filename}', file_buffer)
-                    uploaded_files.append(page_filename)
-                
-            # Close connection
-            ftp.quit()
+                    published[artifact.path] = artifact.sha256
+            
+            if request.deleteOrphans and orphans:
+                deleted_files = delete_remote_files(uploader.session(0), orphans)
+                for path in deleted_files:
+                    published.pop(path, None)
+            
+            sizes = {artifact.path: artifact.size for artifact in artifacts}
+            manifest_files = [
+                {"path": path, "sha256": sha, "size": sizes.get(path)}
+                for path, sha in sorted(published.items())
+            ]
+            
+            if request.mirrorManifest:
+                write_remote_manifest(uploader.session(0), manifest_files)
+        timings.add('upload', time.perf_counter() - upload_start)
+        
+        return uploaded_files, failed_files, skipped, deleted_files, manifest_files, uploader.connections
+    
+    try:
+        uploaded_files, failed_files, skipped, deleted_files, manifest_files, connections = await run_ftp(publish)
+        
+        await db.publish_manifests.update_one(
+            {"site_id": site_id, "target": target},
+            {"$set": {
+                "files": manifest_files,
+                "updatedAt": utc_now()
+            }},
+            upsert=True
+        )
         
         return {
             "success": True,
@@ -905,9 +1282,20 @@ async def publish_site_via_ftp(site_id: str, request: FTPPublishRequest):
             "total_files": len(uploaded_files),
             "host": ftp_settings.host,
             "folder": ftp_settings.rootFolder or "/",
-            "images_uploaded": len([f for f in uploaded_files if f.startswith('images/')])
+            "images_uploaded": len([f for f in uploaded_files if f.startswith('images/')]),
+            "uploaded_count": len(uploaded_files),
+            "skipped_count": len(skipped),
+            "deleted_files": deleted_files,
+            "deleted_count": len(deleted_files),
+            "failed_files": sorted(failed_files),
+            "connections": connections,
+            "timings": timings.as_dict()
         }
         
+    except PublishCancelled:
+        raise
+    except FTPPublishError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ftplib.error_perm as e:
         raise HTTPException(status_code=401, detail=f"FTP Authentication failed: {str(e)}")
     except ftplib.error_temp as e:
@@ -916,12 +1304,103 @@ async def publish_site_via_ftp(site_id: str, request: FTPPublishRequest):
         raise HTTPException(status_code=500, detail=f"FTP publish failed: {str(e)}")
 
 
+@api_router.post("/sites/{site_id}/publish-ftp")
+async def publish_site_via_ftp(site_id: str, request: FTPPublishRequest):
+    """Publish site via FTP and wait for the upload to finish"""
+    timings = StageTimings()
+    with timings.stage('fetch'):
+        site = await load_site(site_id, fresh=True)
+    
+    if not site:
+        raise HTTPException(status_code=404, detail="Site not found")
+    
+    validate_ftp_settings(request.ftpSettings)
+    
+    try:
+        async with publish_jobs.site_lock(site_id):
+            return await run_ftp_publish(site, request, timings=timings)
+    except SitePublishLocked:
+        raise HTTPException(status_code=409, detail="This site is already being published")
+
+
+# ============= PUBLISH JOBS ENDPOINTS =============
+
+@api_router.post("/sites/{site_id}/publish-jobs", status_code=202)
+async def start_publish_job(site_id: str, request: FTPPublishRequest):
+    """Start publishing a site via FTP in the background and return the job immediately"""
+    timings = StageTimings()
+    with timings.stage('fetch'):
+        site = await load_site(site_id, fresh=True)
+    
+    if not site:
+        raise HTTPException(status_code=404, detail="Site not found")
+    
+    validate_ftp_settings(request.ftpSettings)
+    
+    options = {
+        "host": request.ftpSettings.host,
+        "folder": request.ftpSettings.rootFolder or "/",
+        "onlyChanges": request.onlyChanges,
+        "deleteOrphans": request.deleteOrphans
+    }
+    try:
+        job = await publish_jobs.start(
+            site_id,
+            lambda progress: run_ftp_publish(site, request, progress, timings),
+            options=options
+        )
+    except SitePublishLocked as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "This site is already being published", "jobId": e.owner}
+        )
+    
+    return job
+
+
+@api_router.get("/publish-jobs/{job_id}")
+async def get_publish_job(job_id: str):
+    """Get the current state and progress of a publish job"""
+    job = await publish_jobs.get(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Publish job not found")
+    
+    return job
+
+
+@api_router.get("/publish-jobs/{job_id}/events")
+async def stream_publish_job(job_id: str):
+    """Stream publish job progress as Server-Sent Events"""
+    from fastapi.responses import StreamingResponse
+    
+    if not await publish_jobs.get(job_id):
+        raise HTTPException(status_code=404, detail="Publish job not found")
+    
+    return StreamingResponse(
+        publish_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@api_router.post("/publish-jobs/{job_id}/cancel")
+async def cancel_publish_job(job_id: str):
+    """Request cancellation of a running publish job"""
+    job = await publish_jobs.cancel(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Publish job not found")
+    
+    return job
+
+
 # ============= SITE STYLES ENDPOINTS =============
 
 @api_router.get("/sites/{site_id}/styles", response_model=SiteStyles)
 async def get_site_styles(site_id: str):
     """Get site styles (colors, fonts, options, customCSS)"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
+    site = site_cache.get(site_id) or await page_store.load_site_fields(site_id, "siteStyles")
     
     if not site:
         raise HTTPException(status_code=404, detail="Site not found")
@@ -936,11 +1415,6 @@ async def get_site_styles(site_id: str):
 @api_router.put("/sites/{site_id}/styles", response_model=SiteStyles)
 async def update_site_styles(site_id: str, styles: SiteStyles):
     """Update site styles"""
-    site = await db.sites.find_one({"id": site_id}, {"_id": 0})
-    
-    if not site:
-        raise HTTPException(status_code=404, detail="Site not found")
-    
     # Convert styles to dict
     styles_dict = styles.model_dump()
     
@@ -950,17 +1424,31 @@ async def update_site_styles(site_id: str, styles: SiteStyles):
         {
             "$set": {
                 "siteStyles": styles_dict,
-                "updatedAt": datetime.now(timezone.utc).isoformat()
-            }
+                "updatedAt": utc_now()
+            },
+            "$inc": {"revision": 1}
         }
     )
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Site not found")
     
+    invalidate_site(site_id)
     return styles
 
 
+# ============= METRICS ENDPOINTS =============
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """In-process cache counters and background migration progress"""
+    return {
+        "siteCache": site_cache.stats(),
+        "imageVariants": image_variants.stats(),
+        "datetimeMigration": datetime_migration.stats()
+    }
+
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -979,6 +1467,39 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    """Lookups by id, listings and the sync upsert (unique sites.id) rely on these"""
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def fail_interrupted_publishes():
+    """Publish jobs run in-process; those left by a worker that has stopped never finish"""
+    await publish_jobs.fail_interrupted()
+
+@app.on_event("startup")
+async def start_datetime_migration():
+    """Convert timestamps older documents hold as ISO strings, in the background"""
+    app.state.datetime_migration = asyncio.create_task(migrate_timestamps(db))
+
+@app.on_event("startup")
+async def start_upload_reference_backfill():
+    """Count references to uploads stored before they were tracked, in the background"""
+    app.state.upload_reference_backfill = asyncio.create_task(backfill_upload_references())
+
+@app.on_event("startup")
+async def start_site_cache_watcher():
+    """Invalidate cached sites on writes from other workers (SITE_CACHE_CHANGE_STREAM)"""
+    app.state.site_cache_watcher = asyncio.create_task(watch_site_changes(db)) if await should_watch_site_changes(db) else None
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    app.state.datetime_migration.cancel()
+    app.state.upload_reference_backfill.cancel()
+    if app.state.site_cache_watcher:
+        app.state.site_cache_watcher.cancel()
+    client.close()
+    ftp_executor.shutdown(wait=False, cancel_futures=True)
+    ftp_check_executor.shutdown(wait=False, cancel_futures=True)
+    shutdown_render_executor()
+    shutdown_derivative_executor()
\ No newline at end of file
@@ -0,0 +1,164 @@
+"""Whole-site build pipeline: renders pages on a worker pool and hands each one over as soon as it is ready"""
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from html_render import render_page
+
+
+logger = logging.getLogger(__name__)
+
+# Render processes for large sites; 1 (the default on a single core) always renders inline.
+# Rendering is pure Python, so only processes run it in parallel; threads would not
+SITE_BUILD_WORKERS = int(os.environ.get('SITE_BUILD_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Sites with fewer pages render inline: a page is pickled to the worker and its
+# HTML back, which costs a fair share of rendering it, so only a site this large
+# keeps enough cores busy to come out ahead
+PARALLEL_RENDER_MIN_PAGES = int(os.environ.get('SITE_BUILD_PARALLEL_MIN_PAGES', '64'))
+# Pages sent to a worker per task, so the per-task round trip is paid once per batch
+RENDER_BATCH_PAGES = 8
+
+_executor: Optional[Executor] = None
+_executor_lock = threading.Lock()
+
+
+class StageTimings:
+    """Thread-safe wall-clock seconds per build stage (fetch, render, package, upload)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per stage, rounded for API responses"""
+        with self._lock:
+            return {stage: round(seconds * 1000, 1) for stage, seconds in self.seconds.items()}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value"""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.as_dict().items())
+
+
+def timed_iter(iterable: Iterable[Any], timings: StageTimings, stage: str) -> Iterator[Any]:
+    """Pass items through, adding the time spent producing each one to `stage`"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timings.add(stage, time.perf_counter() - start)
+            return
+        timings.add(stage, time.perf_counter() - start)
+        yield item
+
+
+def get_render_executor() -> Executor:
+    """The shared render pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers only import html_render; forking a threaded server is unsafe
+            _executor = ProcessPoolExecutor(
+                max_workers=SITE_BUILD_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Started render pool with {SITE_BUILD_WORKERS} processes")
+        return _executor
+
+
+def shutdown_render_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _render_timed(page: Dict[str, Any], use_external_css: bool) -> Tuple[str, float]:
+    """Returns the HTML and the seconds spent rendering it"""
+    start = time.perf_counter()
+    html = render_page(page, use_external_css=use_external_css)
+    return html, time.perf_counter() - start
+
+
+def _render_batch(pages: List[Dict[str, Any]], use_external_css: bool) -> List[Tuple[str, float]]:
+    """Runs in the render pool: _render_timed for each page of a batch"""
+    return [_render_timed(page, use_external_css) for page in pages]
+
+
+def render_site_pages(
+    pages: List[Dict[str, Any]],
+    use_external_css: bool = True,
+    workers: int = SITE_BUILD_WORKERS,
+    timings: Optional[StageTimings] = None,
+    window: Optional[int] = None
+) -> Iterator[Tuple[int, Dict[str, Any], str]]:
+    """Yield (page index, page, html) as pages finish rendering, in completion order
+
+    Sites of PARALLEL_RENDER_MIN_PAGES pages or more render on the shared
+    process pool in batches of RENDER_BATCH_PAGES, with at most `window`
+    batches in flight (default: twice the worker count), so a huge site
+    never holds all of its HTML at once. Closing the generator early
+    cancels pending renders. Smaller sites render inline.
+
+    Args:
+        pages: Page dictionaries of the site
+        use_external_css: Link styles.css instead of inlining the styles
+        workers: Parallel renders; 1, or fewer than PARALLEL_RENDER_MIN_PAGES pages, renders inline
+        timings: Receives the render stage, summed over pages
+        window: Batches in flight at once
+    """
+    if workers <= 1 or len(pages) < PARALLEL_RENDER_MIN_PAGES:
+        for i, page in enumerate(pages):
+            html, seconds = _render_timed(page, use_external_css)
+            if timings:
+                timings.add('render', seconds)
+            yield i, page, html
+        return
+
+    executor = get_render_executor()
+    render = functools.partial(_render_batch, use_external_css=use_external_css)
+    window = window or workers * 2
+    batches: Iterator[int] = iter(range(0, len(pages), RENDER_BATCH_PAGES))
+    in_flight: Dict[Future, int] = {}
+    try:
+        while True:
+            while len(in_flight) < window:
+                try:
+                    first = next(batches)
+                except StopIteration:
+                    break
+                in_flight[executor.submit(render, pages[first:first + RENDER_BATCH_PAGES])] = first
+            if not in_flight:
+                return
+
+            done: Set[Future]
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                first = in_flight.pop(future)
+                for i, (html, seconds) in enumerate(future.result(), start=first):
+                    if timings:
+                        timings.add('render', seconds)
+                    yield i, pages[i], html
+    finally:
+        for future in in_flight:
+            future.cancel()
@@ -0,0 +1,177 @@
+"""In-process read-through cache of site documents, invalidated by writes"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from pymongo.errors import PyMongoError
+
+
+logger = logging.getLogger(__name__)
+
+# Sites kept in memory; 0 disables the cache
+SITE_CACHE_SIZE = int(os.environ.get('SITE_CACHE_SIZE', '256'))
+# Upper bound on how stale an entry can get when another worker writes and no change stream is running
+SITE_CACHE_TTL = float(os.environ.get('SITE_CACHE_TTL', '30'))
+# Invalidate on writes made by other workers too. "auto" (the default) watches when
+# the server is a replica set or sharded cluster, the deployments that allow change streams
+SITE_CACHE_CHANGE_STREAM = os.environ.get('SITE_CACHE_CHANGE_STREAM', 'auto').lower()
+
+# Invalidations remembered to reject loads that started before them
+MAX_REMEMBERED_INVALIDATIONS = 10000
+
+
+class SiteCache:
+    """Thread-safe LRU of site documents with a TTL and hit/miss/eviction counters
+
+    Cached documents are shared between requests and must not be mutated.
+
+    A load that races a write must not put the old document back after the
+    write invalidated it, so loads go through get_or_load(): an entry is
+    only stored if its site wasn't invalidated since the load started, and
+    never replaces an entry holding a newer revision.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._sites: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._invalidated: Dict[str, int] = {}
+        # Loads started before this generation are never stored
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, site_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._sites.get(site_id)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._sites[site_id]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._sites.move_to_end(site_id)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def put(self, site: Dict[str, Any], generation: int) -> None:
+        """Store a site loaded when generation() returned `generation`"""
+        if self.maxsize <= 0:
+            return
+        site_id = site['id']
+        revision = site.get('revision', 0)
+        with self._lock:
+            if generation < self._floor or self._invalidated.get(site_id, -1) > generation:
+                return
+            current = self._sites.get(site_id)
+            if current is not None and current[1] > revision:
+                return
+            self._sites[site_id] = (time.monotonic() + self.ttl, revision, site)
+            self._sites.move_to_end(site_id)
+            while len(self._sites) > self.maxsize:
+                self._sites.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_load(self, site_id: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        site = self.get(site_id)
+        if site is not None:
+            return site
+        return await self.reload(site_id, load)
+
+    async def reload(self, site_id: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[Dict[str, Any]]:
+        """Load a site bypassing the cached entry, then cache what was loaded"""
+        generation = self.generation()
+        site = await load(site_id)
+        if site is not None:
+            self.put(site, generation)
+        return site
+
+    def invalidate(self, site_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            if len(self._invalidated) >= MAX_REMEMBERED_INVALIDATIONS:
+                self._invalidated.clear()
+                self._floor = self._generation
+            self._invalidated[site_id] = self._generation
+            if self._sites.pop(site_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidated.clear()
+            self._floor = self._generation
+            self.invalidations += len(self._sites)
+            self._sites.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._sites),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+site_cache = SiteCache(SITE_CACHE_SIZE, SITE_CACHE_TTL)
+
+
+async def change_streams_supported(db) -> bool:
+    """Whether the MongoDB deployment is a replica set or mongos, which change streams need"""
+    try:
+        hello = await db.command('hello')
+    except PyMongoError as e:
+        logger.warning(f"Could not tell whether MongoDB supports change streams: {e}")
+        return False
+    return 'setName' in hello or hello.get('msg') == 'isdbgrid'
+
+
+async def should_watch_site_changes(db) -> bool:
+    """SITE_CACHE_CHANGE_STREAM as a yes/no; "auto" asks the server"""
+    if SITE_CACHE_CHANGE_STREAM == 'auto':
+        return await change_streams_supported(db)
+    return SITE_CACHE_CHANGE_STREAM in ('1', 'true', 'yes')
+
+
+async def watch_site_changes(db, cache: SiteCache = site_cache) -> None:
+    """Invalidate sites changed by any worker, from a change stream on `sites`
+
+    Every page write also bumps its site's revision, so watching sites
+    covers both page storage layouts. Events that don't name the site
+    (deletes carry only the _id) clear the whole cache. Without a replica
+    set MongoDB refuses change streams; that is logged and entries then
+    expire by TTL.
+    """
+    pipeline = [{"$project": {"operationType": 1, "fullDocument.id": 1}}]
+    try:
+        async with db.sites.watch(pipeline, full_document='updateLookup') as stream:
+            logger.info("Site cache listening for changes from other workers")
+            async for change in stream:
+                site_id = (change.get('fullDocument') or {}).get('id')
+                if site_id:
+                    cache.invalidate(site_id)
+                else:
+                    cache.clear()
+    except asyncio.CancelledError:
+        raise
+    except PyMongoError as e:
+        logger.warning(f"Site cache change stream unavailable, relying on the {cache.ttl:g}s TTL: {e}")
@@ -0,0 +1,145 @@
+"""Delta sync: editor operations applied to a site as one targeted, revision-guarded update"""
+import copy
+from typing import Any, Dict, List, Set
+
+
+# Operations that change the pages array itself; they need every page loaded and rewrite the array
+PAGE_STRUCTURE_OPS = frozenset({'addPage', 'removePage', 'reorderPages'})
+# Operations that need the current blocks of their page
+BLOCK_OPS = frozenset({'upsertBlock', 'deleteBlock'})
+
+# Fields a patch may set on the site document (pages and blocks have their own operations)
+SITE_PATCH_FIELDS = frozenset({'name', 'status', 'siteStyles'})
+
+
+class InvalidOperation(ValueError):
+    """An operation refers to something that doesn't exist or is malformed"""
+
+
+def revision_filter(site_id: str, revision: int) -> Dict[str, Any]:
+    """Match the site only while it is still at `revision`; documents from before revisions count as 0"""
+    if revision == 0:
+        return {"id": site_id, "$or": [{"revision": 0}, {"revision": {"$exists": False}}]}
+    return {"id": site_id, "revision": revision}
+
+
+def load_pipeline(site_id: str, operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Aggregation reading only what the operations need
+
+    Structural operations load every page. Otherwise each page comes back
+    as its id, plus its blocks when a block operation touches it.
+    """
+    if any(op['op'] in PAGE_STRUCTURE_OPS for op in operations):
+        return [
+            {"$match": {"id": site_id}},
+            {"$project": {"_id": 0, "revision": 1, "pages": 1}}
+        ]
+
+    touched = sorted({op['pageId'] for op in operations if op['op'] in BLOCK_OPS})
+    return [
+        {"$match": {"id": site_id}},
+        {"$project": {
+            "_id": 0,
+            "revision": 1,
+            "pages": {"$map": {
+                "input": {"$ifNull": ["$pages", []]},
+                "as": "page",
+                "in": {"$cond": [
+                    {"$in": ["$$page.id", touched]},
+                    {"id": "$$page.id", "blocks": "$$page.blocks"},
+                    {"id": "$$page.id"}
+                ]}
+            }}
+        }}
+    ]
+
+
+def _page_index(pages: List[Dict[str, Any]], page_id: str) -> int:
+    for i, page in enumerate(pages):
+        if page['id'] == page_id:
+            return i
+    raise InvalidOperation(f"Page {page_id} not found")
+
+
+def build_update(pages: List[Dict[str, Any]], operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Apply operations to the loaded pages and return the $set document that persists them
+
+    Without structural operations page positions can't move, so only the
+    changed blocks arrays and fields are set, by index; the caller's
+    revision guard makes those indexes safe. With them, the whole pages
+    array is rewritten.
+
+    Args:
+        pages: Pages as loaded by load_pipeline
+        operations: Validated operations, applied in order
+    """
+    pages = copy.deepcopy(pages)
+    structure_changed = False
+    blocks_changed: Set[str] = set()
+    page_fields: Dict[str, Dict[str, Any]] = {}
+    site_fields: Dict[str, Any] = {}
+
+    for op in operations:
+        kind = op['op']
+
+        if kind == 'addPage':
+            page = op['page']
+            if any(existing['id'] == page['id'] for existing in pages):
+                raise InvalidOperation(f"Page {page['id']} already exists")
+            pages.insert(op.get('index', len(pages)), page)
+            structure_changed = True
+
+        elif kind == 'removePage':
+            del pages[_page_index(pages, op['pageId'])]
+            structure_changed = True
+
+        elif kind == 'reorderPages':
+            order = op['pageIds']
+            if sorted(order) != sorted(page['id'] for page in pages):
+                raise InvalidOperation("pageIds must list every page of the site exactly once")
+            by_id = {page['id']: page for page in pages}
+            pages = [by_id[page_id] for page_id in order]
+            structure_changed = True
+
+        elif kind == 'upsertBlock':
+            page = pages[_page_index(pages, op['pageId'])]
+            blocks = page.setdefault('blocks', [])
+            block = op['block']
+            position = next((i for i, existing in enumerate(blocks) if existing['id'] == block['id']), None)
+            if position is not None:
+                del blocks[position]
+            index = op.get('index', len(blocks) if position is None else position)
+            blocks.insert(index, block)
+            blocks_changed.add(page['id'])
+
+        elif kind == 'deleteBlock':
+            page = pages[_page_index(pages, op['pageId'])]
+            page['blocks'] = [block for block in page.get('blocks', []) if block['id'] != op['blockId']]
+            blocks_changed.add(page['id'])
+
+        elif kind == 'patch':
+            fields = op['fields']
+            if op.get('pageId') is None:
+                unknown = set(fields) - SITE_PATCH_FIELDS
+                if unknown:
+                    raise InvalidOperation(f"Cannot patch site fields: {', '.join(sorted(unknown))}")
+                site_fields.update(fields)
+            else:
+                page = pages[_page_index(pages, op['pageId'])]
+                page.update(fields)
+                page_fields.setdefault(page['id'], {}).update(fields)
+                if 'blocks' in fields:
+                    blocks_changed.add(page['id'])
+
+    update: Dict[str, Any] = dict(site_fields)
+    if structure_changed:
+        update['pages'] = pages
+        return update
+
+    for i, page in enumerate(pages):
+        if page['id'] in blocks_changed:
+            update[f"pages.{i}.blocks"] = page['blocks']
+        for field, value in page_fields.get(page['id'], {}).items():
+            if field != 'blocks':
+                update[f"pages.{i}.{field}"] = value
+    return update
@@ -0,0 +1,104 @@
+"""Site listing: lightweight summaries, newest first, paged with a keyset cursor on (updatedAt, id)"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Fields a listing can return and the projection expression computing each of them
+LISTING_FIELDS: Dict[str, Any] = {
+    "id": 1,
+    "name": 1,
+    "status": 1,
+    "pageCount": {"$size": {"$ifNull": ["$pages", []]}},
+    "revision": {"$ifNull": ["$revision", 0]},
+    "createdAt": 1,
+    "updatedAt": 1,
+    "siteStyles": 1,
+}
+# Returned when the request doesn't select fields
+SUMMARY_FIELDS = ("id", "name", "status", "pageCount", "createdAt", "updatedAt")
+
+
+class InvalidListing(ValueError):
+    """A malformed cursor or an unknown field in the selector"""
+
+
+def parse_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Fields selected by a comma separated `fields=` value; id is always included"""
+    if not fields:
+        return SUMMARY_FIELDS
+    selected = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in selected if field not in LISTING_FIELDS]
+    if unknown:
+        raise InvalidListing(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(["id", *selected]))
+
+
+def encode_cursor(site: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past `site`"""
+    updated_at = site.get('updatedAt')
+    if isinstance(updated_at, datetime):
+        key = [updated_at.isoformat(), site['id'], 'date']
+    else:
+        # ISO string left by a document the datetime migration hasn't reached yet
+        key = [updated_at, site['id']]
+    raw = json.dumps(key, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        updated_at, site_id, *kind = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if kind == ['date']:
+            updated_at = datetime.fromisoformat(updated_at)
+    except (ValueError, TypeError):
+        raise InvalidListing("Invalid cursor")
+    if not isinstance(site_id, str):
+        raise InvalidListing("Invalid cursor")
+    return updated_at, site_id
+
+
+def listing_pipeline(fields: Tuple[str, ...], limit: int, cursor: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Aggregation returning up to limit + 1 sites after the cursor, so the caller can tell whether more follow
+
+    The $match/$sort prefix is served by the (updatedAt -1, id -1) index,
+    and only the selected fields are projected, so page content never
+    leaves the database.
+    """
+    match: Dict[str, Any] = {}
+    if cursor:
+        updated_at, site_id = decode_cursor(cursor)
+        after = [
+            {"updatedAt": {"$lt": updated_at}},
+            {"updatedAt": updated_at, "id": {"$lt": site_id}}
+        ]
+        if isinstance(updated_at, datetime):
+            # Descending BSON order puts dates before strings, so unmigrated sites come last
+            after.append({"updatedAt": {"$type": "string"}})
+        match = {"$or": after}
+
+    # updatedAt is always read because the next cursor is built from it
+    projection = {field: LISTING_FIELDS[field] for field in ("updatedAt", *fields)}
+    projection["_id"] = 0
+    return [
+        {"$match": match},
+        {"$sort": {"updatedAt": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection}
+    ]
+
+
+def listing_page(sites: List[Dict[str, Any]], fields: Tuple[str, ...], limit: int) -> Dict[str, Any]:
+    """Split the limit + 1 sites a pipeline returned into this page and the next cursor"""
+    has_more = len(sites) > limit
+    sites = sites[:limit]
+    next_cursor = encode_cursor(sites[-1]) if has_more else None
+    if "updatedAt" not in fields:
+        for site in sites:
+            site.pop("updatedAt", None)
+    return {"sites": sites, "nextCursor": next_cursor}
@@ -0,0 +1,175 @@
+"""Serving /uploads: long-lived caching, conditional and range requests
+
+Content-addressed uploads (ab/cd/<sha256>.<ext>) never change under
+their name, so they are sent as immutable for a year with the hash as
+ETag: an editor load after the first asks for none of them again. Other
+files under the directory get an ETag from their mtime and size and are
+revalidated on every use. Either way If-None-Match and If-Modified-Since
+are answered with 304 and a single byte range with 206.
+"""
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import aiofiles
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from upload_store import IMAGE_EXTENSIONS, content_hash
+
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Anything not named by its content may change: cache it, but check before each use
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Extension -> media type for stored uploads; mimetypes misses some (webp on older systems)
+MEDIA_TYPES = {extension: content_type for content_type, extension in IMAGE_EXTENSIONS.items() if content_type != "image/jpg"}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def media_type_of(path: Path) -> str:
+    return MEDIA_TYPES.get(path.suffix[1:].lower()) or mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match uses"""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def not_modified(request_headers: Headers, etag: str, mtime: float) -> bool:
+    """If-None-Match when sent, otherwise If-Modified-Since (RFC 9110 section 13.2.2)"""
+    if_none_match = request_headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request_headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single-range Range header
+
+    Returns None for headers that are not a single bytes range, which
+    are ignored and answered with the whole file; raises
+    RangeNotSatisfiable when the range lies past the end.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0 or (last and end < start):
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+class FileRangeResponse(FileResponse):
+    """206 Partial Content with bytes first..last of a file"""
+
+    def __init__(self, path: Path, first: int, last: int, stat_result: os.stat_result, headers: Dict[str, str], media_type: str):
+        headers = {
+            **headers,
+            "content-length": str(last - first + 1),
+            "content-range": f"bytes {first}-{last}/{stat_result.st_size}"
+        }
+        super().__init__(path, status_code=206, headers=headers, media_type=media_type, stat_result=stat_result)
+        self.first = first
+        self.last = last
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        remaining = self.last - self.first + 1
+        async with aiofiles.open(self.path, 'rb') as f:
+            await f.seek(self.first)
+            while remaining:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining:
+            # The file shrank underneath us; end the body rather than hang the client
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for the upload directory with the caching policy described above"""
+
+    def lookup_path(self, path: str) -> Tuple[str, Optional[os.stat_result]]:
+        # Uploads still being received (.incoming) and other dotfiles are not served
+        if any(part.startswith('.') for part in Path(path).parts):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        path = Path(full_path)
+        media_type = media_type_of(path)
+        sha256 = content_hash(path)
+        if sha256 is not None:
+            etag = f'"{sha256}"'
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+            cache_control = REVALIDATE_CACHE_CONTROL
+
+        headers = {
+            "cache-control": cache_control,
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True)
+        }
+
+        if not_modified(request_headers, etag, stat_result.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        range_header = request_headers.get('range')
+        if range_header and scope["method"] == "GET" and self._range_applies(request_headers, etag, headers["last-modified"]):
+            try:
+                span = byte_range(range_header, stat_result.st_size)
+            except RangeNotSatisfiable:
+                return Response(status_code=416, headers={**headers, "content-range": f"bytes */{stat_result.st_size}"})
+            if span is not None:
+                return FileRangeResponse(path, *span, stat_result, headers, media_type)
+
+        return FileResponse(path, status_code=status_code, headers=headers, media_type=media_type, stat_result=stat_result)
+
+    @staticmethod
+    def _range_applies(request_headers: Headers, etag: str, last_modified: str) -> bool:
+        """If-Range: the range holds only while the client's copy is current (strong comparison)"""
+        if_range = request_headers.get('if-range')
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"'):
+            return if_range == etag
+        return if_range == last_modified
@@ -0,0 +1,354 @@
+"""Content-addressed image uploads, streamed from the request body to disk
+
+Every upload is stored once, as <sha256>.<ext> under two levels of
+subdirectories taken from the hash (ab/cd/abcd....png), whatever its
+original name. The `uploads` collection maps each hash to the file's
+metadata and to the sites whose pages reference it: `sites` holds their
+ids and `refCount` how many there are. The server recounts a site's
+references after every write to it, so a file with refCount 0 is no
+longer used by any site.
+"""
+import hashlib
+import logging
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.requests import Request
+
+from db_codec import utc_now
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted image; bigger uploads are refused with 413 as soon as they cross it
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+# Multipart boundaries, part headers and small form fields on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Accepted content types and the extension stored files get
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+}
+
+# Uploads being received; renamed into the upload directory once complete
+INCOMING_DIR = '.incoming'
+
+# Lets a client that already hashed a file skip sending it again
+UPLOAD_HASH_HEADER = 'x-content-sha256'
+
+SHA256_PATTERN = re.compile(r'[0-9a-f]{64}')
+
+
+class InvalidUpload(ValueError):
+    """The request is not a multipart image upload the store accepts"""
+
+
+class UploadTooLarge(Exception):
+    """The upload crossed UPLOAD_MAX_BYTES"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large. Maximum size is {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class IncomingUpload:
+    temp_path: Path
+    size: int
+    sha256: str
+    content_type: str
+
+
+@dataclass
+class StoredUpload:
+    # Relative to the upload directory, e.g. ab/cd/abcd....png
+    filename: str
+    size: int
+    sha256: str
+    content_type: str
+    # The same bytes were already stored; nothing was written
+    deduplicated: bool
+
+
+def content_filename(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+
+def content_hash(path: Path) -> Optional[str]:
+    """SHA-256 of a content-addressed upload, read from its path; None for other files"""
+    sha256 = path.stem
+    if SHA256_PATTERN.fullmatch(sha256) and path.parent.name == sha256[2:4] and path.parent.parent.name == sha256[:2]:
+        return sha256
+    return None
+
+
+def upload_hash(url: str) -> Optional[str]:
+    """SHA-256 of the content-addressed upload a URL points at; None for any other URL"""
+    if '/uploads/' not in url:
+        return None
+    return content_hash(PurePosixPath(url.split('/uploads/')[-1].split('?')[0]))
+
+
+class _Events:
+    """Collects the parser's synchronous callbacks so they can be handled with awaits in between"""
+
+    def __init__(self):
+        self.events: List[Tuple[str, bytes]] = []
+        self._header_field = b''
+        self._header_value = b''
+
+    def callbacks(self) -> Dict[str, object]:
+        return {
+            'on_part_begin': lambda: self.events.append(('begin', b'')),
+            'on_part_data': lambda data, start, end: self.events.append(('data', data[start:end])),
+            'on_part_end': lambda: self.events.append(('end', b'')),
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+        }
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self.events.append(('header', self._header_field.lower() + b'\0' + self._header_value))
+        self._header_field = b''
+        self._header_value = b''
+
+    def drain(self) -> List[Tuple[str, bytes]]:
+        events, self.events = self.events, []
+        return events
+
+
+async def receive_upload(
+    request: Request,
+    incoming: Path,
+    field: str = 'file',
+    max_bytes: int = UPLOAD_MAX_BYTES
+) -> IncomingUpload:
+    """Stream the `field` file of a multipart request into a temp file in `incoming`
+
+    The body is parsed as it arrives, so the event loop never waits on a
+    whole upload: chunks are written to a temp file with aiofiles and fed
+    to a SHA-256 as they come. A Content-Length beyond the limit is refused
+    before anything is read, and a body without one is cut off as soon as
+    the file crosses max_bytes. The caller owns the temp file.
+    """
+    content_type, params = parse_options_header(request.headers.get('content-type'))
+    boundary = params.get(b'boundary')
+    if content_type != b'multipart/form-data' or not boundary:
+        raise InvalidUpload("Expected a multipart/form-data upload")
+
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD:
+        raise UploadTooLarge(max_bytes)
+
+    incoming.mkdir(exist_ok=True)
+    temp_path = incoming / f"{uuid.uuid4().hex}.part"
+
+    events = _Events()
+    parser = MultipartParser(boundary, events.callbacks())
+    digest = hashlib.sha256()
+    size = 0
+    file_type: Optional[str] = None
+    out = None
+    # Per part: its headers, whether its data started, and whether that data is the upload
+    headers: Dict[bytes, bytes] = {}
+    started = in_file = False
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for kind, data in events.drain():
+                if kind == 'begin':
+                    headers = {}
+                    started = in_file = False
+                elif kind == 'header':
+                    name, _, value = data.partition(b'\0')
+                    headers[name] = value
+                elif kind == 'data':
+                    if not started:
+                        # The first data of a part follows its last header
+                        started = True
+                        in_file = out is None and _is_upload_field(headers, field)
+                        if in_file:
+                            file_type = headers.get(b'content-type', b'').decode('latin-1').strip().lower()
+                            if file_type not in IMAGE_EXTENSIONS:
+                                raise InvalidUpload(f"Invalid file type. Allowed types: {', '.join(IMAGE_EXTENSIONS)}")
+                            out = await aiofiles.open(temp_path, 'wb')
+                    if in_file:
+                        size += len(data)
+                        if size > max_bytes:
+                            raise UploadTooLarge(max_bytes)
+                        digest.update(data)
+                        await out.write(data)
+                elif kind == 'end' and not started and out is None and _is_upload_field(headers, field):
+                    raise InvalidUpload("Uploaded file is empty")
+        parser.finalize()
+
+        if out is None:
+            raise InvalidUpload(f"No '{field}' file in the upload")
+        await out.close()
+    except BaseException:
+        if out is not None:
+            await out.close()
+        await _discard(temp_path)
+        raise
+
+    return IncomingUpload(temp_path=temp_path, size=size, sha256=digest.hexdigest(), content_type=file_type)
+
+
+async def _discard(path: Path) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _is_upload_field(headers: Dict[bytes, bytes], field: str) -> bool:
+    _, params = parse_options_header(headers.get(b'content-disposition'))
+    return params.get(b'name') == field.encode('utf-8') and b'filename' in params
+
+
+class UploadStore:
+    """Deduplicating upload store: files on disk by content hash, metadata in the `uploads` collection"""
+
+    def __init__(self, db, upload_dir: Path):
+        self.db = db
+        self.upload_dir = upload_dir
+
+    async def save(self, request: Request, max_bytes: int = UPLOAD_MAX_BYTES) -> StoredUpload:
+        """Store the image uploaded with `request`, or reuse the copy already stored
+
+        A request naming a known hash in the X-Content-SHA256 header is
+        answered from the stored copy without reading its body. Otherwise
+        the body is streamed and hashed; bytes already on disk are dropped
+        and the existing file is returned.
+        """
+        claimed = request.headers.get(UPLOAD_HASH_HEADER, '').strip().lower()
+        if SHA256_PATTERN.fullmatch(claimed):
+            stored = await self._reuse(claimed)
+            if stored is not None:
+                return stored
+
+        upload = await receive_upload(request, self.upload_dir / INCOMING_DIR, max_bytes=max_bytes)
+        filename = content_filename(upload.sha256, IMAGE_EXTENSIONS[upload.content_type])
+        target = self.upload_dir / filename
+        try:
+            deduplicated = await aiofiles.os.path.isfile(target)
+            if deduplicated:
+                await _discard(upload.temp_path)
+            else:
+                await aiofiles.os.makedirs(target.parent, exist_ok=True)
+                # Concurrent uploads of the same bytes replace the file with an identical copy
+                await aiofiles.os.replace(upload.temp_path, target)
+        except BaseException:
+            await _discard(upload.temp_path)
+            raise
+
+        await self._record(upload.sha256, filename, upload.content_type, upload.size)
+        logger.info(f"{'Reused' if deduplicated else 'Stored'} upload {filename} ({upload.size} bytes)")
+        return StoredUpload(
+            filename=filename,
+            size=upload.size,
+            sha256=upload.sha256,
+            content_type=upload.content_type,
+            deduplicated=deduplicated
+        )
+
+    async def find(self, sha256: str) -> Optional[Dict[str, Any]]:
+        return await self.db.uploads.find_one({"sha256": sha256}, {"_id": 0})
+
+    async def path_of(self, sha256: str) -> Optional[Path]:
+        """Local file of the upload with this hash; None if unknown or missing from disk"""
+        document = await self.find(sha256)
+        if not document:
+            return None
+        path = self.upload_dir / document['filename']
+        return path if await aiofiles.os.path.isfile(path) else None
+
+    async def set_site_references(self, site_id: str, sha256s: Iterable[str]) -> None:
+        """Record that a site references exactly these uploads, adjusting every affected refCount
+
+        Membership in `sites` and refCount change in the same document
+        update, so the count always equals the number of sites listed.
+        """
+        referenced = sorted(set(sha256s))
+        await self.db.uploads.update_many(
+            {"sites": site_id, "sha256": {"$nin": referenced}},
+            {"$pull": {"sites": site_id}, "$inc": {"refCount": -1}}
+        )
+        if referenced:
+            await self.db.uploads.update_many(
+                {"sha256": {"$in": referenced}, "sites": {"$ne": site_id}},
+                {"$addToSet": {"sites": site_id}, "$inc": {"refCount": 1}}
+            )
+
+    async def untracked(self) -> bool:
+        """Whether some uploads predate reference tracking and need a backfill"""
+        return await self.db.uploads.find_one({"sites": {"$exists": False}}, {"_id": 1}) is not None
+
+    async def start_tracking(self) -> None:
+        """Give uploads recorded before reference tracking an empty reference list"""
+        await self.db.uploads.update_many({"sites": {"$exists": False}}, {"$set": {"sites": [], "refCount": 0}})
+
+    async def unused(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Uploads no site references, oldest first"""
+        cursor = self.db.uploads.find({"refCount": 0}, {"_id": 0, "sites": 0}).sort("createdAt", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def _reuse(self, sha256: str) -> Optional[StoredUpload]:
+        document = await self.find(sha256)
+        if not document or not await aiofiles.os.path.isfile(self.upload_dir / document['filename']):
+            return None
+        await self.db.uploads.update_one({"sha256": sha256}, {"$set": {"lastUploadedAt": utc_now()}})
+        return StoredUpload(
+            filename=document['filename'],
+            size=document['size'],
+            sha256=sha256,
+            content_type=document['contentType'],
+            deduplicated=True
+        )
+
+    async def _record(self, sha256: str, filename: str, content_type: str, size: int) -> Dict[str, Any]:
+        now = utc_now()
+        update = {
+            "$set": {"lastUploadedAt": now},
+            "$setOnInsert": {
+                "filename": filename,
+                "contentType": content_type,
+                "size": size,
+                "createdAt": now,
+                # Sites start referencing it once they are saved with its URL
+                "sites": [],
+                "refCount": 0
+            }
+        }
+        try:
+            return await self.db.uploads.find_one_and_update(
+                {"sha256": sha256}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost the insert race to an upload of the same bytes; theirs is the record
+            return await self.db.uploads.find_one_and_update(
+                {"sha256": sha256}, update, return_document=ReturnDocument.AFTER
+            )
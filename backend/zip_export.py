@@ -0,0 +1,245 @@
+"""Streaming ZIP writer: yields archive bytes as entries are produced, never holding the whole archive"""
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import Callable, Deque, Iterable, Iterator, List, Tuple, Union
+
+
+# Size of reads from disk and of the chunks handed to the response
+ZIP_CHUNK_SIZE = 64 * 1024
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+# Deflate level for text entries (HTML, CSS, README)
+ZIP_DEFLATE_LEVEL = int(os.environ.get('ZIP_DEFLATE_LEVEL', '6'))
+# Threads compressing large text entries ahead of the writer; 0 compresses inline
+ZIP_COMPRESS_WORKERS = int(os.environ.get('ZIP_COMPRESS_WORKERS', '0'))
+# Text entries at least this big are handed to the compression workers
+PARALLEL_COMPRESS_THRESHOLD = 256 * 1024
+
+# Already-compressed formats; deflating them again burns CPU for no gain
+STORED_EXTENSIONS = frozenset({
+    '.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif',
+    '.zip', '.gz', '.br', '.woff', '.woff2', '.mp3', '.mp4', '.webm'
+})
+
+ZipSource = Union[str, bytes, Path]
+
+# Same thresholds as zipfile; past them the 32/16-bit fields hold the ZIP64 markers
+_ZIP64_LIMIT = (1 << 31) - 1
+_ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
+_ZIP64_MARKER = 0xFFFFFFFF
+_ZIP64_COUNT_MARKER = 0xFFFF
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+def compression_for(arcname: str) -> int:
+    """STORED for compressed media, DEFLATED for everything else"""
+    if PurePosixPath(arcname).suffix.lower() in STORED_EXTENSIONS:
+        return ZIP_STORED
+    return ZIP_DEFLATED
+
+
+def _compress(data: bytes, method: int, level: int) -> Tuple[int, bytes]:
+    """CRC-32 and (raw deflate or stored) payload of an in-memory entry"""
+    crc = zlib.crc32(data)
+    if method == ZIP_STORED:
+        return crc, data
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return crc, compressor.compress(data) + compressor.flush()
+
+
+def _dos_datetime(timestamp: float) -> Tuple[int, int]:
+    t = time.localtime(timestamp)
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((max(t.tm_year, 1980) - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+class _Entry:
+    """Bookkeeping for one archive member, used to write the central directory"""
+
+    def __init__(self, name: bytes, method: int, flags: int, dos_time: int, dos_date: int, offset: int):
+        self.name = name
+        self.method = method
+        self.flags = flags
+        self.dos_time = dos_time
+        self.dos_date = dos_date
+        self.offset = offset
+        self.crc = 0
+        self.compress_size = 0
+        self.file_size = 0
+
+
+class ZipStreamWriter:
+    """Minimal ZIP (with ZIP64) writer producing bytes for an unseekable stream
+
+    In-memory entries are written with CRC and sizes in the local header.
+    Files on disk are streamed in chunks, with CRC and sizes in a data
+    descriptor after the data.
+    """
+
+    def __init__(self, level: int = ZIP_DEFLATE_LEVEL, chunk_size: int = ZIP_CHUNK_SIZE):
+        self.level = level
+        self.chunk_size = chunk_size
+        self.offset = 0
+        self.entries: List[_Entry] = []
+        self.dos_time, self.dos_date = _dos_datetime(time.time())
+
+    def _emit(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def _new_entry(self, arcname: str, method: int, flags: int) -> _Entry:
+        entry = _Entry(arcname.encode('utf-8'), method, flags | _FLAG_UTF8, self.dos_time, self.dos_date, self.offset)
+        self.entries.append(entry)
+        return entry
+
+    def _local_header(self, entry: _Entry, zip64: bool) -> bytes:
+        if zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, entry.file_size, entry.compress_size)
+            sizes = (_ZIP64_MARKER, _ZIP64_MARKER)
+        else:
+            extra = b''
+            sizes = (entry.compress_size, entry.file_size)
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 45 if zip64 else 20, entry.flags, entry.method,
+            entry.dos_time, entry.dos_date, entry.crc, sizes[0], sizes[1], len(entry.name), len(extra)
+        ) + entry.name + extra
+
+    def write_bytes(self, arcname: str, crc: int, payload: bytes, file_size: int, method: int) -> bytes:
+        """Whole entry from an already compressed payload"""
+        entry = self._new_entry(arcname, method, 0)
+        entry.crc = crc
+        entry.compress_size = len(payload)
+        entry.file_size = file_size
+        zip64 = entry.file_size >= _ZIP64_LIMIT or entry.compress_size >= _ZIP64_LIMIT
+        return self._emit(self._local_header(entry, zip64) + payload)
+
+    def write_file(self, arcname: str, path: Path, method: int) -> Iterator[bytes]:
+        """Stream a file from disk in chunk_size reads"""
+        entry = self._new_entry(arcname, method, _FLAG_DATA_DESCRIPTOR)
+        # Stored data can't grow, deflate may grow incompressible input slightly
+        zip64 = path.stat().st_size * 1.05 >= _ZIP64_LIMIT
+        yield self._emit(self._local_header(entry, zip64))
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15) if method == ZIP_DEFLATED else None
+        with open(path, 'rb') as src:
+            for block in iter(lambda: src.read(self.chunk_size), b''):
+                entry.crc = zlib.crc32(block, entry.crc)
+                entry.file_size += len(block)
+                data = compressor.compress(block) if compressor else block
+                if data:
+                    entry.compress_size += len(data)
+                    yield self._emit(data)
+        if compressor:
+            data = compressor.flush()
+            entry.compress_size += len(data)
+            yield self._emit(data)
+
+        if zip64:
+            descriptor = struct.pack('<IIQQ', 0x08074b50, entry.crc, entry.compress_size, entry.file_size)
+        else:
+            descriptor = struct.pack('<IIII', 0x08074b50, entry.crc, entry.compress_size, entry.file_size)
+        yield self._emit(descriptor)
+
+    def close(self) -> bytes:
+        """Central directory and end records"""
+        cd_offset = self.offset
+        directory = []
+        for entry in self.entries:
+            extra_values = []
+            file_size, compress_size, offset = entry.file_size, entry.compress_size, entry.offset
+            if file_size >= _ZIP64_LIMIT:
+                extra_values.append(file_size)
+                file_size = _ZIP64_MARKER
+            if compress_size >= _ZIP64_LIMIT:
+                extra_values.append(compress_size)
+                compress_size = _ZIP64_MARKER
+            if offset >= _ZIP64_LIMIT:
+                extra_values.append(offset)
+                offset = _ZIP64_MARKER
+            extra = struct.pack(f'<HH{len(extra_values)}Q', 0x0001, 8 * len(extra_values), *extra_values) if extra_values else b''
+            version = 45 if extra_values else 20
+            directory.append(struct.pack(
+                '<IHHHHHHIIIHHHHHII', 0x02014b50, (3 << 8) | version, version, entry.flags, entry.method,
+                entry.dos_time, entry.dos_date, entry.crc, compress_size, file_size,
+                len(entry.name), len(extra), 0, 0, 0, 0o100644 << 16, offset
+            ) + entry.name + extra)
+        cd = b''.join(directory)
+        cd_size = len(cd)
+        tail = b''
+
+        count = len(self.entries)
+        if count >= _ZIP_FILECOUNT_LIMIT or cd_offset >= _ZIP64_LIMIT or cd_size >= _ZIP64_LIMIT:
+            zip64_eocd_offset = cd_offset + cd_size
+            tail += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, count, count, cd_size, cd_offset)
+            tail += struct.pack('<IIQI', 0x07064b50, 0, zip64_eocd_offset, 1)
+            count, cd_size, cd_offset = _ZIP64_COUNT_MARKER, _ZIP64_MARKER, _ZIP64_MARKER
+        tail += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, count, count, cd_size, cd_offset, 0)
+        return self._emit(cd + tail)
+
+
+def stream_zip(
+    entries: Iterable[Tuple[str, ZipSource]],
+    chunk_size: int = ZIP_CHUNK_SIZE,
+    level: int = ZIP_DEFLATE_LEVEL,
+    compression: Callable[[str], int] = compression_for,
+    compress_workers: int = ZIP_COMPRESS_WORKERS
+) -> Iterator[bytes]:
+    """Yield a ZIP archive chunk by chunk
+
+    Entries are consumed lazily, so callers can render content as the archive
+    is being sent. Files on disk are copied in chunk_size reads.
+
+    Args:
+        entries: (archive name, content) pairs; content is text, bytes or a Path
+        chunk_size: Read size for files on disk
+        level: Deflate level for compressed entries
+        compression: Picks ZIP_STORED or ZIP_DEFLATED per archive name
+        compress_workers: If > 0, large text entries are compressed on that
+            many threads ahead of the writer (zlib releases the GIL)
+    """
+    writer = ZipStreamWriter(level=level, chunk_size=chunk_size)
+    pool = ThreadPoolExecutor(max_workers=compress_workers, thread_name_prefix='zip') if compress_workers > 0 else None
+    # Entries waiting to be written, in archive order; bounded so look-ahead can't hold the whole site
+    pending: Deque[tuple] = deque()
+    window = max(compress_workers * 2, 1)
+
+    def flush_one() -> Iterator[bytes]:
+        arcname, method, item = pending.popleft()
+        if isinstance(item, Path):
+            yield from writer.write_file(arcname, item, method)
+        else:
+            file_size, job = item
+            crc, payload = job.result() if isinstance(job, Future) else job
+            yield writer.write_bytes(arcname, crc, payload, file_size, method)
+
+    try:
+        for arcname, source in entries:
+            method = compression(arcname)
+            if isinstance(source, Path):
+                pending.append((arcname, method, source))
+            else:
+                data = source.encode('utf-8') if isinstance(source, str) else source
+                if pool and method == ZIP_DEFLATED and len(data) >= PARALLEL_COMPRESS_THRESHOLD:
+                    job = pool.submit(_compress, data, method, level)
+                else:
+                    job = _compress(data, method, level)
+                pending.append((arcname, method, (len(data), job)))
+
+            while len(pending) > window:
+                yield from flush_one()
+
+        while pending:
+            yield from flush_one()
+        yield writer.close()
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
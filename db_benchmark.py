@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+MongoDB Benchmark
+Runs directly against MONGO_URL from backend/.env in a scratch database that is dropped afterwards
+
+- lookup: find_one latency by site id and by page id as the sites collection grows,
+  without indexes and after the startup index bootstrapper ran
+- pages: single-page read and write latency on a 1,000 page site, with pages embedded
+  in the site document and in their own collection (PAGE_STORAGE)
+- bytes: BSON bytes MongoDB returns per request of the styles and page export
+  endpoints on a 1,000 page site, reading the whole site (before) and reading narrowly (after)
+
+Usage:
+    python db_benchmark.py [lookup|pages|bytes]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import bson
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from db_codec import utc_now
+from db_indexes import ensure_indexes
+from page_store import PAGE_STORES
+
+COLLECTION_SIZES = [1000, 10000, 50000]
+LOOKUPS = 200
+INSERT_BATCH = 1000
+
+SITE_PAGES = 1000
+BLOCKS_PER_PAGE = 10
+PAGE_OPERATIONS = 200
+
+
+def connect():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / 'backend' / '.env')
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    return client, client[f"db_benchmark_{uuid.uuid4().hex[:8]}"]
+
+
+def make_site(i):
+    return {
+        "id": f"site-{i}",
+        "name": f"Site {i}",
+        "status": "unpublished",
+        "pages": [
+            {"id": f"site-{i}-page-{p}", "name": f"Page {p}", "pageUrl": f"page-{p}.html", "blocks": []}
+            for p in range(3)
+        ],
+        "revision": 0,
+        "createdAt": "2025-01-01T00:00:00+00:00",
+        "updatedAt": f"2025-01-01T00:00:{i % 60:02d}+00:00"
+    }
+
+
+async def grow(collection, size):
+    count = await collection.count_documents({})
+    while count < size:
+        batch = [make_site(i) for i in range(count, min(count + INSERT_BATCH, size))]
+        await collection.insert_many(batch)
+        count += len(batch)
+
+
+async def lookup_latency(collection, size, query):
+    timings = []
+    for n in range(LOOKUPS):
+        i = (n * 7919) % size
+        start = time.perf_counter()
+        found = await collection.find_one(query(i), {"_id": 0, "id": 1})
+        timings.append((time.perf_counter() - start) * 1000)
+        if not found:
+            raise RuntimeError(f"Lookup {query(i)} found nothing")
+    return statistics.median(timings)
+
+
+async def run_lookup_benchmark_async():
+    client, db = connect()
+    by_site = lambda i: {"id": f"site-{i}"}
+    by_page = lambda i: {"pages.id": f"site-{i}-page-1"}
+
+    print(f"Lookup latency (p50 of {LOOKUPS} find_one calls) vs sites collection size")
+    print("=" * 72)
+    print(f"{'sites':>8} {'by id':>12} {'indexed':>10} {'by page id':>12} {'indexed':>10}")
+    print("-" * 72)
+
+    try:
+        plain = db.sites_plain
+        indexed = db.sites
+        await ensure_indexes(db)
+        for size in COLLECTION_SIZES:
+            await grow(plain, size)
+            await grow(indexed, size)
+            row = [
+                await lookup_latency(plain, size, by_site),
+                await lookup_latency(indexed, size, by_site),
+                await lookup_latency(plain, size, by_page),
+                await lookup_latency(indexed, size, by_page),
+            ]
+            print(f"{size:>8} " + " ".join(f"{ms:>9.2f}ms" for ms in row))
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    print("\n✅ Benchmark completed")
+
+
+def run_lookup_benchmark():
+    asyncio.run(run_lookup_benchmark_async())
+
+
+def make_page(p):
+    return {
+        "id": f"p{p}",
+        "name": f"Page {p}",
+        "blocks": [
+            {"id": f"p{p}-b{b}", "type": "text", "content": f"Page {p} block {b} " + "lorem ipsum dolor sit amet " * 8}
+            for b in range(BLOCKS_PER_PAGE)
+        ],
+        "pageUrl": f"page-{p}.html",
+        "pageDescription": f"Description of page {p}",
+        "socialSharingEnabled": True,
+        "socialSharingImageUrl": "",
+        "headCode": "<script>window.analytics = true;</script>",
+        "bodyEndCode": "",
+        "beforeDoctypeCode": ""
+    }
+
+
+def describe(timings):
+    ordered = sorted(timings)
+    return f"{statistics.median(ordered):>8.2f}ms {ordered[int(len(ordered) * 0.95) - 1]:>8.2f}ms"
+
+
+async def run_pages_benchmark_async():
+    client, db = connect()
+    pages = [make_page(p) for p in range(SITE_PAGES)]
+
+    print(f"Single-page latency on a {SITE_PAGES} page site ({BLOCKS_PER_PAGE} blocks per page), {PAGE_OPERATIONS} operations")
+    print("=" * 72)
+    print(f"{'storage':<11} {'operation':<12} {'p50':>10} {'p95':>10}")
+    print("-" * 72)
+
+    try:
+        await ensure_indexes(db)
+        for name, store_class in PAGE_STORES.items():
+            store = store_class(db)
+            site_id = f"bench-{name}"
+            site = {"id": site_id, "name": "Page Benchmark Site", "status": "unpublished", "pages": [dict(page) for page in pages], "revision": 0}
+            detached = store.detach_pages(site)
+            await db.sites.insert_one(site)
+            if detached is not None:
+                await store.replace_pages(site_id, detached)
+
+            reads, writes = [], []
+            for n in range(PAGE_OPERATIONS):
+                page_id = f"p{(n * 7919) % SITE_PAGES}"
+
+                start = time.perf_counter()
+                _, page = await store.load_page(site_id, page_id)
+                reads.append((time.perf_counter() - start) * 1000)
+                if not page:
+                    raise RuntimeError(f"{name}: page {page_id} not found")
+
+                blocks = page['blocks']
+                blocks[0] = dict(blocks[0], content=f"Edited {n}")
+                start = time.perf_counter()
+                await store.update_page(site_id, page_id, {"blocks": blocks}, utc_now())
+                writes.append((time.perf_counter() - start) * 1000)
+
+            print(f"{name:<11} {'read page':<12} {describe(reads)}")
+            print(f"{name:<11} {'write page':<12} {describe(writes)}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    print("\n✅ Benchmark completed")
+
+
+def run_pages_benchmark():
+    asyncio.run(run_pages_benchmark_async())
+
+
+def bson_size(*docs):
+    return sum(len(bson.encode(doc)) for doc in docs if doc is not None)
+
+
+async def run_bytes_benchmark_async():
+    client, db = connect()
+    pages = [make_page(p) for p in range(SITE_PAGES)]
+
+    print(f"BSON bytes read per request on a {SITE_PAGES} page site ({BLOCKS_PER_PAGE} blocks per page)")
+    print("=" * 72)
+    print(f"{'storage':<11} {'request':<22} {'before':>10} {'after':>10} {'saved':>9}")
+    print("-" * 72)
+
+    try:
+        await ensure_indexes(db)
+        for name, store_class in PAGE_STORES.items():
+            store = store_class(db)
+            site_id = f"bench-{name}"
+            site = {"id": site_id, "name": "Bytes Benchmark Site", "status": "unpublished", "pages": [dict(page) for page in pages], "revision": 0, "siteStyles": {"customCSS": ""}}
+            detached = store.detach_pages(site)
+            await db.sites.insert_one(site)
+            if detached is not None:
+                await store.replace_pages(site_id, detached)
+
+            # Before, each of these endpoints started with the same full read
+            full = bson_size(await store.load_site(site_id))
+            page_id = f"p{SITE_PAGES // 2}"
+            rows = [
+                ("GET styles", bson_size(await store.load_site_fields(site_id, "siteStyles"))),
+                ("GET page export", bson_size(*await store.load_page(site_id, page_id))),
+                # The existence check folds into update_one's matched_count
+                ("PUT styles", 0),
+            ]
+            for request, after in rows:
+                saved = f"{full / after:.0f}x" if after else "all"
+                print(f"{name:<11} {request:<22} {full / 1024:>8.0f}KB {after / 1024:>8.1f}KB {saved:>9}")
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    print("\n✅ Benchmark completed")
+
+
+def run_bytes_benchmark():
+    asyncio.run(run_bytes_benchmark_async())
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode in (None, 'lookup'):
+        run_lookup_benchmark()
+    if mode in (None, 'pages'):
+        run_pages_benchmark()
+    if mode in (None, 'bytes'):
+        run_bytes_benchmark()
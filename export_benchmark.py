@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ZIP Export Benchmark
+- memory: peak RSS of the streaming ZIP writer against the old in-memory BytesIO export
+- compression: wall time and CPU seconds of the per-entry compression policy on a 200-image site
+
+Each memory measurement runs in a fresh process so ru_maxrss reflects only that export.
+Images are random bytes, i.e. incompressible, like real JPEG/PNG/WebP uploads.
+
+Usage:
+    python export_benchmark.py [memory|compression]
+"""
+
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from zip_export import ZIP_DEFLATED, stream_zip
+
+ARCHIVE_SIZES_MB = [10, 50, 150]
+IMAGE_SIZE = 2 * 1024 * 1024
+
+SITE_IMAGES = 200
+SITE_IMAGE_SIZE = 300 * 1024
+SITE_PAGES = 20
+
+
+def make_images(directory, total_mb):
+    paths = []
+    remaining = total_mb * 1024 * 1024
+    i = 0
+    while remaining > 0:
+        size = min(IMAGE_SIZE, remaining)
+        path = Path(directory) / f"img-{i}.jpg"
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        paths.append(path)
+        remaining -= size
+        i += 1
+    return paths
+
+
+def entries(paths):
+    yield "styles.css", "body { margin: 0; }\n" * 100
+    for path in paths:
+        yield f"images/{path.name}", path
+    yield "index.html", "<html><body>" + "<p>text</p>" * 1000 + "</body></html>"
+
+
+def export_buffered(paths):
+    """The previous implementation: whole archive in a BytesIO, then copied once more"""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for arcname, source in entries(paths):
+            if isinstance(source, Path):
+                zip_file.write(source, arcname)
+            else:
+                zip_file.writestr(arcname, source)
+    zip_buffer.seek(0)
+    body = io.BytesIO(zip_buffer.getvalue())
+    return sum(len(chunk) for chunk in iter(lambda: body.read(64 * 1024), b''))
+
+
+def export_streaming(paths):
+    return sum(len(chunk) for chunk in stream_zip(entries(paths)))
+
+
+def measure(mode, directory, queue):
+    paths = sorted(Path(directory).glob('*.jpg'))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = export_buffered(paths) if mode == 'buffered' else export_streaming(paths)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux
+    queue.put((size, (peak - baseline) / 1024, elapsed))
+
+
+def run(mode, directory):
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=measure, args=(mode, directory, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def run_memory_benchmark():
+    print("ZIP export benchmark: peak RSS growth vs archive size")
+    print("=" * 60)
+    print(f"{'archive':>10} {'buffered RSS':>14} {'streaming RSS':>15} {'buffered':>10} {'streaming':>10}")
+    print("-" * 60)
+
+    for total_mb in ARCHIVE_SIZES_MB:
+        with tempfile.TemporaryDirectory(prefix='zip-bench-') as directory:
+            make_images(directory, total_mb)
+            size, buffered_rss, buffered_time = run('buffered', directory)
+            _, streaming_rss, streaming_time = run('streaming', directory)
+        print(
+            f"{size / 1024 / 1024:>8.1f}MB {buffered_rss:>12.1f}MB {streaming_rss:>13.1f}MB "
+            f"{buffered_time:>9.2f}s {streaming_time:>9.2f}s"
+        )
+
+    print()
+
+
+def site_entries(paths):
+    yield "styles.css", "body { margin: 0; }\n" * 500
+    for path in paths:
+        yield f"images/{path.name}", path
+    for i in range(SITE_PAGES):
+        html = "<section class=\"text-block\"><p>" + f"Paragraph {i} " * 20 + "</p></section>\n"
+        yield f"page-{i}.html", "<html><body>" + html * 2000 + "</body></html>"
+    yield "README.txt", "Exported site\n" * 50
+
+
+def time_export(paths, **options):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    size = sum(len(chunk) for chunk in stream_zip(site_entries(paths), **options))
+    return time.process_time() - cpu, time.perf_counter() - wall, size
+
+
+def run_compression_benchmark():
+    print(f"ZIP export benchmark: {SITE_IMAGES} images x {SITE_IMAGE_SIZE // 1024} KiB, {SITE_PAGES} pages")
+    print("=" * 60)
+    print(f"{'policy':<28} {'wall':>8} {'cpu':>8} {'archive':>10}")
+    print("-" * 60)
+
+    configs = [
+        ("deflate everything (old)", {"compression": lambda name: ZIP_DEFLATED}),
+        ("store media, deflate text", {}),
+        ("  + 4 compression workers", {"compress_workers": 4}),
+    ]
+    with tempfile.TemporaryDirectory(prefix='zip-bench-') as directory:
+        paths = []
+        for i in range(SITE_IMAGES):
+            path = Path(directory) / f"img-{i}.jpg"
+            path.write_bytes(os.urandom(SITE_IMAGE_SIZE))
+            paths.append(path)
+
+        for label, options in configs:
+            cpu, wall, size = time_export(paths, **options)
+            print(f"{label:<28} {wall:>7.2f}s {cpu:>7.2f}s {size / 1024 / 1024:>8.1f}MB")
+    print()
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode in (None, 'memory'):
+        run_memory_benchmark()
+    if mode in (None, 'compression'):
+        run_compression_benchmark()
+    print("✅ Benchmark completed")
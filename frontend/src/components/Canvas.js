@@ -2,6 +2,7 @@ import React from 'react';
 import { DragDropContext, Droppable, Draggable } from '@hello-pangea/dnd';
 import { useBuilder } from '../context/BuilderContext';
 import { FiPlus, FiTrash2, FiSettings, FiCode, FiMoreVertical } from 'react-icons/fi';
+import { imageVariantUrl } from '../lib/utils';
 
 const Canvas = () => {
   const { 
@@ -234,7 +235,7 @@ const BlockRenderer = ({ block }) => {
       return (
         <div className="canvas-block p-8">
           <img 
-            src={block.content.src || 'https://via.placeholder.com/1200x600'} 
+            src={imageVariantUrl(block.content.src, { width: 1200 }) || 'https://via.placeholder.com/1200x600'} 
             alt={block.content.alt || 'Image'}
             className="w-full rounded-lg shadow-lg"
           />
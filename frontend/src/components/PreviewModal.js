@@ -1,6 +1,7 @@
 import React from 'react';
 import { X } from 'lucide-react';
 import { useBuilder } from '../context/BuilderContext';
+import { imageVariantUrl } from '../lib/utils';
 
 const PreviewModal = () => {
   const { previewMode, setPreviewMode, currentPage, mobilePreview } = useBuilder();
@@ -116,7 +117,7 @@ const PreviewModal = () => {
           <section className="py-16 px-6">
             <div className="max-w-6xl mx-auto">
               <img 
-                src={block.content?.imageUrl || 'https://via.placeholder.com/1200x600'} 
+                src={imageVariantUrl(block.content?.imageUrl, { width: 1200 }) || 'https://via.placeholder.com/1200x600'} 
                 alt={block.content?.alt || 'Image'}
                 className="w-full rounded-lg shadow-lg"
               />
@@ -11,10 +11,38 @@ const PublishDialog = () => {
   const [publishOnlyChanges, setPublishOnlyChanges] = useState(false);
   const [ftpManagerOpen, setFtpManagerOpen] = useState(false);
   const [isPublishing, setIsPublishing] = useState(false);
+  const [publishJob, setPublishJob] = useState(null);
   const fileInputRef = useRef(null);
 
   if (!publishDialogOpen) return null;
 
+  const formatBytes = (bytes) => `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+
+  // Follow a background publish job over Server-Sent Events until it finishes
+  const followPublishJob = (backendUrl, jobId) => new Promise((resolve, reject) => {
+    const source = new EventSource(`${backendUrl}/api/publish-jobs/${jobId}/events`);
+    source.addEventListener('progress', (e) => setPublishJob(JSON.parse(e.data)));
+    source.addEventListener('done', (e) => {
+      source.close();
+      resolve(JSON.parse(e.data));
+    });
+    source.onerror = () => {
+      source.close();
+      reject(new Error('Conexiunea cu serverul s-a întrerupt'));
+    };
+  });
+
+  const handleCancelPublish = async () => {
+    if (!publishJob) return;
+    const backendUrl = process.env.REACT_APP_BACKEND_URL || '';
+    try {
+      await fetch(`${backendUrl}/api/publish-jobs/${publishJob.id}/cancel`, { method: 'POST' });
+      showInfo('Se oprește publicarea...');
+    } catch (error) {
+      console.error('Cancel error:', error);
+    }
+  };
+
   const handleExportProject = async () => {
     try {
       setIsPublishing(true);
@@ -171,7 +199,7 @@ const PublishDialog = () => {
         showInfo('🌐 Upload pe FTP...');
         
         const response = await fetch(
-          `${backendUrl}/api/sites/${currentSite.id}/publish-ftp`,
+          `${backendUrl}/api/sites/${currentSite.id}/publish-jobs`,
           {
             method: 'POST',
             headers: {
@@ -184,13 +212,24 @@ const PublishDialog = () => {
           }
         );
 
-        if (response.ok) {
-          const data = await response.json();
+        if (!response.ok) {
+          const error = await response.json();
+          showError(`Eroare FTP: ${error.detail?.message || error.detail || 'Eroare necunoscută'}`);
+          return;
+        }
+
+        const job = await response.json();
+        setPublishJob(job);
+        const finishedJob = await followPublishJob(backendUrl, job.id);
+
+        if (finishedJob.status === 'succeeded') {
+          const data = finishedJob.result;
           showSuccess(`Site publicat cu succes pe FTP!\n✅ ${data.total_files} fișiere urcate\n📁 Server: ${data.host}\n📂 Folder: ${data.folder}`);
           setPublishDialogOpen(false);
+        } else if (finishedJob.status === 'cancelled') {
+          showInfo('Publicarea a fost oprită.');
         } else {
-          const error = await response.json();
-          showError(`Eroare FTP: ${error.detail || 'Eroare necunoscută'}`);
+          showError(`Eroare FTP: ${finishedJob.error || 'Eroare necunoscută'}`);
         }
       }
     } catch (error) {
@@ -198,6 +237,7 @@ const PublishDialog = () => {
       alert(`Error during publishing: ${error.message}`);
     } finally {
       setIsPublishing(false);
+      setPublishJob(null);
     }
   };
 
@@ -326,6 +366,42 @@ const PublishDialog = () => {
               </div>
             )}
 
+            {/* FTP Publish Progress */}
+            {isPublishing && publishJob && (
+              <div className="p-4 bg-slate-700 rounded-lg space-y-2">
+                <div className="flex items-center justify-between text-sm">
+                  <span>
+                    {publishJob.progress.filesDone} / {publishJob.progress.filesTotal} fișiere
+                    {' · '}
+                    {formatBytes(publishJob.progress.bytesDone)} / {formatBytes(publishJob.progress.bytesTotal)}
+                  </span>
+                  <span className="text-gray-400">
+                    {formatBytes(publishJob.progress.throughput)}/s
+                    {publishJob.progress.eta !== null && ` · ${Math.ceil(publishJob.progress.eta)}s rămase`}
+                  </span>
+                </div>
+                <div className="w-full h-2 bg-slate-600 rounded">
+                  <div
+                    className="h-2 bg-indigo-500 rounded transition-all"
+                    style={{
+                      width: `${publishJob.progress.bytesTotal
+                        ? Math.round((publishJob.progress.bytesDone / publishJob.progress.bytesTotal) * 100)
+                        : 0}%`
+                    }}
+                  />
+                </div>
+                <div className="flex justify-end">
+                  <button
+                    onClick={handleCancelPublish}
+                    disabled={publishJob.cancelRequested}
+                    className="px-4 py-1 text-sm bg-red-600 hover:bg-red-700 rounded transition-colors"
+                  >
+                    OPREȘTE
+                  </button>
+                </div>
+              </div>
+            )}
+
             {/* Help Text */}
             {publishMethod === 'project' && (
               <div className="text-sm text-gray-300 bg-blue-900 bg-opacity-30 p-4 rounded-lg border border-blue-600">
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { FiX, FiUpload, FiDownload, FiImage } from 'react-icons/fi';
 import { useBuilder } from '../context/BuilderContext';
+import { imageVariantUrl } from '../lib/utils';
 import CodeMirror from '@uiw/react-codemirror';
 import { html } from '@codemirror/lang-html';
 import { javascript } from '@codemirror/lang-javascript';
@@ -250,7 +251,7 @@ const SettingsPanel = () => {
                   {settings.socialSharingImageUrl ? (
                     <div className="relative">
                       <img
-                        src={settings.socialSharingImageUrl}
+                        src={imageVariantUrl(settings.socialSharingImageUrl, { width: 640, height: 384, fit: 'cover' })}
                         alt="Social sharing"
                         className="w-full h-48 object-cover rounded-lg border border-gray-600"
                       />
@@ -4,3 +4,19 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Uploads stored by content hash: <backend>/uploads/ab/cd/<sha256>.<ext>
+const HASHED_UPLOAD = /^(.*)\/uploads\/[0-9a-f]{2}\/[0-9a-f]{2}\/([0-9a-f]{64})\.\w+$/;
+
+// URL of a resized copy of an uploaded image, served by the backend's /api/images;
+// any other URL is returned as it is
+export function imageVariantUrl(url, { width, height, fit, format = 'webp' } = {}) {
+  const match = typeof url === 'string' && url.match(HASHED_UPLOAD);
+  if (!match) return url;
+
+  const params = new URLSearchParams({ format });
+  if (width) params.set('width', width);
+  if (height) params.set('height', height);
+  if (fit) params.set('fit', fit);
+  return `${match[1]}/api/images/${match[2]}?${params}`;
+}
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+FTP Publish Benchmark
+Compares sequential vs parallel multi-connection uploads against a local FTP server
+
+Requires pyftpdlib (pip install pyftpdlib). Each STOR is delayed by a simulated
+round trip so the numbers resemble a remote hosting provider rather than loopback.
+
+Usage:
+    python ftp_benchmark.py          # parallel upload speedup vs file count
+    python ftp_benchmark.py load     # API latency while publishes hit a slow FTP stub
+                                     # (needs the backend running on the same host)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import logging
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from ftp_publish import ParallelFTPUploader, PublishArtifact, ensure_remote_dirs, open_ftp_session
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    print("pyftpdlib is required: pip install pyftpdlib")
+    sys.exit(1)
+
+SIMULATED_RTT = float(os.environ.get('FTP_BENCH_RTT', '0.05'))
+FILE_COUNTS = [10, 50, 200]
+CONNECTIONS = [1, 2, 4, 8]
+IMAGE_SIZE = 64 * 1024
+
+LOAD_PUBLISHES = 6
+LOAD_STUB_DELAY = 0.5
+LOAD_SAMPLES = 40
+
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+
+def start_ftp_server(root):
+    """Start a threaded local FTP server and return its port"""
+    authorizer = DummyAuthorizer()
+    authorizer.add_user('bench', 'bench', root, perm='elradfmwMT')
+
+    class SlowHandler(FTPHandler):
+        def ftp_STOR(self, file, mode='w'):
+            time.sleep(SIMULATED_RTT)
+            return super().ftp_STOR(file, mode)
+
+    SlowHandler.authorizer = authorizer
+    # pyftpdlib configures its own logging unless a handler is already attached
+    ftp_logger = logging.getLogger('pyftpdlib')
+    ftp_logger.addHandler(logging.NullHandler())
+    ftp_logger.propagate = False
+
+    server = ThreadedFTPServer(('127.0.0.1', 0), SlowHandler)
+    port = server.socket.getsockname()[1]
+    threading.Thread(target=server.serve_forever, kwargs={'handle_exit': False}, daemon=True).start()
+    return port
+
+
+def build_artifacts(count):
+    """Roughly the shape of a real site: mostly images, CSS, a few pages"""
+    artifacts = [PublishArtifact.from_bytes('styles.css', b'body { margin: 0; }\n' * 200)]
+    pages = max(1, count // 10)
+    for i in range(count - pages - 1):
+        artifacts.append(PublishArtifact.from_bytes(f'images/img-{i}.jpg', os.urandom(IMAGE_SIZE)))
+    for i in range(pages):
+        artifacts.append(PublishArtifact.from_bytes(f'page-{i}.html', b'<html><body>page</body></html>' * 50))
+    return artifacts
+
+
+def run_publish(port, artifacts, connections):
+    def connect():
+        return open_ftp_session('127.0.0.1', port, 'bench', 'bench')
+
+    start = time.perf_counter()
+    with ParallelFTPUploader(connect, connections=connections) as uploader:
+        ensure_remote_dirs(uploader.session(0), [a.path for a in artifacts])
+        uploaded, failed = uploader.upload(artifacts)
+    elapsed = time.perf_counter() - start
+
+    if failed or len(uploaded) != len(artifacts):
+        raise RuntimeError(f"Upload incomplete: {len(uploaded)}/{len(artifacts)}, failed={failed}")
+    return elapsed
+
+
+def run_upload_benchmark():
+    print(f"FTP publish benchmark (simulated RTT {SIMULATED_RTT * 1000:.0f} ms per STOR)")
+    print("=" * 60)
+
+    root = tempfile.mkdtemp(prefix='ftp-bench-')
+    port = start_ftp_server(root)
+
+    header = f"{'files':>6} " + " ".join(f"{f'{c} conn':>10}" for c in CONNECTIONS) + f" {'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+
+    for count in FILE_COUNTS:
+        artifacts = build_artifacts(count)
+        timings = [run_publish(port, artifacts, connections) for connections in CONNECTIONS]
+        speedup = timings[0] / timings[-1]
+        print(f"{count:>6} " + " ".join(f"{t:>9.2f}s" for t in timings) + f" {speedup:>8.1f}x")
+
+    print("\n✅ Benchmark completed")
+
+
+def sample_latency(url, samples):
+    import requests
+
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        response = requests.get(url, timeout=30)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return timings
+
+
+def describe(timings):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"p50 {statistics.median(ordered):7.1f} ms   p95 {p95:7.1f} ms   max {ordered[-1]:7.1f} ms"
+
+
+def run_load_test():
+    """GET /api/sites/{id} latency before and during concurrent publishes to a slow FTP stub"""
+    import requests
+
+    global SIMULATED_RTT
+    SIMULATED_RTT = LOAD_STUB_DELAY
+
+    api_url = f"{get_backend_url()}/api"
+    print(f"FTP load test against {api_url} ({LOAD_PUBLISHES} publishes, {LOAD_STUB_DELAY}s per STOR)")
+    print("=" * 60)
+
+    root = tempfile.mkdtemp(prefix='ftp-load-')
+    port = start_ftp_server(root)
+
+    site = requests.post(f"{api_url}/sites", json={"name": "FTP Load Test Site"}, timeout=10).json()
+    site_url = f"{api_url}/sites/{site['id']}"
+    publish_body = {
+        "ftpSettings": {
+            "protocol": "FTP",
+            "host": "127.0.0.1",
+            "port": port,
+            "username": "bench",
+            "password": "bench",
+            "rootFolder": "load"
+        },
+        "connections": 1
+    }
+
+    try:
+        baseline = sample_latency(site_url, LOAD_SAMPLES)
+        print(f"idle       {describe(baseline)}")
+
+        with ThreadPoolExecutor(max_workers=LOAD_PUBLISHES) as pool:
+            publishes = [
+                pool.submit(requests.post, f"{site_url}/publish-ftp", json=publish_body, timeout=300)
+                for _ in range(LOAD_PUBLISHES)
+            ]
+            time.sleep(0.2)
+            under_load = sample_latency(site_url, LOAD_SAMPLES)
+            statuses = [future.result().status_code for future in publishes]
+
+        print(f"publishing {describe(under_load)}")
+        print(f"publish responses: {statuses}")
+
+        ratio = statistics.median(under_load) / statistics.median(baseline)
+        if ratio < 3:
+            print(f"\n✅ PASS: p50 latency under load is {ratio:.1f}x idle")
+        else:
+            print(f"\n❌ FAIL: p50 latency under load is {ratio:.1f}x idle - event loop is being blocked")
+    finally:
+        requests.delete(site_url, timeout=10)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'load':
+        run_load_test()
+    else:
+        run_upload_benchmark()
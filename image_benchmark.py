@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Image Derivative Benchmark
+Encoding throughput and delivered bytes of the responsive image derivatives
+
+- throughput: derivatives of a batch of photo-like uploads encoded on the calling
+  thread (1 worker) and on the process pool (IMAGE_DERIVATIVE_WORKERS)
+- bytes: what a phone (375px viewport at 2x) and a desktop (1440px at 1x) download
+  per image, the original (before) against the srcset candidate a browser picks (after)
+
+Usage:
+    python image_benchmark.py [throughput|bytes]
+"""
+
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+import image_derivatives
+from image_derivatives import DerivativeStore
+
+SOURCE_COUNT = 8
+SOURCE_SIZE = (2400, 1600)
+# (label, viewport CSS width, device pixel ratio)
+VIEWPORTS = [("phone", 375, 2), ("desktop", 1440, 1)]
+
+
+def make_photo(seed):
+    """A JPEG with smooth gradients and fine texture, compressing roughly like a photo"""
+    width, height = SOURCE_SIZE
+    texture = Image.effect_noise((width // 4, height // 4), 60 + seed).filter(ImageFilter.GaussianBlur(1)).resize(SOURCE_SIZE)
+    gradient = Image.linear_gradient('L').resize(SOURCE_SIZE).rotate(seed * 40)
+    image = Image.merge('RGB', (gradient, texture, Image.blend(gradient, texture, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def write_sources(directory):
+    sources = []
+    for seed in range(SOURCE_COUNT):
+        path = directory / f"photo-{seed}.jpg"
+        path.write_bytes(make_photo(seed))
+        sources.append((f"{seed:064x}", path))
+    return sources
+
+
+def run_throughput_benchmark():
+    workers = image_derivatives.IMAGE_DERIVATIVE_WORKERS
+    print(f"Derivatives of {SOURCE_COUNT} {SOURCE_SIZE[0]}x{SOURCE_SIZE[1]} JPEGs: widths {image_derivatives.IMAGE_DERIVATIVE_WIDTHS}, "
+          f"formats {image_derivatives.encodable_formats(image_derivatives.IMAGE_DERIVATIVE_FORMATS)} + source")
+    print("=" * 72)
+    print(f"{'workers':>8} {'elapsed':>10} {'images/s':>10} {'files/s':>10} {'source MP/s':>12}")
+    print("-" * 72)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        sources = write_sources(scratch)
+        megapixels = SOURCE_COUNT * SOURCE_SIZE[0] * SOURCE_SIZE[1] / 1e6
+
+        for worker_count in sorted({1, workers}):
+            store = DerivativeStore(scratch / f"derivatives-{worker_count}", workers=worker_count)
+            if worker_count > 1:
+                # Start the pool outside the timing
+                image_derivatives.get_derivative_executor().submit(int).result()
+            start = time.perf_counter()
+            sets = store.ensure(sources)
+            elapsed = time.perf_counter() - start
+            files = sum(len(derivatives.variants) for derivatives in sets.values())
+            print(f"{worker_count:>8} {elapsed:>9.2f}s {SOURCE_COUNT / elapsed:>10.2f} {files / elapsed:>10.1f} {megapixels / elapsed:>12.1f}")
+
+            start = time.perf_counter()
+            DerivativeStore(scratch / f"derivatives-{worker_count}", workers=worker_count).ensure(sources)
+            print(f"{'':>8} {(time.perf_counter() - start) * 1000:>8.1f}ms  re-run with every derivative already on disk")
+
+    image_derivatives.shutdown_derivative_executor()
+    print("\n✅ Benchmark completed")
+
+
+def chosen_candidate(candidates, needed_width):
+    """Roughly what a browser takes from a srcset: the narrowest candidate at least as wide as needed"""
+    wide_enough = [candidate for candidate in candidates if candidate[0] >= needed_width]
+    return min(wide_enough) if wide_enough else max(candidates)
+
+
+def run_bytes_benchmark():
+    print(f"Bytes downloaded per {SOURCE_SIZE[0]}x{SOURCE_SIZE[1]} image, median of {SOURCE_COUNT}")
+    print("=" * 72)
+    print(f"{'viewport':<10} {'format':<8} {'width':>7} {'before':>10} {'after':>10} {'saved':>8}")
+    print("-" * 72)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        scratch = Path(scratch)
+        sources = write_sources(scratch)
+        sets = DerivativeStore(scratch / "derivatives", workers=1).ensure(sources)
+        originals = {sha256: path.stat().st_size for sha256, path in sources}
+
+        formats = image_derivatives.encodable_formats(image_derivatives.IMAGE_DERIVATIVE_FORMATS) + ["jpeg"]
+        for label, viewport, ratio in VIEWPORTS:
+            for name in formats:
+                before, after, widths = [], [], []
+                for sha256, derivatives in sets.items():
+                    candidates = [(variant.width, variant.path.stat().st_size) for variant in derivatives.variants if variant.format == name]
+                    if name == derivatives.source_format:
+                        candidates.append((derivatives.width, originals[sha256]))
+                    width, size = chosen_candidate(candidates, min(viewport, derivatives.width) * ratio)
+                    before.append(originals[sha256])
+                    after.append(size)
+                    widths.append(width)
+                saved = statistics.median(before) / statistics.median(after)
+                print(f"{label:<10} {name:<8} {statistics.median(widths):>6.0f}w {statistics.median(before) / 1024:>8.0f}KB "
+                      f"{statistics.median(after) / 1024:>8.0f}KB {saved:>7.1f}x")
+
+    print("\n✅ Benchmark completed")
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode in (None, 'throughput'):
+        run_throughput_benchmark()
+    if mode in (None, 'bytes'):
+        run_bytes_benchmark()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Image Variant Endpoint Testing
+Checks resizing, caching headers and that simultaneous requests for a new variant share one encode
+"""
+
+import io
+import requests
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from PIL import Image
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+BASE_URL = get_backend_url()
+API_URL = f"{BASE_URL}/api"
+
+SIMULTANEOUS_REQUESTS = 20
+
+print(f"Testing image variants at: {API_URL}")
+print("=" * 60)
+
+def upload_test_image():
+    """Upload a fresh 1600x1000 JPEG; returns its SHA-256"""
+    print("\n🔧 Uploading Test Image")
+    print("-" * 40)
+    
+    try:
+        image = Image.effect_noise((1600, 1000), 50).convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        response = requests.post(
+            f"{API_URL}/upload-image",
+            files={"file": ("variant-test.jpg", buffer.getvalue(), "image/jpeg")},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print(f"❌ Failed to upload test image: {response.status_code}")
+            return None
+        print(f"✅ Uploaded {response.json()['filename']}")
+        return response.json()['sha256']
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Failed to upload test image: {str(e)}")
+        return None
+
+def test_resize_and_headers(sha256):
+    """A variant has the requested size and format, a strong ETag and immutable caching; revalidation gets 304"""
+    print("\n🔧 Testing Resize and Cache Headers")
+    print("-" * 40)
+    
+    try:
+        url = f"{API_URL}/images/{sha256}"
+        checks = [
+            ({"width": 400}, (400, 250), "image/webp"),
+            ({"width": 300, "height": 300, "fit": "cover"}, (300, 300), "image/webp"),
+            ({"height": 100, "format": "jpeg", "quality": 60}, (160, 100), "image/jpeg"),
+            # Never enlarged
+            ({"width": 4000}, (1600, 1000), "image/webp"),
+        ]
+        for params, size, media_type in checks:
+            response = requests.get(url, params=params, timeout=60)
+            if response.status_code != 200:
+                print(f"❌ FAIL: {params} returned {response.status_code}")
+                return False
+            actual = Image.open(io.BytesIO(response.content)).size
+            if actual != size or response.headers['content-type'] != media_type:
+                print(f"❌ FAIL: {params} gave {actual} {response.headers['content-type']}, expected {size} {media_type}")
+                return False
+        
+        etag = response.headers.get('etag', '')
+        if not etag.startswith('"') or 'immutable' not in response.headers.get('cache-control', ''):
+            print(f"❌ FAIL: Missing strong ETag or immutable Cache-Control: {dict(response.headers)}")
+            return False
+        
+        revalidated = requests.get(url, params={"width": 4000}, headers={"If-None-Match": etag}, timeout=30)
+        if revalidated.status_code != 304:
+            print(f"❌ FAIL: Revalidation returned {revalidated.status_code}")
+            return False
+        
+        print(f"✅ PASS: {len(checks)} variants with the requested size and format, ETag revalidates with 304")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_simultaneous_requests_share_one_encode(sha256):
+    """N simultaneous requests for a variant nobody asked for yet trigger exactly one encode"""
+    print(f"\n🔧 Testing {SIMULTANEOUS_REQUESTS} Simultaneous Requests for a New Variant")
+    print("-" * 40)
+    
+    try:
+        before = requests.get(f"{API_URL}/metrics", timeout=10).json()['imageVariants']
+        params = {"width": 777, "height": 555, "fit": "cover"}
+        with ThreadPoolExecutor(max_workers=SIMULTANEOUS_REQUESTS) as pool:
+            responses = list(pool.map(
+                lambda _: requests.get(f"{API_URL}/images/{sha256}", params=params, timeout=60),
+                range(SIMULTANEOUS_REQUESTS)
+            ))
+        after = requests.get(f"{API_URL}/metrics", timeout=10).json()['imageVariants']
+        
+        if any(response.status_code != 200 for response in responses):
+            print(f"❌ FAIL: Statuses {[response.status_code for response in responses]}")
+            return False
+        if len({response.content for response in responses}) != 1:
+            print("❌ FAIL: Requests received different bytes")
+            return False
+        
+        encodes = after['encodes'] - before['encodes']
+        print(f"   Encodes: {encodes}, coalesced: {after['coalesced'] - before['coalesced']}, cache hits: {after['hits'] - before['hits']}")
+        if encodes != 1:
+            print(f"❌ FAIL: Expected 1 encode, got {encodes}")
+            return False
+        print(f"✅ PASS: {SIMULTANEOUS_REQUESTS} requests served from one encode")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_unknown_image():
+    """Unknown hashes and out-of-range parameters are rejected"""
+    print("\n🔧 Testing Unknown Image and Invalid Parameters")
+    print("-" * 40)
+    
+    try:
+        unknown = requests.get(f"{API_URL}/images/{'0' * 64}", params={"width": 100}, timeout=10).status_code
+        invalid = requests.get(f"{API_URL}/images/{'0' * 64}", params={"width": 0}, timeout=10).status_code
+        if unknown == 404 and invalid == 422:
+            print("✅ PASS: Unknown image returns 404, width=0 returns 422")
+            return True
+        print(f"❌ FAIL: Got {unknown} for an unknown image and {invalid} for width=0")
+        return False
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def main():
+    """Run all image variant tests"""
+    print("🚀 Starting Image Variant Tests")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("=" * 60)
+    
+    results = []
+    sha256 = upload_test_image()
+    
+    if sha256:
+        results.append(test_resize_and_headers(sha256))
+        results.append(test_simultaneous_requests_share_one_encode(sha256))
+    else:
+        print("❌ Cannot test image variants without an uploaded image")
+        results.extend([False, False])
+    results.append(test_unknown_image())
+    
+    # Summary
+    print("\n" + "=" * 60)
+    print("📊 IMAGE VARIANT TEST SUMMARY")
+    print("=" * 60)
+    
+    passed = sum(results)
+    total = len(results)
+    
+    print(f"✅ Passed: {passed}/{total}")
+    print(f"❌ Failed: {total - passed}/{total}")
+    
+    if passed == total:
+        print("\n🎉 ALL IMAGE VARIANT TESTS PASSED!")
+        return True
+    else:
+        print(f"\n⚠️  {total - passed} test(s) failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Page Storage Migration
+Moves the pages of every site out of the site document into the `pages` collection
+
+Run it before starting the backend with PAGE_STORAGE=collection, with the
+backend stopped or not taking edits. A site edited while it is being moved
+is left as it was and reported; run the script again to pick it up.
+Reads MONGO_URL and DB_NAME from backend/.env.
+
+Usage:
+    python migrate_pages.py
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / 'backend' / '.env')
+    from db_codec import CODEC_OPTIONS
+    from db_indexes import INDEXES, ensure_indexes
+    from page_store import move_pages_to_collection
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client.get_database(os.environ['DB_NAME'], codec_options=CODEC_OPTIONS)
+    try:
+        # Page lookups and replace_pages rely on the (site_id, id) index
+        await ensure_indexes(db, [spec for spec in INDEXES if spec.collection == 'pages'])
+        counts = await move_pages_to_collection(db)
+    finally:
+        client.close()
+
+    print(f"Moved {counts['pages']} page(s) of {counts['sites']} site(s)")
+    if counts['retry']:
+        print(f"⚠️  {counts['retry']} site(s) changed while being moved; run the migration again")
+        return False
+    print("✅ Migration completed")
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    success = asyncio.run(main())
+    sys.exit(0 if success else 1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Concurrent Page Update Testing
+Fires simultaneous page edits at the same site and checks that none of them is lost
+"""
+
+import requests
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+BASE_URL = get_backend_url()
+API_URL = f"{BASE_URL}/api"
+
+PAGE_COUNT = 20
+ROUNDS = 5
+# Fields edited at the same time on one shared page
+SHARED_PAGE_FIELDS = ["pageDescription", "headCode", "bodyEndCode", "beforeDoctypeCode", "socialSharingImageUrl"]
+
+print(f"Testing concurrent page updates at: {API_URL}")
+print("=" * 60)
+
+def create_site_with_pages():
+    """Create a test site with PAGE_COUNT empty pages"""
+    print(f"\n🔧 Creating Test Site with {PAGE_COUNT} Pages")
+    print("-" * 40)
+    
+    try:
+        response = requests.post(f"{API_URL}/sites", json={"name": "Concurrency Test Site"}, timeout=10)
+        if response.status_code != 200:
+            print(f"❌ Failed to create test site: {response.status_code}")
+            return None, []
+        site_id = response.json()['id']
+        
+        page_ids = []
+        for i in range(PAGE_COUNT):
+            response = requests.post(
+                f"{API_URL}/sites/{site_id}/pages",
+                json={"name": f"Page {i}", "pageUrl": f"page-{i}.html"},
+                timeout=10
+            )
+            if response.status_code != 200:
+                print(f"❌ Failed to create page {i}: {response.status_code}")
+                return site_id, []
+            page_ids.append(response.json()['id'])
+        
+        print(f"✅ Test site {site_id} created with {len(page_ids)} pages")
+        return site_id, page_ids
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return None, []
+
+def put_page(site_id, page_id, update):
+    response = requests.put(f"{API_URL}/sites/{site_id}/pages/{page_id}", json=update, timeout=30)
+    return response.status_code, response.json()
+
+def test_concurrent_edits_to_different_pages(site_id, page_ids):
+    """Every page is edited at the same moment; every edit must survive"""
+    print("\n🔧 Testing Concurrent Edits to Different Pages")
+    print("-" * 40)
+    
+    try:
+        for round_number in range(ROUNDS):
+            edits = {
+                page_id: {
+                    "pageDescription": f"round {round_number} page {i}",
+                    "blocks": [{"id": f"b{i}", "type": "text", "content": f"round {round_number} content {i}"}]
+                }
+                for i, page_id in enumerate(page_ids)
+            }
+            
+            with ThreadPoolExecutor(max_workers=len(page_ids)) as pool:
+                results = list(pool.map(lambda item: put_page(site_id, *item), edits.items()))
+            
+            failed = [status for status, _ in results if status != 200]
+            if failed:
+                print(f"❌ FAIL: {len(failed)} update(s) failed in round {round_number}: {failed[:5]}")
+                return False
+            
+            # Each response carries only the page that was updated
+            for (page_id, update), (_, body) in zip(edits.items(), results):
+                if body.get('id') != page_id or body.get('pageDescription') != update['pageDescription']:
+                    print(f"❌ FAIL: Response for page {page_id} does not reflect its update: {body}")
+                    return False
+            
+            site = requests.get(f"{API_URL}/sites/{site_id}", timeout=10).json()
+            stored = {page['id']: page for page in site['pages']}
+            lost = [
+                page_id for page_id, update in edits.items()
+                if stored[page_id]['pageDescription'] != update['pageDescription']
+                or stored[page_id]['blocks'] != update['blocks']
+            ]
+            if lost:
+                print(f"❌ FAIL: {len(lost)}/{len(edits)} edits lost in round {round_number}")
+                return False
+        
+        print(f"✅ PASS: {ROUNDS} rounds of {len(page_ids)} simultaneous page edits, none lost")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_concurrent_edits_to_same_page(site_id, page_id):
+    """Different fields of one page are edited at the same moment; every field must survive"""
+    print("\n🔧 Testing Concurrent Edits to Different Fields of One Page")
+    print("-" * 40)
+    
+    try:
+        for round_number in range(ROUNDS):
+            edits = [{field: f"{field} round {round_number}"} for field in SHARED_PAGE_FIELDS]
+            
+            with ThreadPoolExecutor(max_workers=len(edits)) as pool:
+                statuses = [status for status, _ in pool.map(lambda update: put_page(site_id, page_id, update), edits)]
+            
+            if any(status != 200 for status in statuses):
+                print(f"❌ FAIL: Updates failed in round {round_number}: {statuses}")
+                return False
+            
+            site = requests.get(f"{API_URL}/sites/{site_id}", timeout=10).json()
+            page = next(page for page in site['pages'] if page['id'] == page_id)
+            lost = [field for field in SHARED_PAGE_FIELDS if page[field] != f"{field} round {round_number}"]
+            if lost:
+                print(f"❌ FAIL: Fields lost in round {round_number}: {lost}")
+                return False
+        
+        print(f"✅ PASS: {ROUNDS} rounds of {len(SHARED_PAGE_FIELDS)} simultaneous field edits, none lost")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_update_missing_page(site_id):
+    """Updating an unknown page returns 404 and leaves the site untouched"""
+    print("\n🔧 Testing Update of a Missing Page")
+    print("-" * 40)
+    
+    try:
+        response = requests.put(f"{API_URL}/sites/{site_id}/pages/does-not-exist", json={"name": "x"}, timeout=10)
+        if response.status_code == 404 and response.json().get('detail') == "Page not found":
+            print("✅ PASS: Missing page returns 404 Page not found")
+            return True
+        print(f"❌ FAIL: Unexpected response {response.status_code}: {response.text}")
+        return False
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def cleanup_test_site(site_id):
+    """Clean up test site"""
+    if site_id:
+        print(f"\n🧹 Cleaning up test site: {site_id}")
+        try:
+            response = requests.delete(f"{API_URL}/sites/{site_id}", timeout=10)
+            if response.status_code == 200:
+                print("✅ Test site cleaned up successfully")
+            else:
+                print(f"⚠️  Warning: Could not clean up test site: {response.status_code}")
+        except:
+            print("⚠️  Warning: Could not clean up test site")
+
+def main():
+    """Run all concurrent page update tests"""
+    print("🚀 Starting Concurrent Page Update Tests")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("=" * 60)
+    
+    results = []
+    site_id, page_ids = create_site_with_pages()
+    
+    if site_id and page_ids:
+        results.append(test_concurrent_edits_to_different_pages(site_id, page_ids))
+        results.append(test_concurrent_edits_to_same_page(site_id, page_ids[0]))
+        results.append(test_update_missing_page(site_id))
+    else:
+        print("❌ Cannot test page updates without a valid site")
+        results.extend([False, False, False])
+    
+    cleanup_test_site(site_id)
+    
+    # Summary
+    print("\n" + "=" * 60)
+    print("📊 CONCURRENT PAGE UPDATE TEST SUMMARY")
+    print("=" * 60)
+    
+    passed = sum(results)
+    total = len(results)
+    
+    print(f"✅ Passed: {passed}/{total}")
+    print(f"❌ Failed: {total - passed}/{total}")
+    
+    if passed == total:
+        print("\n🎉 ALL CONCURRENT PAGE UPDATE TESTS PASSED!")
+        return True
+    else:
+        print(f"\n⚠️  {total - passed} test(s) failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+HTML Render Benchmark
+Pages per second for the template render engine at 10, 100 and 1,000 blocks per page
+
+Each size has a throughput target; the run fails if the engine falls below it.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from html_render import render_page
+
+BLOCK_TYPES = ['hero', 'text', 'features', 'image', 'text', 'footer']
+# Minimum pages/second per block count
+TARGETS = {10: 20000, 100: 2500, 1000: 250}
+MIN_SECONDS = 1.0
+
+
+def build_page(block_count):
+    blocks = []
+    for i in range(block_count):
+        block_type = BLOCK_TYPES[i % len(BLOCK_TYPES)]
+        content = f"http://localhost:8001/uploads/img-{i}.jpg" if block_type == 'image' else f"Block {i} content"
+        blocks.append({"id": str(i), "type": block_type, "content": content})
+    return {
+        "id": "bench",
+        "name": "Benchmark Page",
+        "blocks": blocks,
+        "pageUrl": "index.html",
+        "pageDescription": "Benchmark page",
+        "socialSharingEnabled": True,
+        "socialSharingImageUrl": "http://localhost:8001/uploads/social.jpg",
+        "headCode": "<script>var head = 1;</script>",
+        "bodyEndCode": "<script>var end = 1;</script>",
+        "beforeDoctypeCode": ""
+    }
+
+
+def pages_per_second(render, page):
+    rendered = 0
+    start = time.perf_counter()
+    while True:
+        render(page)
+        rendered += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return rendered / elapsed
+
+
+def main():
+    print("HTML render benchmark")
+    print("=" * 60)
+    print(f"{'blocks':>7} {'pages/s':>12} {'target':>10} {'KiB/page':>10}")
+    print("-" * 60)
+
+    failures = 0
+    for block_count, target in TARGETS.items():
+        page = build_page(block_count)
+        size = len(render_page(page, use_external_css=True)) / 1024
+        rate = pages_per_second(lambda p: render_page(p, use_external_css=True), page)
+        status = "✅" if rate >= target else "❌"
+        failures += rate < target
+        print(f"{block_count:>7} {rate:>12,.0f} {target:>10,} {size:>10.1f} {status}")
+
+    if failures:
+        print(f"\n❌ {failures} size(s) below target")
+        sys.exit(1)
+    print("\n✅ Benchmark completed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Site Listing Testing
+Walks the paginated GET /api/sites listing and checks summaries, cursors and field selection
+"""
+
+import requests
+import sys
+from datetime import datetime
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+BASE_URL = get_backend_url()
+API_URL = f"{BASE_URL}/api"
+
+SITE_COUNT = 12
+PAGE_SIZE = 5
+SUMMARY_FIELDS = {"id", "name", "status", "pageCount", "createdAt", "updatedAt"}
+
+print(f"Testing site listing at: {API_URL}")
+print("=" * 60)
+
+def create_test_sites():
+    """Create SITE_COUNT sites, each with the default Home page"""
+    print(f"\n🔧 Creating {SITE_COUNT} Test Sites")
+    print("-" * 40)
+    
+    site_ids = []
+    try:
+        for i in range(SITE_COUNT):
+            response = requests.post(f"{API_URL}/sites", json={"name": f"Listing Test Site {i}"}, timeout=10)
+            if response.status_code != 200:
+                print(f"❌ Failed to create test site {i}: {response.status_code}")
+                break
+            site_ids.append(response.json()['id'])
+        print(f"✅ Created {len(site_ids)} test sites")
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+    return site_ids
+
+def list_all_sites(params):
+    """Follow nextCursor until the last page; returns every listed site and the number of requests"""
+    sites, cursor, requests_made = [], None, 0
+    while True:
+        page_params = dict(params, cursor=cursor) if cursor else params
+        response = requests.get(f"{API_URL}/sites", params=page_params, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        sites.extend(body['sites'])
+        requests_made += 1
+        cursor = body['nextCursor']
+        if not cursor:
+            return sites, requests_made
+
+def test_pagination(site_ids):
+    """Every site appears exactly once, newest first, as summaries without pages"""
+    print("\n🔧 Testing Cursor Pagination")
+    print("-" * 40)
+    
+    try:
+        sites, requests_made = list_all_sites({"limit": PAGE_SIZE})
+        listed = [site['id'] for site in sites]
+        
+        if len(listed) != len(set(listed)):
+            print("❌ FAIL: A site was listed more than once")
+            return False
+        missing = set(site_ids) - set(listed)
+        if missing:
+            print(f"❌ FAIL: {len(missing)} test site(s) missing from the listing")
+            return False
+        if requests_made < len(listed) // PAGE_SIZE:
+            print(f"❌ FAIL: {len(listed)} sites came back in only {requests_made} request(s)")
+            return False
+        
+        keys = [(site['updatedAt'], site['id']) for site in sites]
+        if keys != sorted(keys, reverse=True):
+            print("❌ FAIL: Sites are not ordered by updatedAt, id descending")
+            return False
+        
+        extra = [site['id'] for site in sites if set(site) != SUMMARY_FIELDS]
+        if extra:
+            print(f"❌ FAIL: {len(extra)} site(s) carry fields other than the summary: {sorted(set(sites[0]))}")
+            return False
+        if any(site['pageCount'] != 1 for site in sites if site['id'] in site_ids):
+            print("❌ FAIL: Test sites should report one page")
+            return False
+        
+        print(f"✅ PASS: {len(listed)} sites listed once each over {requests_made} pages of {PAGE_SIZE}")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_field_selection():
+    """fields= returns id plus the selected fields and rejects unknown ones"""
+    print("\n🔧 Testing Field Selection")
+    print("-" * 40)
+    
+    try:
+        response = requests.get(f"{API_URL}/sites", params={"limit": PAGE_SIZE, "fields": "name,revision"}, timeout=10)
+        sites = response.json()['sites']
+        if response.status_code != 200 or any(set(site) != {"id", "name", "revision"} for site in sites):
+            print(f"❌ FAIL: Unexpected fields: {response.status_code} {sites[:1]}")
+            return False
+        
+        response = requests.get(f"{API_URL}/sites", params={"fields": "pages"}, timeout=10)
+        if response.status_code != 400:
+            print(f"❌ FAIL: Unknown field returned {response.status_code}")
+            return False
+        
+        response = requests.get(f"{API_URL}/sites", params={"cursor": "not-a-cursor"}, timeout=10)
+        if response.status_code != 400:
+            print(f"❌ FAIL: Malformed cursor returned {response.status_code}")
+            return False
+        
+        print("✅ PASS: Selected fields returned, unknown fields and bad cursors rejected with 400")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def cleanup_test_sites(site_ids):
+    """Clean up test sites"""
+    if site_ids:
+        print(f"\n🧹 Cleaning up {len(site_ids)} test sites")
+        for site_id in site_ids:
+            try:
+                requests.delete(f"{API_URL}/sites/{site_id}", timeout=10)
+            except:
+                print(f"⚠️  Warning: Could not clean up test site {site_id}")
+
+def main():
+    """Run all site listing tests"""
+    print("🚀 Starting Site Listing Tests")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("=" * 60)
+    
+    results = []
+    site_ids = create_test_sites()
+    
+    if len(site_ids) == SITE_COUNT:
+        results.append(test_pagination(site_ids))
+        results.append(test_field_selection())
+    else:
+        print("❌ Cannot test the listing without the test sites")
+        results.extend([False, False])
+    
+    cleanup_test_sites(site_ids)
+    
+    # Summary
+    print("\n" + "=" * 60)
+    print("📊 SITE LISTING TEST SUMMARY")
+    print("=" * 60)
+    
+    passed = sum(results)
+    total = len(results)
+    
+    print(f"✅ Passed: {passed}/{total}")
+    print(f"❌ Failed: {total - passed}/{total}")
+    
+    if passed == total:
+        print("\n🎉 ALL SITE LISTING TESTS PASSED!")
+        return True
+    else:
+        print(f"\n⚠️  {total - passed} test(s) failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
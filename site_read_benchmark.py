@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Site Read Benchmark
+GET /api/sites/{id} latency for 10, 100 and 500 page sites
+
+- latency: p50/p99 of GET /api/sites/{id} against the running backend
+- serialize: in-process cost of turning the stored document into response bytes,
+  through the Site response model (before) and through the orjson fast path (after)
+
+Usage:
+    python site_read_benchmark.py [latency|serialize]
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+PAGE_COUNTS = [10, 100, 500]
+BLOCKS_PER_PAGE = 10
+READS = 200
+SERIALIZE_RUNS = 50
+
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+
+def build_site(site_id, page_count):
+    block_types = ['hero', 'text', 'image', 'text', 'features']
+    pages = []
+    for p in range(page_count):
+        pages.append({
+            "id": f"p{p}",
+            "name": f"Page {p}",
+            "blocks": [
+                {
+                    "id": f"p{p}-b{b}",
+                    "type": block_types[b % len(block_types)],
+                    "content": f"Page {p} block {b} " + "lorem ipsum dolor sit amet " * 8
+                }
+                for b in range(BLOCKS_PER_PAGE)
+            ],
+            "pageUrl": "index.html" if p == 0 else f"page-{p}.html",
+            "pageDescription": f"Description of page {p}",
+            "socialSharingEnabled": True,
+            "socialSharingImageUrl": "",
+            "headCode": "<script>window.analytics = true;</script>",
+            "bodyEndCode": "",
+            "beforeDoctypeCode": ""
+        })
+    return {"id": site_id, "name": "Read Benchmark Site", "status": "unpublished", "pages": pages}
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_latency_benchmark():
+    api_url = f"{get_backend_url()}/api"
+    print(f"GET /api/sites/{{id}} against {api_url}: {BLOCKS_PER_PAGE} blocks per page, {READS} reads")
+    print("=" * 60)
+    print(f"{'pages':>6} {'response':>10} {'p50':>10} {'p99':>10}")
+    print("-" * 60)
+
+    session = requests.Session()
+    for page_count in PAGE_COUNTS:
+        site = build_site(f"read-bench-{uuid.uuid4()}", page_count)
+        response = session.post(f"{api_url}/sites/sync", json=site, timeout=60)
+        if response.status_code != 200:
+            print(f"❌ Could not create a {page_count} page site: {response.status_code}")
+            sys.exit(1)
+
+        try:
+            timings = []
+            size = 0
+            for _ in range(READS):
+                start = time.perf_counter()
+                response = session.get(f"{api_url}/sites/{site['id']}", timeout=30)
+                timings.append((time.perf_counter() - start) * 1000)
+                size = len(response.content)
+                if response.status_code != 200:
+                    print(f"❌ GET returned {response.status_code}")
+                    sys.exit(1)
+            print(
+                f"{page_count:>6} {size / 1024:>8.0f}KB {statistics.median(timings):>8.1f}ms "
+                f"{percentile(timings, 0.99):>8.1f}ms"
+            )
+        finally:
+            session.delete(f"{api_url}/sites/{site['id']}", timeout=10)
+
+    print("\n✅ Benchmark completed")
+
+
+def run_serialize_benchmark():
+    sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'site_read_benchmark')
+    from fastapi.encoders import jsonable_encoder
+    import server
+
+    print(f"Response serialization of a stored site, median of {SERIALIZE_RUNS} runs")
+    print("=" * 60)
+    print(f"{'pages':>6} {'Site model':>12} {'orjson':>10} {'speedup':>9}")
+    print("-" * 60)
+
+    for page_count in PAGE_COUNTS:
+        now = datetime.now(timezone.utc)
+        stored = dict(
+            server.Site(**build_site("bench", page_count)).model_dump(),
+            revision=1, createdAt=now, updatedAt=now
+        )
+
+        def through_model():
+            # What FastAPI did for response_model=Site: validate, then encode
+            site = server.Site.model_validate(stored)
+            return json.dumps(jsonable_encoder(site)).encode('utf-8')
+
+        def fast_path():
+            return server.site_response(stored).body
+
+        results = []
+        for serialize in (through_model, fast_path):
+            timings = []
+            for _ in range(SERIALIZE_RUNS):
+                start = time.perf_counter()
+                serialize()
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append(statistics.median(timings))
+
+        before, after = results
+        print(f"{page_count:>6} {before:>10.2f}ms {after:>8.2f}ms {before / after:>8.1f}x")
+
+    print("\n✅ Benchmark completed")
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode in (None, 'latency'):
+        run_latency_benchmark()
+    if mode in (None, 'serialize'):
+        run_serialize_benchmark()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Site Sync Benchmark
+Bytes on the wire and latency per autosave of a 100-page site against the running backend
+
+- full: POST /api/sites/sync with the whole site, as BuilderContext does today
+- delta: POST /api/sites/{id}/delta with the one block that changed
+
+upsert mode measures sync throughput directly against MongoDB (MONGO_URL from
+backend/.env), in a scratch database that is dropped afterwards:
+
+- before: find_one, then insert_one or replace_one (two round trips)
+- after: one upsert with $setOnInsert for createdAt
+
+It also races concurrent first syncs of one new site id through both
+strategies and counts the documents they leave behind.
+
+Usage:
+    python sync_benchmark.py [delta|upsert]
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+PAGES = 100
+BLOCKS_PER_PAGE = 10
+AUTOSAVES = 100
+
+UPSERT_SITES = 50
+UPSERT_SYNCS = 1000
+UPSERT_CONCURRENCY = 16
+RACE_WRITERS = 20
+
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+
+def build_site(site_id):
+    block_types = ['hero', 'text', 'image', 'text', 'features']
+    pages = []
+    for p in range(PAGES):
+        blocks = [
+            {
+                "id": f"p{p}-b{b}",
+                "type": block_types[b % len(block_types)],
+                "content": f"Page {p} block {b} " + "lorem ipsum dolor sit amet " * 8
+            }
+            for b in range(BLOCKS_PER_PAGE)
+        ]
+        pages.append({
+            "id": f"p{p}",
+            "name": f"Page {p}",
+            "blocks": blocks,
+            "pageUrl": "index.html" if p == 0 else f"page-{p}.html",
+            "pageDescription": f"Description of page {p}",
+            "socialSharingEnabled": True,
+            "socialSharingImageUrl": "",
+            "headCode": "<script>window.analytics = true;</script>",
+            "bodyEndCode": "",
+            "beforeDoctypeCode": ""
+        })
+    return {"id": site_id, "name": "Sync Benchmark Site", "status": "unpublished", "pages": pages}
+
+
+def describe(timings):
+    ordered = sorted(timings)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return f"p50 {statistics.median(ordered):7.1f} ms   p95 {p95:7.1f} ms"
+
+
+def post(session, url, body):
+    data = json.dumps(body).encode('utf-8')
+    start = time.perf_counter()
+    response = session.post(url, data=data, headers={"Content-Type": "application/json"}, timeout=30)
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code != 200:
+        raise RuntimeError(f"POST {url} returned {response.status_code}: {response.text[:200]}")
+    return response, len(data), len(response.content), elapsed
+
+
+def edit_block(site, i):
+    """The edit an autosave carries: one block of one page gets new text"""
+    page = site['pages'][i % PAGES]
+    block = page['blocks'][i % BLOCKS_PER_PAGE]
+    block['content'] = f"Edited {i} " + "lorem ipsum dolor sit amet " * 8
+    return page, block
+
+
+def run_delta_benchmark():
+    api_url = f"{get_backend_url()}/api"
+    print(f"Autosave benchmark against {api_url}: {PAGES} pages x {BLOCKS_PER_PAGE} blocks, {AUTOSAVES} saves")
+    print("=" * 72)
+    print(f"{'protocol':<8} {'request':>12} {'response':>10}   latency")
+    print("-" * 72)
+
+    session = requests.Session()
+    site = build_site(f"sync-bench-{uuid.uuid4()}")
+    response, _, _, _ = post(session, f"{api_url}/sites/sync", site)
+    revision = response.json().get('revision', 0)
+
+    try:
+        results = {}
+
+        sent, received, timings = [], [], []
+        for i in range(AUTOSAVES):
+            edit_block(site, i)
+            response, request_bytes, response_bytes, elapsed = post(session, f"{api_url}/sites/sync", site)
+            revision = response.json().get('revision', revision)
+            sent.append(request_bytes)
+            received.append(response_bytes)
+            timings.append(elapsed)
+        results['full'] = (sent, received, timings)
+
+        sent, received, timings = [], [], []
+        for i in range(AUTOSAVES):
+            page, block = edit_block(site, i)
+            body = {
+                "baseRevision": revision,
+                "operations": [{"op": "upsertBlock", "pageId": page['id'], "block": block}]
+            }
+            response, request_bytes, response_bytes, elapsed = post(session, f"{api_url}/sites/{site['id']}/delta", body)
+            revision = response.json()['revision']
+            sent.append(request_bytes)
+            received.append(response_bytes)
+            timings.append(elapsed)
+        results['delta'] = (sent, received, timings)
+
+        for protocol, (sent, received, timings) in results.items():
+            print(
+                f"{protocol:<8} {statistics.mean(sent) / 1024:>10.1f}KB {statistics.mean(received):>9.0f}B   "
+                f"{describe(timings)}"
+            )
+
+        full_bytes = statistics.mean(results['full'][0])
+        delta_bytes = statistics.mean(results['delta'][0])
+        speedup = statistics.median(results['full'][2]) / statistics.median(results['delta'][2])
+        print(f"\ndelta sends {full_bytes / delta_bytes:.0f}x fewer bytes, p50 latency {speedup:.1f}x lower")
+
+        # A save based on a stale revision is rejected with the current one
+        stale = session.post(
+            f"{api_url}/sites/{site['id']}/delta",
+            json={"baseRevision": revision - 1, "operations": []},
+            timeout=30
+        )
+        if stale.status_code == 409 and stale.json()['detail']['revision'] == revision:
+            print("✅ Stale baseRevision rejected with 409 and the current revision")
+        else:
+            print(f"❌ Stale baseRevision returned {stale.status_code}: {stale.text}")
+            sys.exit(1)
+    finally:
+        session.delete(f"{api_url}/sites/{site['id']}", timeout=10)
+
+    print("\n✅ Benchmark completed")
+
+
+async def legacy_sync(collection, site):
+    """The previous sync_site: a read to pick insert or replace and keep createdAt"""
+    existing = await collection.find_one({"id": site['id']}, {"_id": 0})
+    doc = dict(site)
+    doc['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    if existing:
+        doc['createdAt'] = existing.get('createdAt', doc['updatedAt'])
+        await collection.replace_one({"id": site['id']}, doc)
+    else:
+        doc['createdAt'] = doc['updatedAt']
+        await collection.insert_one(doc)
+
+
+async def upsert_sync(collection, site):
+    """The current sync_site: one upsert, returning the previous revision"""
+    from pymongo import ReturnDocument
+    from pymongo.errors import DuplicateKeyError
+
+    now = datetime.now(timezone.utc).isoformat()
+    for attempt in range(2):
+        try:
+            await collection.find_one_and_update(
+                {"id": site['id']},
+                {"$set": dict(site, updatedAt=now), "$setOnInsert": {"createdAt": now}, "$inc": {"revision": 1}},
+                projection={"_id": 0, "revision": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
+            )
+            return
+        except DuplicateKeyError:
+            if attempt:
+                raise
+
+
+async def syncs_per_second(collection, sync, sites):
+    queue = asyncio.Queue()
+    for i in range(UPSERT_SYNCS):
+        queue.put_nowait(sites[i % len(sites)])
+
+    async def worker():
+        while not queue.empty():
+            await sync(collection, queue.get_nowait())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(UPSERT_CONCURRENCY)))
+    return UPSERT_SYNCS / (time.perf_counter() - start)
+
+
+async def race_first_sync(collection, sync):
+    """RACE_WRITERS concurrent first syncs of one new site; returns how many documents exist for it"""
+    site = dict(build_site(f"race-{uuid.uuid4()}"), pages=[])
+    await asyncio.gather(*(sync(collection, site) for _ in range(RACE_WRITERS)), return_exceptions=True)
+    return await collection.count_documents({"id": site['id']})
+
+
+async def run_upsert_benchmark_async():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / 'backend' / '.env')
+    client = AsyncIOMotorClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    db = client[f"sync_benchmark_{uuid.uuid4().hex[:8]}"]
+
+    print(f"Sync throughput: {UPSERT_SYNCS} syncs of {UPSERT_SITES} sites, {UPSERT_CONCURRENCY} concurrent writers")
+    print("=" * 60)
+
+    try:
+        sites = [dict(build_site(f"bench-{i}"), pages=build_site('x')['pages'][:5]) for i in range(UPSERT_SITES)]
+
+        # Same collection state for both runs: every site already exists, as in steady-state autosaves
+        before_collection = db.sites_before
+        after_collection = db.sites_after
+        await after_collection.create_index("id", unique=True)
+        for site in sites:
+            await legacy_sync(before_collection, site)
+            await upsert_sync(after_collection, site)
+
+        before = await syncs_per_second(before_collection, legacy_sync, sites)
+        after = await syncs_per_second(after_collection, upsert_sync, sites)
+        print(f"before (find_one + replace_one)  {before:>8.0f} syncs/s")
+        print(f"after  (single upsert)           {after:>8.0f} syncs/s   {after / before:.1f}x")
+
+        legacy_docs = await race_first_sync(before_collection, legacy_sync)
+        upsert_docs = await race_first_sync(after_collection, upsert_sync)
+        print(f"\n{RACE_WRITERS} concurrent first syncs of one site: before left {legacy_docs} document(s), after {upsert_docs}")
+        if upsert_docs != 1:
+            print("❌ FAIL: upsert sync created duplicate documents")
+            sys.exit(1)
+    finally:
+        await client.drop_database(db.name)
+        client.close()
+
+    print("\n✅ Benchmark completed")
+
+
+def run_upsert_benchmark():
+    asyncio.run(run_upsert_benchmark_async())
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    if mode in (None, 'delta'):
+        run_delta_benchmark()
+    if mode in (None, 'upsert'):
+        run_upsert_benchmark()
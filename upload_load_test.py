@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Image Upload Load Testing
+Streams concurrent uploads at the backend and measures how much they delay other requests;
+also checks size limits and that identical images are stored once
+
+While the uploads run, a probe requests GET /api/ every few milliseconds.
+A handler that blocks the event loop shows up directly as probe latency, so
+the probe's latency over its idle baseline is the event-loop lag uploads cause.
+"""
+
+import hashlib
+import os
+import requests
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+BASE_URL = get_backend_url()
+API_URL = f"{BASE_URL}/api"
+
+# Must match the backend's UPLOAD_MAX_BYTES
+UPLOAD_MAX_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(10 * 1024 * 1024)))
+CONCURRENT_UPLOADS = 16
+UPLOAD_SIZE = 8 * 1024 * 1024
+PROBE_INTERVAL = 0.01
+# p99 probe latency over the idle baseline tolerated while uploads run
+LAG_BUDGET_MS = 250
+
+print(f"Testing image uploads at: {API_URL}")
+print("=" * 60)
+
+def upload(data, content_type="image/png", filename="test.png"):
+    """POST one image; returns (status, json or None)"""
+    response = requests.post(
+        f"{API_URL}/upload-image",
+        files={"file": (filename, data, content_type)},
+        timeout=120
+    )
+    body = response.json() if response.headers.get('content-type', '').startswith('application/json') else None
+    return response.status_code, body
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def test_upload_integrity():
+    """A stored upload has the size and SHA-256 of the bytes sent, and is served back unchanged"""
+    print("\n🔧 Testing Upload Integrity")
+    print("-" * 40)
+    
+    try:
+        data = os.urandom(3 * 1024 * 1024)
+        status, body = upload(data)
+        if status != 200:
+            print(f"❌ FAIL: Upload returned {status}: {body}")
+            return False
+        if body['size'] != len(data) or body['sha256'] != hashlib.sha256(data).hexdigest():
+            print(f"❌ FAIL: Stored size/hash {body['size']}/{body['sha256']} do not match what was sent")
+            return False
+        
+        served = requests.get(f"{BASE_URL}/uploads/{body['filename']}", timeout=30)
+        if served.status_code != 200 or served.content != data:
+            print(f"❌ FAIL: /uploads/{body['filename']} does not return the uploaded bytes ({served.status_code})")
+            return False
+        
+        print(f"✅ PASS: {len(data)} bytes stored as {body['filename']} with a matching SHA-256")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_reupload_deduplicated():
+    """Uploading the same bytes again returns the stored file, also when only their hash is sent"""
+    print("\n🔧 Testing Duplicate Uploads")
+    print("-" * 40)
+    
+    try:
+        data = os.urandom(512 * 1024)
+        first_status, first = upload(data, filename="logo.png")
+        second_status, second = upload(data, filename="logo-copy.png")
+        if first_status != 200 or second_status != 200:
+            print(f"❌ FAIL: Uploads returned {first_status} and {second_status}")
+            return False
+        if second['imageUrl'] != first['imageUrl'] or not second['deduplicated']:
+            print(f"❌ FAIL: Identical bytes stored twice: {first['filename']} and {second['filename']}")
+            return False
+        if first['filename'].rsplit('/', 1)[-1] != f"{hashlib.sha256(data).hexdigest()}.png":
+            print(f"❌ FAIL: {first['filename']} is not named by its content hash")
+            return False
+        
+        # A client that knows the hash can skip sending the bytes
+        response = requests.post(
+            f"{API_URL}/upload-image",
+            headers={"X-Content-SHA256": first['sha256']},
+            files={"file": ("logo.png", b"", "image/png")},
+            timeout=30
+        )
+        if response.status_code != 200 or response.json()['imageUrl'] != first['imageUrl']:
+            print(f"❌ FAIL: Upload by hash returned {response.status_code}: {response.text}")
+            return False
+        
+        print(f"✅ PASS: Re-uploads resolve to {first['filename']}")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_invalid_type_rejected():
+    """Non-image uploads are refused with 400"""
+    print("\n🔧 Testing Invalid File Type")
+    print("-" * 40)
+    
+    try:
+        status, body = upload(b"#!/bin/sh\n", content_type="text/x-shellscript", filename="run.sh")
+        if status == 400:
+            print(f"✅ PASS: Rejected with 400: {body['detail']}")
+            return True
+        print(f"❌ FAIL: Expected 400, got {status}")
+        return False
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_oversized_upload_rejected():
+    """Uploads over the limit get 413 without the backend reading the whole body"""
+    print("\n🔧 Testing Oversized Uploads")
+    print("-" * 40)
+    
+    try:
+        # Declared size over the limit: refused before the body is read
+        status, body = upload(b"\0" * (UPLOAD_MAX_BYTES + 1024 * 1024))
+        if status != 413:
+            print(f"❌ FAIL: Expected 413 for an oversized upload, got {status}")
+            return False
+        print("✅ PASS: Upload with an oversized Content-Length rejected with 413")
+        
+        # No Content-Length (chunked): cut off once the file crosses the limit
+        boundary = "uploadloadtestboundary"
+        total = 3 * UPLOAD_MAX_BYTES
+        sent = [0]
+        
+        def body_chunks():
+            yield (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.png\"\r\n"
+                   f"Content-Type: image/png\r\n\r\n").encode()
+            chunk = b"\0" * (256 * 1024)
+            while sent[0] < total:
+                sent[0] += len(chunk)
+                yield chunk
+            yield f"\r\n--{boundary}--\r\n".encode()
+        
+        try:
+            response = requests.post(
+                f"{API_URL}/upload-image",
+                data=body_chunks(),
+                headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                timeout=120
+            )
+            status = response.status_code
+        except requests.exceptions.ConnectionError:
+            # The backend answered 413 and closed the connection while we were still sending
+            status = 413 if sent[0] < total else None
+        
+        if status != 413:
+            print(f"❌ FAIL: Expected 413 for an oversized chunked upload, got {status}")
+            return False
+        print(f"✅ PASS: Chunked upload of {total // (1024 * 1024)} MB rejected with 413")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def probe_latencies(stop, timings):
+    """Time GET /api/ every PROBE_INTERVAL until stop is set"""
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(f"{API_URL}/", timeout=30)
+        timings.append((time.perf_counter() - start) * 1000)
+        time.sleep(PROBE_INTERVAL)
+
+def test_concurrent_upload_lag():
+    """Concurrent large uploads all succeed and barely delay other requests"""
+    print(f"\n🔧 Testing {CONCURRENT_UPLOADS} Concurrent {UPLOAD_SIZE // (1024 * 1024)} MB Uploads")
+    print("-" * 40)
+    
+    try:
+        payloads = [os.urandom(UPLOAD_SIZE) for _ in range(CONCURRENT_UPLOADS)]
+        
+        idle = []
+        stop = threading.Event()
+        prober = threading.Thread(target=probe_latencies, args=(stop, idle))
+        prober.start()
+        time.sleep(1)
+        stop.set()
+        prober.join()
+        
+        loaded = []
+        stop = threading.Event()
+        prober = threading.Thread(target=probe_latencies, args=(stop, loaded))
+        prober.start()
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=CONCURRENT_UPLOADS) as pool:
+                results = list(pool.map(upload, payloads))
+        finally:
+            elapsed = time.perf_counter() - start
+            stop.set()
+            prober.join()
+        
+        failed = [status for status, _ in results if status != 200]
+        if failed:
+            print(f"❌ FAIL: {len(failed)} upload(s) failed: {failed}")
+            return False
+        corrupted = [
+            body['filename'] for data, (_, body) in zip(payloads, results)
+            if body['sha256'] != hashlib.sha256(data).hexdigest()
+        ]
+        if corrupted:
+            print(f"❌ FAIL: Stored hashes do not match for {corrupted}")
+            return False
+        
+        baseline = statistics.median(idle)
+        lag_p50 = max(0.0, statistics.median(loaded) - baseline)
+        lag_p99 = max(0.0, percentile(loaded, 0.99) - baseline)
+        lag_max = max(0.0, max(loaded) - baseline)
+        throughput = CONCURRENT_UPLOADS * UPLOAD_SIZE / elapsed / 1024 / 1024
+        print(f"   Uploaded {CONCURRENT_UPLOADS * UPLOAD_SIZE // (1024 * 1024)} MB in {elapsed:.2f}s ({throughput:.0f} MB/s)")
+        print(f"   Probe latency idle: p50 {baseline:.1f}ms ({len(idle)} requests)")
+        print(f"   Event-loop lag under load: p50 {lag_p50:.1f}ms, p99 {lag_p99:.1f}ms, max {lag_max:.1f}ms ({len(loaded)} requests)")
+        
+        if lag_p99 > LAG_BUDGET_MS:
+            print(f"❌ FAIL: p99 lag {lag_p99:.1f}ms exceeds {LAG_BUDGET_MS}ms")
+            return False
+        print(f"✅ PASS: All uploads stored intact, p99 lag within {LAG_BUDGET_MS}ms")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def main():
+    """Run all image upload tests"""
+    print("🚀 Starting Image Upload Load Tests")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("=" * 60)
+    
+    results = [
+        test_upload_integrity(),
+        test_reupload_deduplicated(),
+        test_invalid_type_rejected(),
+        test_oversized_upload_rejected(),
+        test_concurrent_upload_lag(),
+    ]
+    
+    # Summary
+    print("\n" + "=" * 60)
+    print("📊 IMAGE UPLOAD TEST SUMMARY")
+    print("=" * 60)
+    
+    passed = sum(results)
+    total = len(results)
+    
+    print(f"✅ Passed: {passed}/{total}")
+    print(f"❌ Failed: {total - passed}/{total}")
+    
+    if passed == total:
+        print("\n🎉 ALL IMAGE UPLOAD TESTS PASSED!")
+        return True
+    else:
+        print(f"\n⚠️  {total - passed} test(s) failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
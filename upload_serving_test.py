@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Upload Serving Testing
+Checks caching headers, conditional and range requests on /uploads
+"""
+
+import io
+import requests
+import sys
+from datetime import datetime
+
+from PIL import Image
+
+# Get backend URL from frontend .env
+def get_backend_url():
+    try:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    return line.split('=', 1)[1].strip()
+    except:
+        pass
+    return "http://localhost:8001"
+
+BASE_URL = get_backend_url()
+API_URL = f"{BASE_URL}/api"
+
+print(f"Testing upload serving at: {BASE_URL}/uploads")
+print("=" * 60)
+
+def upload(filename, content, content_type):
+    """Upload a file; returns (URL under /uploads, bytes) or None"""
+    try:
+        response = requests.post(
+            f"{API_URL}/upload-image",
+            files={"file": (filename, content, content_type)},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print(f"❌ Failed to upload {filename}: {response.status_code} {response.text}")
+            return None
+        return f"{BASE_URL}/uploads/{response.json()['filename']}", content
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Failed to upload {filename}: {str(e)}")
+        return None
+
+def make_jpeg():
+    buffer = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert('RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+def make_svg():
+    return b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"><script>alert(1)</script></svg>'
+
+def test_immutable_and_conditional(url, content):
+    """Hashed uploads are immutable with the hash as ETag; If-None-Match and If-Modified-Since get 304"""
+    print("\n🔧 Testing Cache Headers and Conditional Requests")
+    print("-" * 40)
+    
+    try:
+        response = requests.get(url, timeout=10)
+        sha256 = url.rsplit('/', 1)[-1].split('.')[0]
+        if response.status_code != 200 or response.content != content:
+            print(f"❌ FAIL: GET returned {response.status_code} with {len(response.content)} bytes")
+            return False
+        if 'immutable' not in response.headers.get('cache-control', '') or response.headers.get('etag') != f'"{sha256}"':
+            print(f"❌ FAIL: Unexpected caching headers {dict(response.headers)}")
+            return False
+        if response.headers.get('content-type') != 'image/jpeg':
+            print(f"❌ FAIL: Content-Type {response.headers.get('content-type')}")
+            return False
+        
+        by_etag = requests.get(url, headers={"If-None-Match": response.headers['etag']}, timeout=10)
+        by_date = requests.get(url, headers={"If-Modified-Since": response.headers['last-modified']}, timeout=10)
+        changed = requests.get(url, headers={"If-None-Match": '"other"', "If-Modified-Since": response.headers['last-modified']}, timeout=10)
+        if by_etag.status_code != 304 or by_date.status_code != 304 or by_etag.content:
+            print(f"❌ FAIL: Revalidation returned {by_etag.status_code} and {by_date.status_code}")
+            return False
+        # If-None-Match wins over If-Modified-Since
+        if changed.status_code != 200:
+            print(f"❌ FAIL: A non-matching If-None-Match returned {changed.status_code}")
+            return False
+        
+        print("✅ PASS: Immutable caching, 304 on If-None-Match and If-Modified-Since")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_ranges(url, content):
+    """Single byte ranges get 206 with the right bytes; ranges past the end get 416"""
+    print("\n🔧 Testing Range Requests")
+    print("-" * 40)
+    
+    try:
+        size = len(content)
+        for header, expected in [("bytes=0-99", content[:100]), ("bytes=1000-", content[1000:]), ("bytes=-500", content[-500:])]:
+            response = requests.get(url, headers={"Range": header}, timeout=10)
+            if response.status_code != 206 or response.content != expected:
+                print(f"❌ FAIL: {header} returned {response.status_code} with {len(response.content)} bytes")
+                return False
+            first = size - len(expected) if header.startswith("bytes=-") else int(header[6:].split('-')[0])
+            if response.headers.get('content-range') != f"bytes {first}-{first + len(expected) - 1}/{size}":
+                print(f"❌ FAIL: {header} gave Content-Range {response.headers.get('content-range')}")
+                return False
+        
+        past_end = requests.get(url, headers={"Range": f"bytes={size}-"}, timeout=10)
+        stale = requests.get(url, headers={"Range": "bytes=0-99", "If-Range": '"stale"'}, timeout=10)
+        if past_end.status_code != 416 or past_end.headers.get('content-range') != f"bytes */{size}":
+            print(f"❌ FAIL: Range past the end returned {past_end.status_code}")
+            return False
+        if stale.status_code != 200 or stale.content != content:
+            print(f"❌ FAIL: Stale If-Range returned {stale.status_code}")
+            return False
+        
+        print("✅ PASS: 206 for byte ranges, 416 past the end, whole file for a stale If-Range")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_svg_refused():
+    """SVGs can carry scripts, so they are not accepted as uploads"""
+    print("\n🔧 Testing SVG Uploads Are Refused")
+    print("-" * 40)
+    
+    try:
+        response = requests.post(
+            f"{API_URL}/upload-image",
+            files={"file": ("drawing.svg", make_svg(), "image/svg+xml")},
+            timeout=30
+        )
+        if response.status_code != 400:
+            print(f"❌ FAIL: SVG upload returned {response.status_code}")
+            return False
+        
+        print("✅ PASS: SVG upload refused with 400")
+        return True
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def test_incoming_not_served():
+    """Uploads still being received are not reachable"""
+    print("\n🔧 Testing Temp Files Are Hidden")
+    print("-" * 40)
+    
+    try:
+        response = requests.get(f"{BASE_URL}/uploads/.incoming/", timeout=10)
+        if response.status_code == 404:
+            print("✅ PASS: /uploads/.incoming returns 404")
+            return True
+        print(f"❌ FAIL: /uploads/.incoming returned {response.status_code}")
+        return False
+    
+    except requests.exceptions.RequestException as e:
+        print(f"❌ FAIL: Request failed - {str(e)}")
+        return False
+
+def main():
+    """Run all upload serving tests"""
+    print("🚀 Starting Upload Serving Tests")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("=" * 60)
+    
+    results = []
+    jpeg = upload("photo.jpg", make_jpeg(), "image/jpeg")
+    
+    if jpeg:
+        results.append(test_immutable_and_conditional(*jpeg))
+        results.append(test_ranges(*jpeg))
+    else:
+        results.extend([False, False])
+    results.append(test_svg_refused())
+    results.append(test_incoming_not_served())
+    
+    # Summary
+    print("\n" + "=" * 60)
+    print("📊 UPLOAD SERVING TEST SUMMARY")
+    print("=" * 60)
+    
+    passed = sum(results)
+    total = len(results)
+    
+    print(f"✅ Passed: {passed}/{total}")
+    print(f"❌ Failed: {total - passed}/{total}")
+    
+    if passed == total:
+        print("\n🎉 ALL UPLOAD SERVING TESTS PASSED!")
+        return True
+    else:
+        print(f"\n⚠️  {total - passed} test(s) failed")
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Upload Serving Benchmark
+Requests and bytes of an editor load against /uploads: the plain StaticFiles mount
+against UploadFiles (immutable caching, conditional requests)
+
+- cold: empty browser cache, every image is downloaded
+- warm: the same images loaded again; files without a freshness lifetime are
+  revalidated, immutable ones are not requested at all
+
+Each server runs in its own process; the client models a browser cache keeping
+ETag, Last-Modified and Cache-Control max-age per URL. Transferred bytes are
+status line, headers and body as sent.
+
+Usage:
+    python uploads_benchmark.py
+"""
+
+import hashlib
+import http.client
+import io
+import multiprocessing
+import re
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+from upload_store import content_filename
+
+PHOTOS = 16
+PHOTO_SIZE = (1200, 800)
+ROUNDS = 20
+
+
+def make_photo(seed):
+    texture = Image.effect_noise((PHOTO_SIZE[0] // 4, PHOTO_SIZE[1] // 4), 50 + seed).filter(ImageFilter.GaussianBlur(1)).resize(PHOTO_SIZE)
+    gradient = Image.linear_gradient('L').resize(PHOTO_SIZE).rotate(seed * 20)
+    buffer = io.BytesIO()
+    Image.merge('RGB', (gradient, texture, Image.blend(gradient, texture, 0.5))).save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def write_uploads(directory):
+    """Stores the editor's images as the upload store does; returns their URL paths"""
+    urls = []
+    for content in (make_photo(seed) for seed in range(PHOTOS)):
+        filename = content_filename(hashlib.sha256(content).hexdigest(), 'jpg')
+        path = directory / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        urls.append(f"/uploads/{filename}")
+    return urls
+
+
+def serve(kind, directory, port):
+    import logging
+    import uvicorn
+    from fastapi import FastAPI
+    from fastapi.staticfiles import StaticFiles
+    from upload_serving import UploadFiles
+
+    app = FastAPI()
+    files = StaticFiles if kind == "StaticFiles" else UploadFiles
+    app.mount("/uploads", files(directory=directory), name="uploads")
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level=logging.WARNING)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port):
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+class BrowserCache:
+    """Per-URL validators and freshness, as a browser keeps them"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def load(self, connection, urls):
+        """Fetch every URL the way a page load would; returns (requests, 304s, bytes on the wire)"""
+        requests = not_modified = transferred = 0
+        now = time.time()
+        for url in urls:
+            entry = self.entries.get(url)
+            if entry and entry['expires'] > now:
+                continue
+
+            headers = {}
+            if entry and entry.get('etag'):
+                headers["If-None-Match"] = entry['etag']
+            if entry and entry.get('last-modified'):
+                headers["If-Modified-Since"] = entry['last-modified']
+            connection.request("GET", url, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+            requests += 1
+            transferred += len(f"HTTP/1.1 {response.status} {response.reason}\r\n") + len(body) + 2
+            transferred += sum(len(name) + len(value) + 4 for name, value in response.getheaders())
+
+            if response.status == 304:
+                not_modified += 1
+            max_age = re.search(r'max-age=(\d+)', response.getheader('cache-control') or '')
+            self.entries[url] = {
+                "etag": response.getheader('etag'),
+                "last-modified": response.getheader('last-modified'),
+                "expires": now + int(max_age.group(1)) if max_age else 0
+            }
+        return requests, not_modified, transferred
+
+
+def measure(port, urls, warm):
+    """Average requests, 304s, bytes and wall time per load over ROUNDS loads"""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    primed = BrowserCache()
+    primed.load(connection, urls)
+
+    totals = [0, 0, 0]
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        cache = primed if warm else BrowserCache()
+        for i, value in enumerate(cache.load(connection, urls)):
+            totals[i] += value
+    elapsed = time.perf_counter() - start
+    connection.close()
+    return totals[0] / ROUNDS, totals[1] / ROUNDS, totals[2] / ROUNDS, elapsed / ROUNDS
+
+
+def format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.2f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size:.0f} B"
+
+
+def run_benchmark():
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = Path(scratch)
+        urls = write_uploads(directory)
+        originals = sum((directory / url.removeprefix('/uploads/')).stat().st_size for url in urls)
+
+        print(f"Editor load: {PHOTOS} JPEG photos, {format_bytes(originals)} on disk, {ROUNDS} loads each")
+        print("=" * 84)
+        print(f"{'server':<13} {'load':<6} {'requests':>9} {'304s':>6} {'transferred':>13} {'ms/load':>9} {'req/s':>9}")
+        print("-" * 84)
+
+        context = multiprocessing.get_context('spawn')
+        for kind in ("StaticFiles", "UploadFiles"):
+            port = free_port()
+            server = context.Process(target=serve, args=(kind, str(directory), port), daemon=True)
+            server.start()
+            try:
+                wait_for(port)
+                for load in ("cold", "warm"):
+                    requests, not_modified, transferred, elapsed = measure(port, urls, warm=load == "warm")
+                    rate = f"{requests / elapsed:>9.0f}" if requests else f"{'-':>9}"
+                    print(f"{kind:<13} {load:<6} {requests:>9.0f} {not_modified:>6.0f} {format_bytes(transferred):>13} {elapsed * 1000:>9.1f} {rate}")
+            finally:
+                server.terminate()
+                server.join()
+
+    print("\n✅ Benchmark completed")
+
+
+if __name__ == "__main__":
+    run_benchmark()